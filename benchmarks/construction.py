@@ -0,0 +1,75 @@
+"""
+Measures the cost of building large models (no backend is involved).
+
+Usage: python -m benchmarks.construction [--size 40] [--repeat 3]
+"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+
+from cspuz import Solver, count_true, graph
+
+
+def _grid_patterns(size):
+    solver = Solver()
+    is_black = solver.bool_array((size, size))
+    solver.ensure(~(is_black[1:, :] & is_black[:-1, :]))
+    solver.ensure(~(is_black[:, 1:] & is_black[:, :-1]))
+    for y in range(size - 1):
+        for x in range(size - 1):
+            solver.ensure(count_true(is_black[y:y + 2, x:x + 2]) <= 2)
+    return solver
+
+
+def _connectivity(size):
+    solver = Solver()
+    is_black = solver.bool_array((size, size))
+    graph.active_vertices_connected(solver,
+                                    is_black,
+                                    use_graph_primitive=False)
+    return solver
+
+
+MODELS = {
+    'grid_patterns': _grid_patterns,
+    'connectivity': _connectivity,
+}
+
+
+def _measure(model, size, repeat):
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        model(size)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+
+    gc.collect()
+    tracemalloc.start()
+    solver = model(size)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, len(solver.constraints)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', type=int, default=40)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print('{:<14} {:>12} {:>12} {:>12}'.format('model', 'time', 'peak mem',
+                                               'constraints'))
+    for name, model in MODELS.items():
+        elapsed, peak, num_constraints = _measure(model, args.size,
+                                                  args.repeat)
+        print('{:<14} {:>11.3f}s {:>10.1f}MB {:>12}'.format(
+            name, elapsed, peak / 1e6, num_constraints))
+
+
+if __name__ == '__main__':
+    main()
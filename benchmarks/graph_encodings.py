@@ -0,0 +1,148 @@
+"""
+Compares the encodings of the connectivity / acyclicity constraints of
+`cspuz.graph` on the puzzles of `benchmarks.puzzle_corpus` using them.
+
+Usage:
+    python -m benchmarks.graph_encodings [--backend cnf] [--puzzle nurikabe] \\
+        [--size 10x10] [--encoding rank] [--timeout 60] [--output out.json]
+
+Each instance is solved with each encoding (`graph.ENCODINGS` and 'lazy')
+in a fresh process, which is killed after `--timeout` seconds. For each
+puzzle, size and backend the fastest encoding is reported, and a warning is
+printed if the encodings disagree on the answer.
+"""
+
+import argparse
+import importlib
+import inspect
+import json
+import multiprocessing
+import sys
+
+import cspuz
+from cspuz import graph
+
+from .puzzle_corpus import instances
+from .puzzles import BACKENDS, _run_instance, available_backends
+
+ENCODINGS = graph.ENCODINGS + ['lazy']
+
+
+def _uses_graph(module):
+    return 'graph.' in inspect.getsource(module)
+
+
+def _worker(conn, puzzle, index, backend, encoding, repeat):
+    cspuz.config.default_backend = backend
+    if encoding == 'lazy':
+        cspuz.config.lazy_connectivity = True
+    else:
+        cspuz.config.graph_encoding = encoding
+    module = importlib.import_module('cspuz.puzzle.' + puzzle)
+    _, _, make_args = instances()[index]
+    conn.send(_run_instance(module, puzzle, make_args, repeat))
+
+
+def _measure(puzzle, index, backend, encoding, repeat, timeout):
+    # a fresh process per run, so that a slow encoding can be killed and
+    # cached templates are not shared among the encodings
+    ctx = multiprocessing.get_context('spawn')
+    recv, send = ctx.Pipe(duplex=False)
+    proc = ctx.Process(target=_worker,
+                       args=(send, puzzle, index, backend, encoding, repeat))
+    proc.start()
+    send.close()
+    if recv.poll(timeout):
+        try:
+            ret = recv.recv()
+        except EOFError:
+            ret = {'error': True}
+    else:
+        proc.terminate()
+        ret = {'timeout': True}
+    proc.join()
+    return ret
+
+
+def run(backends, encodings, puzzles=None, sizes=None, repeat=1,
+        timeout=60.0):
+    results = []
+    for index, (puzzle, size, _) in enumerate(instances()):
+        if puzzles and puzzle not in puzzles:
+            continue
+        if sizes and size not in sizes:
+            continue
+        try:
+            module = importlib.import_module('cspuz.puzzle.' + puzzle)
+        except ImportError as e:
+            print('skipping {}: {}'.format(puzzle, e), file=sys.stderr)
+            continue
+        if not _uses_graph(module):
+            continue
+        for backend in backends:
+            entry = {
+                'puzzle': puzzle,
+                'size': size,
+                'backend': backend,
+                'encodings': {}
+            }
+            for encoding in encodings:
+                entry['encodings'][encoding] = _measure(
+                    puzzle, index, backend, encoding, repeat, timeout)
+            finished = {
+                k: v
+                for k, v in entry['encodings'].items() if 'time' in v
+            }
+            if finished:
+                entry['best'] = min(finished,
+                                    key=lambda k: finished[k]['time'])
+                if len({v['answer'] for v in finished.values()}) > 1:
+                    entry['mismatch'] = True
+            results.append(entry)
+            _print_entry(entry, encodings)
+    return results
+
+
+def _print_entry(entry, encodings):
+    cells = []
+    for encoding in encodings:
+        res = entry['encodings'][encoding]
+        if 'time' in res:
+            cells.append('{:>9.3f}s'.format(res['time']))
+        else:
+            cells.append('{:>10}'.format(
+                'timeout' if res.get('timeout') else 'error'))
+    print('{:<12} {:>6} {:<15} {} {:<9}{}'.format(
+        entry['puzzle'], entry['size'], entry['backend'], ' '.join(cells),
+        entry.get('best', '-'),
+        ' (answers differ)' if entry.get('mismatch') else ''),
+          flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--backend', action='append', choices=BACKENDS)
+    parser.add_argument('--puzzle', action='append')
+    parser.add_argument('--size', action='append')
+    parser.add_argument('--encoding', action='append', choices=ENCODINGS)
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    backends = args.backend or available_backends()
+    encodings = args.encoding or ENCODINGS
+    print('{:<12} {:>6} {:<15} {} {}'.format(
+        'puzzle', 'size', 'backend',
+        ' '.join('{:>10}'.format(e) for e in encodings), 'best'))
+    results = run(backends, encodings, args.puzzle, args.size, args.repeat,
+                  args.timeout)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'encodings': encodings, 'results': results},
+                      f,
+                      indent=1)
+
+
+if __name__ == '__main__':
+    main()
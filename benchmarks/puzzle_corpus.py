@@ -0,0 +1,401 @@
+"""
+Instances for `benchmarks.puzzles`.
+
+Each instance is `(puzzle, size, make_args)`: the benchmark calls
+`cspuz.puzzle.<puzzle>.solve_<puzzle>(*make_args(module))`. The fixed-size
+instances are the published examples bundled with the puzzle modules. The
+families of several sizes are built from a planted solution, so that they
+are satisfiable by construction.
+"""
+
+from collections import defaultdict
+
+
+def _blocks_from_strings(rows):
+    blocks = defaultdict(list)
+    for y, row in enumerate(rows):
+        for x, c in enumerate(row):
+            blocks[c].append((y, x))
+    return list(blocks.values())
+
+
+# published examples
+
+EXAMPLES = [
+    ('akari', '10x10', lambda m: (10, 10, [
+        [-2, -2,  2, -2, -2, -2, -2, -2, -2, -2],  # noqa: E201
+        [-2, -2, -2, -2, -2, -2, -2, -2,  2, -2],  # noqa: E201
+        [-2, -2, -2, -2, -2, -2, -2, -1, -2, -2],  # noqa: E201
+        [-1, -2, -2, -2,  3, -2, -2, -2, -2, -2],  # noqa: E201
+        [-2, -2, -2, -2, -2, -1, -2, -2, -2, -1],  # noqa: E201
+        [ 2, -2, -2, -2,  2, -2, -2, -2, -2, -2],  # noqa: E201
+        [-2, -2, -2, -2, -2,  3, -2, -2, -2, -1],  # noqa: E201
+        [-2, -2, -1, -2, -2, -2, -2, -2, -2, -2],  # noqa: E201
+        [-2,  2, -2, -2, -2, -2, -2, -2, -2, -2],  # noqa: E201
+        [-2, -2, -2, -2, -2, -2, -2, -1, -2, -2],  # noqa: E201
+    ])),  # yapf: disable
+    ('building', '6x6', lambda m: (6, [0, 0, 0, 2, 0, 3], [0, 6, 3, 3, 2, 0],
+                                   [2, 0, 0, 3, 3, 3], [0, 6, 3, 0, 2, 0])),
+    ('compass', '5x5', lambda m: (5, 5, [(1, 2, -1, 1, -1, -1),
+                                         (2, 1, 2, -1, 5, 1),
+                                         (2, 3, 5, -1, 3, -1),
+                                         (3, 2, 1, -1, -1, 1)])),
+    ('doppelblock', '5x5', lambda m: (5, [5, -1, 5, -1, -1],
+                                      [3, -1, -1, 1, -1])),
+    ('fillomino', '8x8', lambda m: (8, 8, [
+        [0, 0, 0, 5, 4, 0, 0, 0],
+        [0, 0, 0, 4, 1, 3, 0, 0],
+        [1, 0, 0, 0, 0, 0, 0, 4],
+        [6, 0, 4, 0, 0, 0, 0, 7],
+        [0, 5, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 2],
+        [1, 0, 0, 0, 4, 0, 0, 7],
+        [7, 0, 0, 6, 2, 0, 7, 0],
+    ])),
+    ('firefly', '6x6', lambda m: (6, 6, [
+        ['..', 'v?', '..', '..', '..', '..'],
+        ['..', '..', '..', '..', '..', '..'],
+        ['..', '>?', '..', '..', 'v7', '..'],
+        ['>5', '..', '..', '..', '..', '..'],
+        ['..', '..', 'v2', '..', '..', '..'],
+        ['..', '..', '..', '..', '..', '..'],
+    ])),
+    ('fivecells', '5x5', lambda m: (5, 5, [
+        [-1,  2,  3, -1, -1],  # noqa: E201
+        [-1, -1, -1, -1, -1],  # noqa: E201
+        [-1, -1,  2,  1, -1],  # noqa: E201
+        [-1,  3, -1, -1, -1],  # noqa: E201
+        [-1, -1, -1, -1,  3],  # noqa: E201
+    ])),  # yapf: disable
+    ('geradeweg', '10x10', lambda m: (10, 10, [
+        [5, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 1, 0, 0],
+        [0, 0, 0, 5, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 2, 0, 0, 0, 3],
+        [0, 0, 0, 0, 0, 0, 0, 0, 4, 0],
+        [0, 2, 0, 0, 0, 0, 0, 0, 0, 0],
+        [2, 0, 0, 0, 4, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 4, 0, 0, 0],
+        [0, 0, 2, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0, 5],
+    ])),
+    ('gokigen', '7x7', lambda m: (7, 7, [
+        [-1, -1, -1, -1, -1, -1, -1, -1],  # noqa: E201
+        [-1,  3, -1,  2,  3, -1,  3, -1],  # noqa: E201
+        [-1, -1,  1, -1, -1,  1, -1, -1],  # noqa: E201
+        [-1, -1, -1, -1,  3,  2, -1, -1],  # noqa: E201
+        [-1,  3, -1,  3,  2, -1,  3, -1],  # noqa: E201
+        [-1, -1,  1, -1, -1,  1, -1, -1],  # noqa: E201
+        [-1,  3, -1, -1,  3, -1,  3, -1],  # noqa: E201
+        [-1, -1, -1, -1, -1, -1, -1, -1],  # noqa: E201
+    ])),  # yapf: disable
+    ('heyawake', '6x6', lambda m: (6, 6, [
+        (0, 0, 1, 2, -1), (0, 2, 2, 4, 2), (0, 4, 1, 6, -1),
+        (1, 0, 2, 2, -1), (1, 4, 3, 6, -1), (2, 0, 4, 3, 3),
+        (2, 3, 4, 4, -1), (3, 4, 4, 6, -1), (4, 0, 6, 2, -1),
+        (4, 2, 6, 4, -1), (4, 4, 6, 6, -1)
+    ])),
+    ('lits', '10x10', lambda m: (10, 10, _blocks_from_strings([
+        '0000000222', '0010002222', '1113332222', '5563444288',
+        '5663422228', '5663223338', '5633333338', '6673339aaa',
+        '6773999aab', '77bbbbbbbb'
+    ]))),
+    ('masyu', '10x10', lambda m: (10, 10, [
+        [0, 0, 0, 0, 2, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
+        [0, 2, 0, 0, 0, 0, 0, 0, 2, 0],
+        [1, 0, 2, 0, 0, 1, 0, 1, 0, 0],
+        [0, 0, 0, 0, 0, 0, 2, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 1, 0, 1, 0, 1, 0, 0],
+        [0, 0, 0, 2, 0, 0, 0, 0, 0, 0],
+        [0, 2, 0, 0, 0, 0, 0, 1, 0, 0],
+        [0, 0, 0, 0, 1, 0, 0, 1, 0, 0],
+    ])),
+    ('nanro', '8x8', lambda m: (8, 8, _blocks_from_strings([
+        '01112334', '00022344', '05522344', '05552664', '75888664',
+        '7579866a', '7779bbba', 'ccccbdda'
+    ]), [
+        [5, 0, 0, 0, 0, 4, 0, 0],
+        [0, 0, 0, 0, 2, 0, 0, 0],
+        [0, 0, 5, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 5, 0],
+        [0, 0, 0, 0, 2, 0, 0, 4],
+        [0, 0, 0, 0, 0, 0, 0, 0],
+        [3, 0, 0, 0, 0, 3, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0],
+    ])),
+    ('norinori', '6x6', lambda m: (6, 6, _blocks_from_strings(
+        ['001112', '111132', '413333', '415556', '777756', '888776']))),
+    ('nurikabe', '10x10', lambda m: (10, 10, [
+        [0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 7, 0, 0, 0, 0, 0],
+        [0, 0, 0, 7, 0, 0, 0, 0, 9, 0],
+        [0, 0, 0, 0, 0, 0, 0, 7, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 7, 0, 0, 0, 7, 0, 0, 0],
+        [0, 0, 0, 0, 0, 7, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+    ])),
+    ('nurimaze', '10x10', lambda m: (10, 10, [
+        [0, 1, 1, 1, 0, 1, 0, 1, 1],
+        [1, 0, 0, 1, 0, 1, 1, 0, 1],
+        [1, 0, 1, 1, 1, 1, 1, 1, 1],
+        [1, 1, 1, 1, 1, 1, 1, 1, 1],
+        [0, 1, 1, 1, 1, 0, 1, 1, 1],
+        [1, 1, 0, 0, 1, 0, 1, 1, 1],
+        [1, 1, 1, 1, 1, 1, 1, 1, 1],
+        [0, 1, 1, 1, 1, 1, 1, 1, 1],
+        [1, 1, 1, 1, 1, 1, 1, 0, 1],
+        [1, 0, 1, 1, 1, 0, 1, 0, 1],
+    ], [
+        [1, 1, 1, 1, 1, 1, 0, 1, 1, 1],
+        [1, 1, 1, 0, 1, 1, 1, 1, 1, 1],
+        [1, 1, 1, 1, 1, 1, 0, 0, 1, 1],
+        [0, 1, 1, 1, 1, 1, 1, 1, 1, 1],
+        [1, 1, 1, 1, 1, 1, 1, 1, 1, 1],
+        [1, 1, 1, 0, 1, 1, 1, 1, 1, 1],
+        [1, 1, 1, 0, 1, 1, 1, 1, 1, 1],
+        [1, 1, 1, 1, 0, 1, 0, 1, 1, 1],
+        [1, 1, 0, 1, 1, 1, 1, 1, 1, 0],
+    ], [
+        [0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 2, 0, 0, 0],
+        [1, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 1, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 1, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 2, 0, 0, 0, 0, 2, 0, 0],
+        [0, 0, 0, 0, 1, 0, 0, 0, 0, 0],
+    ], (6, 5), (7, 8))),
+    ('nurimisaki', '10x10', lambda m: (10, 10, [
+        [-1, -1, -1, -1,  3, -1, -1, -1, -1, -1],  # noqa: E201
+        [-1,  3, -1, -1, -1, -1, -1, -1, -1, -1],  # noqa: E201
+        [-1, -1, -1, -1, -1, -1, -1, -1,  2, -1],  # noqa: E201
+        [-1, -1, -1, -1, -1, -1, -1, -1, -1, -1],  # noqa: E201
+        [-1, -1, -1,  2, -1, -1, -1, -1, -1, -1],  # noqa: E201
+        [-1, -1, -1, -1,  0, -1,  2, -1, -1, -1],  # noqa: E201
+        [-1,  2, -1, -1, -1, -1, -1, -1, -1, -1],  # noqa: E201
+        [-1, -1, -1, -1, -1, -1, -1, -1, -1,  2],  # noqa: E201
+        [-1, -1, -1, -1, -1,  2, -1, -1, -1, -1],  # noqa: E201
+        [-1, -1, -1, -1,  3, -1, -1, -1, -1, -1],  # noqa: E201
+    ])),  # yapf: disable
+    ('shakashaka', '10x10', lambda m: (10, 10, [
+        [None if (y, x) not in _SHAKASHAKA_CLUES else
+         _SHAKASHAKA_CLUES[y, x] for x in range(10)] for y in range(10)
+    ])),
+    ('slalom', '10x10', lambda m: (10, 10, (5, 1), m.instantiate_problem(
+        10, 10, ((5, 1), [(9, 2)], _SLALOM_GATES)), _SLALOM_GATES)),
+    ('slitherlink', '4x4', lambda m: (4, 4, [
+        [ 3, -1, -1, -1],  # noqa: E201
+        [ 3, -1, -1, -1],  # noqa: E201
+        [-1,  2,  2, -1],  # noqa: E201
+        [-1,  2, -1,  1],  # noqa: E201
+    ])),  # yapf: disable
+    ('star_battle', '6x6', lambda m: (6, [
+        [0, 0, 0, 0, 1, 1],
+        [0, 2, 3, 0, 1, 1],
+        [2, 2, 3, 3, 3, 1],
+        [2, 1, 1, 1, 1, 1],
+        [2, 4, 4, 1, 4, 5],
+        [2, 2, 4, 4, 4, 5],
+    ], 1)),
+    ('sudoku', '9x9', lambda m: ([
+        [5, 3, 0, 0, 7, 0, 0, 0, 0],
+        [6, 0, 0, 1, 9, 5, 0, 0, 0],
+        [0, 9, 8, 0, 0, 0, 0, 6, 0],
+        [8, 0, 0, 0, 6, 0, 0, 0, 3],
+        [4, 0, 0, 8, 0, 3, 0, 0, 1],
+        [7, 0, 0, 0, 2, 0, 0, 0, 6],
+        [0, 6, 0, 0, 0, 0, 2, 8, 0],
+        [0, 0, 0, 4, 1, 9, 0, 0, 5],
+        [0, 0, 0, 0, 8, 0, 0, 7, 9],
+    ], )),
+    ('view', '8x8', lambda m: (8, 8, [
+        [-1,  4, -1, -1,  2, -1, -1, -1],  # noqa: E201
+        [-1, -1,  2, -1, -1, -1, -1, -1],  # noqa: E201
+        [-1, -1, -1, -1, -1, -1, -1,  2],  # noqa: E201
+        [-1, -1, -1, -1,  2, -1, -1, -1],  # noqa: E201
+        [-1, -1, -1, -1, -1,  2, -1, -1],  # noqa: E201
+        [-1, -1,  1, -1, -1,  0, -1, -1],  # noqa: E201
+        [-1,  2, -1, -1, -1, -1, -1, -1],  # noqa: E201
+        [-1, -1, -1,  9, -1, -1, -1,  2],  # noqa: E201
+    ])),  # yapf: disable
+    ('yajilin', '10x10', lambda m: (10, 10, [
+        ['..'] * 10,
+        ['..'] * 10,
+        ['..', '..', 'v0', '..', '..', '>2', '..', '..', '..', '..'],
+        ['..'] * 10,
+        ['..'] * 10,
+        ['..', '..', '..', '..', '..', '..', '..', '..', '^1', '..'],
+        ['..'] * 10,
+        ['..', '..', '^0', '..', '^3', '..', '..', '>1', '..', '..'],
+        ['..'] * 10,
+        ['..', '..', '..', '..', '..', '..', '..', '>0', '..', '..'],
+    ])),
+    ('yinyang', '6x6', lambda m: (6, 6, [
+        [0, 0, 0, 2, 0, 1],
+        [0, 1, 1, 0, 0, 0],
+        [2, 0, 1, 0, 0, 0],
+        [0, 0, 0, 0, 2, 0],
+        [0, 0, 0, 0, 0, 2],
+        [0, 0, 2, 0, 0, 0],
+    ])),
+]
+
+_SHAKASHAKA_CLUES = {
+    (1, 2): 3, (2, 7): 2, (2, 9): 0, (3, 0): 1, (3, 3): 3, (4, 6): 3,
+    (5, 0): 2, (5, 3): 2, (6, 8): 2, (9, 3): 2, (9, 7): 0
+}  # yapf: disable
+_SLALOM_GATES = [(1, 5, 0, 3, -1), (2, 3, 0, 1, -1), (3, 8, 0, 1, 1),
+                 (6, 3, 0, 4, 3), (7, 1, 0, 1, -1), (8, 6, 0, 4, 2)]
+
+# families with planted solutions
+
+
+def _akari(n):
+    wall = [[(y * 5 + x * 3) % 7 == 0 for x in range(n)] for y in range(n)]
+    lit = [[False] * n for _ in range(n)]
+    light = [[False] * n for _ in range(n)]
+    for y in range(n):
+        for x in range(n):
+            if wall[y][x] or lit[y][x]:
+                continue
+            light[y][x] = True
+            for dy, dx in [(0, 0), (-1, 0), (1, 0), (0, -1), (0, 1)]:
+                y2, x2 = y + dy, x + dx
+                while 0 <= y2 < n and 0 <= x2 < n and not wall[y2][x2]:
+                    lit[y2][x2] = True
+                    if dy == dx == 0:
+                        break
+                    y2 += dy
+                    x2 += dx
+    problem = [[-2] * n for _ in range(n)]
+    for y in range(n):
+        for x in range(n):
+            if wall[y][x]:
+                if (y + x) % 2 == 0:
+                    problem[y][x] = sum(
+                        1 for y2, x2 in [(y - 1, x), (y + 1, x), (y, x - 1),
+                                         (y, x + 1)]
+                        if 0 <= y2 < n and 0 <= x2 < n and light[y2][x2])
+                else:
+                    problem[y][x] = -1
+    return n, n, problem
+
+
+def _slitherlink(n):
+    # the loop is the border of a comb-shaped region
+    def inside(y, x):
+        if not (1 <= y < n - 1 and 1 <= x < n - 1):
+            return False
+        return not (y < n // 2 and x % 2 == 0 and x < n - 2)
+
+    problem = [[-1] * n for _ in range(n)]
+    for y in range(n):
+        for x in range(n):
+            if (y * 3 + x) % 2 == 0:
+                problem[y][x] = sum(
+                    1 for y2, x2 in [(y - 1, x), (y + 1, x), (y, x - 1),
+                                     (y, x + 1)]
+                    if inside(y2, x2) != inside(y, x))
+    return n, n, problem
+
+
+def _sudoku(k):
+    n = k * k
+    problem = [[0] * n for _ in range(n)]
+    for y in range(n):
+        for x in range(n):
+            if (y * 7 + x * 11 + y * x) % 5 < 2:
+                problem[y][x] = (k * (y % k) + y // k + x) % n + 1
+    return problem, k
+
+
+def _creek(n):
+    black = [[
+        y % 2 == 0 and x % 2 == 0 and (y // 2 + x) % 3 != 0 for x in range(n)
+    ] for y in range(n)]
+    problem = [[-1] * (n + 1) for _ in range(n + 1)]
+    for y in range(n + 1):
+        for x in range(n + 1):
+            if (y + x) % 2 == 1:
+                problem[y][x] = sum(
+                    1 for y2 in range(max(y - 1, 0), min(y + 1, n))
+                    for x2 in range(max(x - 1, 0), min(x + 1, n))
+                    if black[y2][x2])
+    return n, n, problem
+
+
+def _nurikabe(n):
+    # islands are the runs of white cells in the even rows
+    problem = [[0] * n for _ in range(n)]
+    for y in range(0, n, 2):
+        for x in range(1, n, 4):
+            problem[y][x] = min(3, n - x)
+    return n, n, problem
+
+
+def _aquarium(n):
+    blocks = []
+    clue_row = [0] * n
+    clue_col = [0] * n
+    for y in range(n):
+        for i, x0 in enumerate(range(0, n, 3)):
+            block = [(y, x) for x in range(x0, min(x0 + 3, n))]
+            blocks.append(block)
+            if (y + i) % 3 == 0:
+                for _, x in block:
+                    clue_row[y] += 1
+                    clue_col[x] += 1
+    return n, n, blocks, clue_row, clue_col
+
+
+def _putteria(n):
+    # each column is a block, and the numbers are on the diagonal
+    return n, n, [[(y, x) for y in range(n)] for x in range(n)]
+
+
+def _simpleloop(n):
+    # a loop through every cell (n must be even)
+    return n, n, [[0] * n for _ in range(n)], (0, 0)
+
+
+def _castle_wall(n):
+    arrow = [['..'] * n for _ in range(n)]
+    inside = [[None] * n for _ in range(n)]
+    arrow[n // 2][n // 2] = '^0'
+    inside[n // 2][n // 2] = True
+    return n, n, arrow, inside
+
+
+FAMILIES = [
+    ('akari', _akari, [8, 16, 24]),
+    ('slitherlink', _slitherlink, [6, 10, 16]),
+    ('sudoku', _sudoku, [2, 4]),
+    ('creek', _creek, [6, 10, 14]),
+    ('nurikabe', _nurikabe, [6, 9, 12]),
+    ('aquarium', _aquarium, [6, 9, 12]),
+    ('putteria', _putteria, [4, 6, 8]),
+    ('simpleloop', _simpleloop, [4, 6, 8]),
+    ('castle_wall', _castle_wall, [5, 7]),
+]
+
+
+def _family_size(puzzle, n):
+    if puzzle == 'sudoku':
+        return '{0}x{0}'.format(n * n)
+    return '{0}x{0}'.format(n)
+
+
+def instances():
+    ret = list(EXAMPLES)
+    for puzzle, make, sizes in FAMILIES:
+        for n in sizes:
+            ret.append((puzzle, _family_size(puzzle, n),
+                        lambda m, make=make, n=n: make(n)))
+    return ret
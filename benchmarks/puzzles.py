@@ -0,0 +1,202 @@
+"""
+Benchmarks the puzzle solvers in `cspuz.puzzle` on the instances of
+`benchmarks.puzzle_corpus`.
+
+Usage:
+    python -m benchmarks.puzzles [--backend cnf] [--puzzle akari] \\
+        [--size 10x10] [--repeat 1] [--output report.json]
+    python -m benchmarks.puzzles --compare old.json new.json
+
+For each instance and backend, the model build time, the solve time, a
+digest of the answer, the number of deduction rounds and the encoding size
+are recorded (from the
+`SolveStats` of the solves done by the puzzle module). The compare mode
+prints the differences between two reports and exits with status 1 if it
+finds a regression.
+"""
+
+import argparse
+import datetime
+import hashlib
+import importlib
+import json
+import platform
+import shutil
+import subprocess
+import sys
+import time
+
+import cspuz
+from cspuz.constraints import flatten_iterator
+from cspuz.expr import Expr
+from cspuz.lazy import evaluate
+from cspuz.stats import add_hook, remove_hook
+
+from .puzzle_corpus import instances
+
+BACKENDS = ['sugar', 'sugar_extended', 'z3', 'cnf']
+
+
+def available_backends():
+    ret = []
+    sugar_path = cspuz.config.backend_path or 'sugar'
+    for name in BACKENDS:
+        if name.startswith('sugar'):
+            if shutil.which(sugar_path) is None:
+                continue
+        elif name == 'z3':
+            try:
+                importlib.import_module('z3')
+            except ImportError:
+                continue
+        ret.append(name)
+    return ret
+
+
+def _answer_digest(arrays):
+    values = [
+        evaluate(x) for x in flatten_iterator(arrays) if isinstance(x, Expr)
+    ]
+    return hashlib.sha1(repr(values).encode()).hexdigest()[:16]
+
+
+def _run_instance(module, puzzle, make_args, repeat):
+    solve = getattr(module, 'solve_' + puzzle)
+    best = None
+    for _ in range(repeat):
+        collected = []
+        add_hook(collected.append)
+        try:
+            start = time.perf_counter()
+            res = solve(*make_args(module))
+            elapsed = time.perf_counter() - start
+        finally:
+            remove_hook(collected.append)
+        if best is None or elapsed < best[0]:
+            best = (elapsed, res[0], _answer_digest(res[1:]), collected)
+    elapsed, is_sat, answer, collected = best
+    return {
+        'is_sat': bool(is_sat),
+        'answer': answer,
+        'time': elapsed,
+        'build_time': sum(s.phase_times['build'] for s in collected),
+        'solve_time': sum(s.total_time for s in collected),
+        'rounds': sum(s.num_rounds for s in collected),
+        'backend_calls': sum(s.num_backend_calls for s in collected),
+        'num_variables': sum(s.num_variables for s in collected),
+        'num_constraints': sum(s.num_constraints for s in collected),
+        'csp_bytes': sum(s.csp_bytes for s in collected),
+    }
+
+
+def run(backends, puzzles=None, sizes=None, repeat=1, timeout=None):
+    results = []
+    cspuz.config.solver_timeout = timeout
+    for puzzle, size, make_args in instances():
+        if puzzles and puzzle not in puzzles:
+            continue
+        if sizes and size not in sizes:
+            continue
+        try:
+            module = importlib.import_module('cspuz.puzzle.' + puzzle)
+        except ImportError as e:
+            print('skipping {}: {}'.format(puzzle, e), file=sys.stderr)
+            continue
+        for backend in backends:
+            cspuz.config.default_backend = backend
+            entry = {'puzzle': puzzle, 'size': size, 'backend': backend}
+            try:
+                entry.update(_run_instance(module, puzzle, make_args,
+                                           repeat))
+            except subprocess.TimeoutExpired:
+                entry['timeout'] = True
+            results.append(entry)
+            print('{:<12} {:>6} {:<15} {}'.format(
+                puzzle, size, backend, 'timeout' if entry.get('timeout')
+                else '{:8.3f}s (build {:.3f}s, {} rounds)'.format(
+                    entry['time'], entry['build_time'], entry['rounds'])),
+                  file=sys.stderr,
+                  flush=True)
+    return results
+
+
+def _key(entry):
+    return (entry['puzzle'], entry['size'], entry['backend'])
+
+
+def compare(old, new, threshold=1.2, min_diff=0.05):
+    """Returns the list of regressions of `new` relative to `old`: changes of
+    the answer, timeouts, slowdowns by more than `threshold` times (and
+    `min_diff` seconds), more deduction rounds and larger encodings."""
+    old_entries = {_key(e): e for e in old['results']}
+    regressions = []
+    for entry in new['results']:
+        prev = old_entries.get(_key(entry))
+        if prev is None or prev.get('timeout'):
+            continue
+        name = '{} {} ({})'.format(*_key(entry))
+        if entry.get('timeout'):
+            regressions.append('{}: timeout'.format(name))
+            continue
+        if entry['is_sat'] != prev['is_sat']:
+            regressions.append('{}: is_sat changed from {} to {}'.format(
+                name, prev['is_sat'], entry['is_sat']))
+        elif entry.get('answer') != prev.get('answer') and 'answer' in prev:
+            # the deduced cells differ
+            regressions.append('{}: answer changed'.format(name))
+        for metric in ['build_time', 'solve_time']:
+            if (entry[metric] > prev[metric] * threshold
+                    and entry[metric] - prev[metric] > min_diff):
+                regressions.append('{}: {} {:.3f}s -> {:.3f}s'.format(
+                    name, metric, prev[metric], entry[metric]))
+        for metric in ['rounds', 'csp_bytes']:
+            if entry[metric] > prev[metric] * threshold:
+                regressions.append('{}: {} {} -> {}'.format(
+                    name, metric, prev[metric], entry[metric]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--backend', action='append', choices=BACKENDS)
+    parser.add_argument('--puzzle', action='append')
+    parser.add_argument('--size', action='append')
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--timeout', type=float)
+    parser.add_argument('--output')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'))
+    parser.add_argument('--threshold', type=float, default=1.2)
+    parser.add_argument('--min-diff', type=float, default=0.05)
+    args = parser.parse_args()
+
+    if args.compare is not None:
+        with open(args.compare[0]) as f:
+            old = json.load(f)
+        with open(args.compare[1]) as f:
+            new = json.load(f)
+        regressions = compare(old, new, args.threshold, args.min_diff)
+        for r in regressions:
+            print(r)
+        print('{} regression(s)'.format(len(regressions)))
+        sys.exit(1 if regressions else 0)
+
+    backends = args.backend or available_backends()
+    report = {
+        'created': datetime.datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'backends': backends,
+        'repeat': args.repeat,
+        'results': run(backends, args.puzzle, args.size, args.repeat,
+                       args.timeout),
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=1)
+    else:
+        json.dump(report, sys.stdout, indent=1)
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,10 @@
 from .solver import Solver
+from .assignment import Assignment
 from .constraints import (alldifferent, count_true, cond, fold_and, fold_or)
 from .configuration import config
 from .grid_frame import BoolGridFrame
 
 __all__ = [
-    'Solver', 'alldifferent', 'count_true', 'cond', 'fold_and', 'fold_or',
-    'config', 'BoolGridFrame'
+    'Solver', 'Assignment', 'alldifferent', 'count_true', 'cond', 'fold_and',
+    'fold_or', 'config', 'BoolGridFrame'
 ]
@@ -5,6 +5,7 @@ from .solver import Solver
 from .array import BoolArray2D, IntArray2D
 from .expr import BoolExpr, BoolVar, IntVar
 from .constraints import flatten_iterator
+from .lazy import LazyConstraint
 from .backend import sugar_extended
 
 
@@ -19,6 +20,14 @@ class Analyzer(Solver):
         self.axiom_constraints = []
         self.optional_constraints = []
 
+    def add_lazy_constraint(self, constraint: LazyConstraint):
+        # the analysis is done by `solve_irrefutably` of sugar_extended on
+        # subsets of the constraints, which the cuts cannot be added to
+        raise ValueError(
+            'Analyzer does not support lazy constraints (set '
+            'config.lazy_connectivity to False and do not use '
+            'encoding=\'lazy\')')
+
     def bool_var(self) -> BoolVar:
         self.answer_key_name.append(None)
         return super(Analyzer, self).bool_var()
@@ -69,6 +78,20 @@ class Analyzer(Solver):
             self.optional_constraints.append((name, new_ids))
         self.constraints += flat_constraints
 
+    def _new_csp_solver(self, constraints: List[Any]) -> Any:
+        # graph primitives not supported by sugar_extended are encoded into
+        # auxiliary variables, as in `Solver`
+        variables, constraints = self._expand_primitives(
+            sugar_extended, self.variables, constraints)
+        csp_solver = sugar_extended.CSPSolver(variables)
+        csp_solver.add_constraint(constraints)
+        return csp_solver
+
+    def _solve_irrefutably(self, csp_solver: Any) -> bool:
+        num_aux = len(csp_solver.variables) - len(self.variables)
+        return csp_solver.solve_irrefutably(self.is_answer_key +
+                                            [False] * num_aux)
+
     def _test_unlearnt_fact(self, i, unlearnt_facts, learnt_facts):
         is_active_constraint = [
             True for _ in range(len(self.optional_constraints))
@@ -76,21 +99,18 @@ class Analyzer(Solver):
         is_active_fact = [True for _ in range(len(learnt_facts))]
 
         def check():
-            csp_solver = sugar_extended.CSPSolver(self.variables)
-            csp_solver.add_constraint(
-                [self.constraints[j] for j in self.axiom_constraints])
+            constraints = [self.constraints[j] for j in self.axiom_constraints]
             for k in range(len(self.optional_constraints)):
                 if is_active_constraint[k]:
                     _, cs = self.optional_constraints[k]
-                    csp_solver.add_constraint(
-                        [self.constraints[j] for j in cs])
+                    constraints += [self.constraints[j] for j in cs]
             for k in range(len(learnt_facts)):
                 if is_active_fact[k]:
                     vi, val = learnt_facts[k]
-                    csp_solver.add_constraint(self.variables[vi] == val)
+                    constraints.append(self.variables[vi] == val)
             vi, val = unlearnt_facts[i]
-            csp_solver.add_constraint(self.variables[vi] != val)
-            return not csp_solver.solve()
+            constraints.append(self.variables[vi] != val)
+            return not self._new_csp_solver(constraints).solve()
 
         for j in range(len(is_active_constraint)):
             is_active_constraint[j] = False
@@ -113,10 +133,9 @@ class Analyzer(Solver):
         return score, active_constraint_ids, active_fact_ids
 
     def analyze(self, n_workers: int = 0):
-        csp_solver = sugar_extended.CSPSolver(self.variables)
-        csp_solver.add_constraint(self.constraints)
+        csp_solver = self._new_csp_solver(self.constraints)
 
-        if not csp_solver.solve_irrefutably(self.is_answer_key):
+        if not self._solve_irrefutably(csp_solver):
             return None
 
         unlearnt_facts = []
@@ -141,17 +160,15 @@ class Analyzer(Solver):
             best_cand = min(cand_all)
 
             _, active_constraint_ids, active_fact_ids = best_cand
-            csp_solver = sugar_extended.CSPSolver(self.variables)
-            csp_solver.add_constraint(
-                [self.constraints[i] for i in self.axiom_constraints])
+            constraints = [self.constraints[i] for i in self.axiom_constraints]
             for k in active_constraint_ids:
                 _, cs = self.optional_constraints[k]
-                csp_solver.add_constraint([self.constraints[j] for j in cs])
+                constraints += [self.constraints[j] for j in cs]
             for k in active_fact_ids:
                 vi, val = learnt_facts[k]
-                csp_solver.add_constraint(self.variables[vi] == val)
+                constraints.append(self.variables[vi] == val)
 
-            assert csp_solver.solve_irrefutably(self.is_answer_key)
+            assert self._solve_irrefutably(self._new_csp_solver(constraints))
 
             new_learnt_facts = []
             new_unlearnt_facts = []
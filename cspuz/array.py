@@ -1,9 +1,10 @@
 import functools
+import itertools
 from typing import (Any, Generic, Iterable, Iterator, List, Optional, Tuple,
                     TypeVar, Union, cast, overload)
 
-from .expr import (BoolExpr, BoolExprLike, BoolOp, Expr, ExprLike, IntExpr,
-                   IntExprLike, IntOp, Op, is_bool_op)
+from .expr import (BoolExpr, BoolExprLike, BoolOp, Expr, IntExpr, IntExprLike,
+                   IntOp, Op, is_bool_op)
 
 T = TypeVar('T', bound=Expr)
 IntArray1DLike = Union['IntArray1D', Iterable[IntExprLike]]
@@ -18,6 +19,14 @@ class Array1D(Generic[T]):
         self.data = list(data)
         self.shape = (len(self.data), )
 
+    @classmethod
+    def _wrap(cls, data: List[T]) -> Any:
+        # constructs an array which takes the ownership of `data` (no copy)
+        ret = cls.__new__(cls)
+        ret.data = data
+        ret.shape = (len(data), )
+        return ret
+
     def size(self) -> int:
         return self.shape[0]
 
@@ -63,19 +72,21 @@ def _parse_range(size: int, key: Union[int,
         stop = key.stop
         step = key.step or 1
 
+        # bounds are clamped in the same way as Python's list slicing
+        lower, upper = (0, size) if step > 0 else (-1, size - 1)
         if start is None:
-            start = 0 if step > 0 else size - 1
+            start = lower if step > 0 else upper
         else:
             if start < 0:
                 start += size
-            start = min(max(0, start), size)
+            start = min(max(lower, start), upper)
 
         if stop is None:
-            stop = size if step > 0 else -1
+            stop = upper if step > 0 else lower
         else:
             if stop < 0:
                 stop += size
-            stop = min(max(0, stop), size)
+            stop = min(max(lower, stop), upper)
 
         return False, start, stop, step
 
@@ -117,6 +128,14 @@ class Array2D(Generic[T]):
             self.shape = shape
             self.data = data_list
 
+    @classmethod
+    def _wrap(cls, data: List[T], shape: Tuple[int, int]) -> Any:
+        # constructs an array which takes the ownership of `data` (no copy)
+        ret = cls.__new__(cls)
+        ret.data = data
+        ret.shape = shape
+        return ret
+
     @overload
     def _getitem_impl(self, key: Tuple[int, int]) -> T:
         ...
@@ -148,16 +167,25 @@ class Array2D(Generic[T]):
         if y_fixed and x_fixed:
             return self.data[y_start * self.shape[1] + x_start]
 
-        data = []
-        for i in range(y_size * x_size):
-            y = y_start + y_step * (i // x_size)
-            x = x_start + x_step * (i % x_size)
-            data.append(self.data[y * self.shape[1] + x])
+        # each row is copied by a (C-level) list slice instead of element by
+        # element
+        width = self.shape[1]
+        data: List[T] = []
+        if x_size > 0:
+            x_last = x_start + x_step * (x_size - 1)
+            x_end = x_last + (1 if x_step > 0 else -1)
+            for i in range(y_size):
+                offset = (y_start + y_step * i) * width
+                if offset + x_end < 0:
+                    data += self.data[offset + x_start::x_step]
+                else:
+                    data += self.data[offset + x_start:offset +
+                                      x_end:x_step]
 
         if not (y_fixed or x_fixed):
-            return Array2D(data, (y_size, x_size))
+            return Array2D._wrap(data, (y_size, x_size))
         else:
-            return Array1D(data)
+            return Array1D._wrap(data)
 
     def __iter__(self) -> Iterator[T]:
         return iter(self.data)
@@ -249,34 +277,23 @@ def _elementwise(
 
     size = functools.reduce(lambda x, y: x * y, shape, 1)
 
-    bool_op = is_bool_op(op)
-
-    res: List[Union[BoolExpr, IntExpr]] = []
-    for i in range(size):
-        expr_operands: List[ExprLike] = []
-        for j in range(len(operands)):
-            operand = operands[j]
-            if isinstance(operand, (Array1D, Array2D)):
-                expr_operands.append(operand.data[i])
-            else:
-                expr_operands.append(operand)
-        if bool_op:
-            res.append(BoolExpr(op, expr_operands))
-        else:
-            res.append(IntExpr(op, expr_operands))
-
-    if len(shape) == 1:
-        if bool_op:
-            return BoolArray1D(cast(List[BoolExpr], res))
+    # all the expressions are built in one pass over the zipped operands
+    columns = [
+        operand.data if isinstance(operand, (Array1D, Array2D)) else
+        itertools.repeat(operand, size) for operand in operands
+    ]
+    if is_bool_op(op):
+        bool_res = [BoolExpr(op, x) for x in zip(*columns)]
+        if len(shape) == 1:
+            return BoolArray1D._wrap(bool_res)
         else:
-            return IntArray1D(cast(List[IntExpr], res))
+            return BoolArray2D._wrap(bool_res, cast(Tuple[int, int], shape))
     else:
-        if bool_op:
-            return BoolArray2D(cast(List[BoolExpr], res),
-                               cast(Tuple[int, int], shape))
+        int_res = [IntExpr(op, x) for x in zip(*columns)]
+        if len(shape) == 1:
+            return IntArray1D._wrap(int_res)
         else:
-            return IntArray2D(cast(List[IntExpr], res),
-                              cast(Tuple[int, int], shape))
+            return IntArray2D._wrap(int_res, cast(Tuple[int, int], shape))
 
 
 BoolOperand1D = Union[BoolExprLike, 'BoolArray1D']
@@ -341,7 +358,7 @@ class BoolArray1D(Array1D[BoolExpr]):
         if isinstance(key, int):
             return self.data[key]
         else:
-            return BoolArray1D(self.data[key])
+            return BoolArray1D._wrap(self.data[key])
 
     def __len__(self) -> int:
         return len(self.data)
@@ -403,7 +420,7 @@ class IntArray1D(Array1D[IntExpr]):
         if isinstance(key, int):
             return self.data[key]
         else:
-            return IntArray1D(self.data[key])
+            return IntArray1D._wrap(self.data[key])
 
     def reshape(self, shape: Tuple[int, int]) -> 'IntArray2D':
         return _reshape(self, shape)
@@ -489,9 +506,9 @@ class BoolArray2D(Array2D[BoolExpr]):
     ) -> Union[BoolExpr, BoolArray1D, 'BoolArray2D']:
         ret = super()._getitem_impl(key)
         if isinstance(ret, Array1D):
-            return BoolArray1D(ret.data)
+            return BoolArray1D._wrap(ret.data)
         elif isinstance(ret, Array2D):
-            return BoolArray2D(ret.data, ret.shape)
+            return BoolArray2D._wrap(ret.data, ret.shape)
         else:
             return ret
 
@@ -598,9 +615,9 @@ class IntArray2D(Array2D[IntExpr]):
     ) -> Union[IntExpr, IntArray1D, 'IntArray2D']:
         ret = super()._getitem_impl(key)
         if isinstance(ret, Array1D):
-            return IntArray1D(ret.data)
+            return IntArray1D._wrap(ret.data)
         elif isinstance(ret, Array2D):
-            return IntArray2D(ret.data, ret.shape)
+            return IntArray2D._wrap(ret.data, ret.shape)
         else:
             return ret
 
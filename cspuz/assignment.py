@@ -0,0 +1,108 @@
+"""
+Results of `Solver.solve` / `Solver.find_answer`.
+
+An `Assignment` holds the values found by one call, keyed by variable id.
+The backends work on private copies of the variables of the solver, so that
+the same model can be solved from several threads (or with several sets of
+extra constraints) without the results of the calls overwriting each other.
+The `sol` of the variables of the solver is still set by every call as a
+view of the latest result, for compatibility.
+
+    if solver.solve():
+        assignment = solver.assignment
+        print(assignment[is_black])  # NumPy masked array; masked if unknown
+        print(assignment[is_black[0, 0]])  # True, False or None
+"""
+
+from typing import Any, Dict, List, Optional, Union
+
+from .array import Array1D, Array2D, BoolArray1D, BoolArray2D
+from .expr import BoolVar, Expr, ExprLike, IntVar
+from .grid_frame import BoolGridFrame
+from .lazy import evaluate
+
+Value = Union[None, bool, int]
+
+
+class Assignment(object):
+    is_sat: bool
+    values: Dict[int, Value]
+
+    def __init__(self,
+                 is_sat: bool,
+                 values: Dict[int, Value],
+                 stats: Any = None,
+                 deduction: Any = None):
+        self.is_sat = is_sat
+        self.values = values
+        # `SolveStats` and `DeductionResult` of the call
+        self.stats = stats
+        self.deduction = deduction
+
+    @classmethod
+    def from_variables(cls, is_sat: bool,
+                       variables: List[Any]) -> 'Assignment':
+        return cls(is_sat, {v.id: v.sol for v in variables})
+
+    def __bool__(self) -> bool:
+        return self.is_sat
+
+    def get(self, e: ExprLike, default: Any = None) -> Any:
+        """Returns the value of the variable (or the expression) `e`, or
+        `default` if it is undetermined."""
+        if isinstance(e, Expr) and e.is_variable():
+            ret = self.values.get(e.id)  # type: ignore
+        else:
+            ret = evaluate(e, self)
+        return default if ret is None else ret
+
+    def __getitem__(self, key: Any) -> Any:
+        if isinstance(key, (Array1D, Array2D)):
+            return self._masked_array(key)
+        if isinstance(key, (list, tuple)):
+            return [self.get(e) for e in key]
+        return self.get(key)
+
+    def _masked_array(self, array: Union[Array1D, Array2D]) -> Any:
+        # numpy is needed only here
+        try:
+            import numpy
+        except ImportError:
+            raise ModuleNotFoundError('numpy is not found') from None
+        is_bool = isinstance(array, (BoolArray1D, BoolArray2D))
+        values = [self.get(e) for e in array.data]
+        fill: Optional[Value] = False if is_bool else 0
+        ret = numpy.ma.masked_array([fill if x is None else x for x in values],
+                                    mask=[x is None for x in values],
+                                    dtype=bool if is_bool else int)
+        return ret.reshape(array.shape)
+
+    def detached(self, obj: Any) -> Any:
+        """Returns a copy of `obj` (a variable, an array of variables or a
+        `BoolGridFrame`) made of new variables with the same ids, whose `sol`
+        is set from this assignment. Unlike the variables of the solver, the
+        copy is not affected by later calls."""
+        if isinstance(obj, BoolVar):
+            ret: Any = BoolVar(obj.id)
+            ret.sol = self.values.get(obj.id)
+            return ret
+        if isinstance(obj, IntVar):
+            ret = IntVar(obj.id, obj.lo, obj.hi)
+            ret.sol = self.values.get(obj.id)
+            return ret
+        if isinstance(obj, Array1D):
+            return type(obj)([self.detached(v) for v in obj.data])
+        if isinstance(obj, Array2D):
+            return type(obj)([self.detached(v) for v in obj.data], obj.shape)
+        if isinstance(obj, BoolGridFrame):
+            ret = object.__new__(BoolGridFrame)
+            ret.__dict__.update(obj.__dict__)
+            ret.horizontal = self.detached(obj.horizontal)
+            ret.vertical = self.detached(obj.vertical)
+            return ret
+        raise TypeError('cannot detach {}'.format(type(obj).__name__))
+
+    def __repr__(self) -> str:
+        return 'Assignment(is_sat={}, num_determined={}/{})'.format(
+            self.is_sat, sum(1 for x in self.values.values() if x is not None),
+            len(self.values))
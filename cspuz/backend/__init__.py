@@ -1,3 +1,3 @@
-from . import sugar, sugar_extended, z3
+from . import cnf, portfolio, sugar, sugar_extended, z3
 
-__all__ = ['sugar', 'sugar_extended', 'z3']
+__all__ = ['cnf', 'portfolio', 'sugar', 'sugar_extended', 'z3']
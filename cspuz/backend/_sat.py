@@ -0,0 +1,435 @@
+"""
+Incremental SAT engines used by the cnf backend.
+
+An engine accepts DIMACS-style clauses (lists of nonzero ints) and supports
+solving under assumptions. After a satisfiable call, `value` gives the truth
+value of a literal in the model; after an unsatisfiable one, `core` gives the
+subset of the assumptions responsible for the conflict. If a `deadline`
+(in terms of `time.time()`) is given to `solve` and the search does not end
+by then, `solve` returns None.
+"""
+
+import heapq
+import threading
+import time
+import warnings
+
+try:
+    import pysat.solvers  # type: ignore
+    PYSAT_AVAILABLE = True
+except ImportError:
+    PYSAT_AVAILABLE = False
+
+
+class PySATEngine(object):
+    def __init__(self, name='glucose4'):
+        if not PYSAT_AVAILABLE:
+            raise ModuleNotFoundError('pysat is not found')
+        self.solver = pysat.solvers.Solver(name=name)
+        self.model = None
+
+    def add_clause(self, clause):
+        self.solver.add_clause(clause)
+
+    def solve(self, assumptions=(), deadline=None):
+        if deadline is None:
+            res = self.solver.solve(assumptions=list(assumptions))
+        else:
+            timer = threading.Timer(max(deadline - time.time(), 0.0),
+                                    self.solver.interrupt)
+            timer.start()
+            try:
+                res = self.solver.solve_limited(
+                    assumptions=list(assumptions), expect_interrupt=True)
+            finally:
+                timer.cancel()
+                self.solver.clear_interrupt()
+        if res:
+            self.model = set(self.solver.get_model())
+            return True
+        self.model = None
+        return res
+
+    def value(self, lit):
+        return lit in self.model
+
+    def core(self):
+        return self.solver.get_core() or []
+
+
+def _luby(i):
+    # i-th element (0-origin) of the Luby sequence 1, 1, 2, 1, 1, 2, 4, ...
+    size = 1
+    seq = 0
+    while size < i + 1:
+        seq += 1
+        size = 2 * size + 1
+    while size - 1 != i:
+        size = (size - 1) >> 1
+        seq -= 1
+        i = i % size
+    return 1 << seq
+
+
+class BuiltinEngine(object):
+    """A small CDCL solver written in pure Python.
+
+    It implements two-watched-literal propagation, first-UIP learning, VSIDS
+    and Luby restarts, which is enough for puzzle-sized instances when no
+    native SAT solver is available.
+    """
+    def __init__(self):
+        self.num_vars = 0
+        self.vals = {}
+        self.watches = {}
+        self.bin_watches = {}
+        self.level = [0]
+        self.reason = [None]
+        self.activity = [0.0]
+        self.polarity = [False]
+        self.seen = [False]
+        self.in_heap = [False]
+        self.heap = []
+        self.trail = []
+        self.trail_lim = []
+        self.qhead = 0
+        self.var_inc = 1.0
+        self.ok = True
+        self.model = None
+        self.conflict = []
+
+    def _ensure_var(self, v):
+        while self.num_vars < v:
+            self.num_vars += 1
+            u = self.num_vars
+            self.vals[u] = 0
+            self.vals[-u] = 0
+            self.watches[u] = []
+            self.watches[-u] = []
+            self.bin_watches[u] = []
+            self.bin_watches[-u] = []
+            self.level.append(0)
+            self.reason.append(None)
+            self.activity.append(0.0)
+            self.polarity.append(False)
+            self.seen.append(False)
+            self.in_heap.append(True)
+            heapq.heappush(self.heap, (0.0, u))
+
+    def _enqueue(self, lit, reason):
+        self.vals[lit] = 1
+        self.vals[-lit] = -1
+        v = lit if lit > 0 else -lit
+        self.level[v] = len(self.trail_lim)
+        self.reason[v] = reason
+        self.trail.append(lit)
+
+    def _cancel_until(self, lvl):
+        if len(self.trail_lim) <= lvl:
+            return
+        vals = self.vals
+        reason = self.reason
+        polarity = self.polarity
+        in_heap = self.in_heap
+        activity = self.activity
+        heap = self.heap
+        start = self.trail_lim[lvl]
+        for i in range(len(self.trail) - 1, start - 1, -1):
+            lit = self.trail[i]
+            v = lit if lit > 0 else -lit
+            vals[lit] = 0
+            vals[-lit] = 0
+            reason[v] = None
+            polarity[v] = lit > 0
+            if not in_heap[v]:
+                in_heap[v] = True
+                heapq.heappush(heap, (-activity[v], v))
+        del self.trail[start:]
+        del self.trail_lim[lvl:]
+        self.qhead = len(self.trail)
+
+    def _propagate(self):
+        vals = self.vals
+        watches = self.watches
+        bin_watches = self.bin_watches
+        trail = self.trail
+        level = self.level
+        reason = self.reason
+        cur_level = len(self.trail_lim)
+        while self.qhead < len(trail):
+            p = trail[self.qhead]
+            self.qhead += 1
+            false_lit = -p
+            for q, c in bin_watches[false_lit]:
+                val = vals[q]
+                if val == 1:
+                    continue
+                if val == -1:
+                    return c
+                vals[q] = 1
+                vals[-q] = -1
+                v = q if q > 0 else -q
+                level[v] = cur_level
+                reason[v] = c
+                trail.append(q)
+            ws = watches[false_lit]
+            kept = []
+            conflict = None
+            n = len(ws)
+            idx = 0
+            while idx < n:
+                c = ws[idx]
+                idx += 1
+                if c[0] == false_lit:
+                    c[0] = c[1]
+                    c[1] = false_lit
+                first = c[0]
+                if vals[first] == 1:
+                    kept.append(c)
+                    continue
+                for k in range(2, len(c)):
+                    lk = c[k]
+                    if vals[lk] != -1:
+                        c[1] = lk
+                        c[k] = false_lit
+                        watches[lk].append(c)
+                        break
+                else:
+                    kept.append(c)
+                    if vals[first] == -1:
+                        conflict = c
+                        kept.extend(ws[idx:])
+                        break
+                    vals[first] = 1
+                    vals[-first] = -1
+                    v = first if first > 0 else -first
+                    level[v] = cur_level
+                    reason[v] = c
+                    trail.append(first)
+            watches[false_lit] = kept
+            if conflict is not None:
+                return conflict
+        return None
+
+    def _bump(self, v):
+        self.activity[v] += self.var_inc
+        if self.activity[v] > 1e100:
+            for u in range(1, self.num_vars + 1):
+                self.activity[u] *= 1e-100
+            self.var_inc *= 1e-100
+        if self.vals[v] == 0:
+            self.in_heap[v] = True
+            heapq.heappush(self.heap, (-self.activity[v], v))
+
+    def _analyze(self, confl):
+        seen = self.seen
+        level = self.level
+        trail = self.trail
+        cur_level = len(self.trail_lim)
+        learnt = [0]
+        to_clear = []
+        path_count = 0
+        p = None
+        idx = len(trail) - 1
+        while True:
+            for q in (confl if p is None else confl[1:]):
+                v = q if q > 0 else -q
+                if not seen[v] and level[v] > 0:
+                    seen[v] = True
+                    to_clear.append(v)
+                    self._bump(v)
+                    if level[v] >= cur_level:
+                        path_count += 1
+                    else:
+                        learnt.append(q)
+            while True:
+                lit = trail[idx]
+                if seen[lit if lit > 0 else -lit]:
+                    break
+                idx -= 1
+            p = trail[idx]
+            idx -= 1
+            pv = p if p > 0 else -p
+            confl = self.reason[pv]
+            seen[pv] = False
+            path_count -= 1
+            if path_count == 0:
+                break
+        learnt[0] = -p
+        for v in to_clear:
+            seen[v] = False
+
+        if len(learnt) == 1:
+            return learnt, 0
+        max_i = 1
+        for i in range(2, len(learnt)):
+            if level[abs(learnt[i])] > level[abs(learnt[max_i])]:
+                max_i = i
+        learnt[1], learnt[max_i] = learnt[max_i], learnt[1]
+        return learnt, level[abs(learnt[1])]
+
+    def _analyze_final(self, p):
+        # `p` is an assumption which is falsified by the other assumptions
+        core = [p]
+        if len(self.trail_lim) == 0:
+            return core
+        seen = self.seen
+        seen[abs(p)] = True
+        for i in range(len(self.trail) - 1, self.trail_lim[0] - 1, -1):
+            lit = self.trail[i]
+            v = abs(lit)
+            if seen[v]:
+                r = self.reason[v]
+                if r is None:
+                    if self.level[v] > 0:
+                        core.append(lit)
+                else:
+                    for q in r[1:]:
+                        if self.level[abs(q)] > 0:
+                            seen[abs(q)] = True
+                seen[v] = False
+        seen[abs(p)] = False
+        return core
+
+    def _pick_branch_var(self):
+        vals = self.vals
+        heap = self.heap
+        while len(heap) > 0:
+            _, v = heapq.heappop(heap)
+            self.in_heap[v] = False
+            if vals[v] == 0:
+                return v
+        for v in range(1, self.num_vars + 1):
+            if vals[v] == 0:
+                return v
+        return 0
+
+    def _attach(self, clause):
+        if len(clause) == 2:
+            a, b = clause
+            self.bin_watches[a].append((b, [b, a]))
+            self.bin_watches[b].append((a, clause))
+        else:
+            self.watches[clause[0]].append(clause)
+            self.watches[clause[1]].append(clause)
+
+    def add_clause(self, clause):
+        if not self.ok:
+            return
+        self._cancel_until(0)
+        lits = []
+        for lit in clause:
+            self._ensure_var(abs(lit))
+            val = self.vals[lit]
+            if val == 1 or -lit in lits:
+                return
+            if val == -1 or lit in lits:
+                continue
+            lits.append(lit)
+        if len(lits) == 0:
+            self.ok = False
+        elif len(lits) == 1:
+            self._enqueue(lits[0], None)
+            if self._propagate() is not None:
+                self.ok = False
+        else:
+            self._attach(lits)
+
+    def solve(self, assumptions=(), deadline=None):
+        self.model = None
+        self.conflict = []
+        if not self.ok:
+            return False
+        for lit in assumptions:
+            self._ensure_var(abs(lit))
+        self._cancel_until(0)
+
+        vals = self.vals
+        num_conflicts = 0
+        num_restarts = 0
+        restart_limit = 100 * _luby(0)
+        while True:
+            confl = self._propagate()
+            if confl is not None:
+                num_conflicts += 1
+                if len(self.trail_lim) == 0:
+                    self.ok = False
+                    return False
+                if deadline is not None and time.time() >= deadline:
+                    self._cancel_until(0)
+                    return None
+                learnt, backtrack_level = self._analyze(confl)
+                self._cancel_until(backtrack_level)
+                if len(learnt) == 1:
+                    self._enqueue(learnt[0], None)
+                else:
+                    self._attach(learnt)
+                    self._enqueue(learnt[0], learnt)
+                self.var_inc /= 0.95
+                if num_conflicts >= restart_limit:
+                    num_conflicts = 0
+                    num_restarts += 1
+                    restart_limit = 100 * _luby(num_restarts)
+                    self._cancel_until(0)
+                continue
+
+            lvl = len(self.trail_lim)
+            if lvl < len(assumptions):
+                p = assumptions[lvl]
+                if vals[p] == 1:
+                    # already satisfied: open a dummy level
+                    self.trail_lim.append(len(self.trail))
+                elif vals[p] == -1:
+                    self.conflict = self._analyze_final(p)
+                    self._cancel_until(0)
+                    return False
+                else:
+                    self.trail_lim.append(len(self.trail))
+                    self._enqueue(p, None)
+                continue
+
+            v = self._pick_branch_var()
+            if v == 0:
+                self.model = [False] + [
+                    vals[u] == 1 for u in range(1, self.num_vars + 1)
+                ]
+                self._cancel_until(0)
+                return True
+            self.trail_lim.append(len(self.trail))
+            self._enqueue(v if self.polarity[v] else -v, None)
+
+    def value(self, lit):
+        if abs(lit) >= len(self.model):
+            # a variable which appears in no clause
+            return lit < 0
+        if lit > 0:
+            return self.model[lit]
+        else:
+            return not self.model[-lit]
+
+    def core(self):
+        return self.conflict
+
+
+def make_engine(name):
+    if name == 'auto':
+        if PYSAT_AVAILABLE:
+            name = 'pysat'
+        else:
+            warnings.warn(
+                'PySAT is not installed, so the cnf backend uses its SAT '
+                'solver written in pure Python, which is much slower; '
+                'install it by `pip install python-sat` (or the `pysat` '
+                'extra of cspuz), or set config.cnf_sat_engine to '
+                '\'builtin\' to silence this warning',
+                RuntimeWarning,
+                stacklevel=2)
+            name = 'builtin'
+    if name == 'builtin':
+        return BuiltinEngine()
+    elif name == 'pysat':
+        return PySATEngine()
+    elif name.startswith('pysat:'):
+        return PySATEngine(name[6:])
+    else:
+        raise ValueError('invalid SAT engine {}'.format(name))
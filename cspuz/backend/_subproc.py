@@ -1,6 +1,9 @@
-import warnings
+import asyncio
+import os
 import subprocess
 import signal
+import tempfile
+import time
 
 try:
     import psutil  # type: ignore
@@ -9,28 +12,111 @@ except ImportError:
     _PSUTIL_AVAILABLE = False
 
 
-def run_subprocess(args, input, timeout=None):
-    if timeout and not _PSUTIL_AVAILABLE:
-        warnings.warn('psutil not found; timeout is ignored')
-    if timeout and _PSUTIL_AVAILABLE:
-        proc = subprocess.Popen(args,
-                                stdin=subprocess.PIPE,
-                                stdout=subprocess.PIPE,
-                                stderr=subprocess.PIPE)
+def _terminate_process_tree(pid):
+    if _PSUTIL_AVAILABLE:
         try:
-            out, _ = proc.communicate(input.encode('ascii'), timeout=timeout)
-            out = out.decode('utf-8')
-        except subprocess.TimeoutExpired:
-            parent = psutil.Process(proc.pid)
+            parent = psutil.Process(pid)
             children = parent.children(recursive=True)
             children.append(parent)
-            for p in children:
+        except psutil.NoSuchProcess:
+            return
+        for p in children:
+            try:
                 p.send_signal(signal.SIGTERM)
-            raise
-        return out
+            except psutil.NoSuchProcess:
+                pass
     else:
-        res = subprocess.run(args,
-                             input=input.encode('ascii'),
-                             stdout=subprocess.PIPE)
-        out = res.stdout.decode('utf-8')
-        return out
+        # without psutil the process was started in its own session, so
+        # that the whole tree can be signalled as a process group
+        try:
+            os.killpg(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+
+def _spool_input(input):
+    # `input` is either a str or a function writing the input to a binary
+    # stream. In the latter case, the input is written to a temporary file,
+    # from which the subprocess reads, so that it is never held in memory as
+    # a whole. Returns the arguments of the input for `Popen`.
+    if isinstance(input, str):
+        return subprocess.PIPE, input.encode('ascii')
+    f = tempfile.TemporaryFile()
+    try:
+        input(f)
+        f.seek(0)
+    except BaseException:
+        f.close()
+        raise
+    return f, None
+
+
+def call_timeout(deadline, timeout=None):
+    """Returns the timeout of a backend call which must end by `deadline`
+    (in terms of `time.time()`, or None) and within `timeout` seconds.
+    Raises `TimeoutExpired` if the deadline has already passed."""
+    if deadline is None:
+        return timeout
+    remaining = deadline - time.time()
+    if remaining <= 0:
+        raise subprocess.TimeoutExpired('backend', 0)
+    if timeout is None:
+        return remaining
+    return min(timeout, remaining)
+
+
+def run_subprocess(args, input, timeout=None):
+    stdin, data = _spool_input(input)
+    try:
+        # without psutil the process is started in its own session, so that
+        # the whole tree can be terminated on timeout
+        proc = subprocess.Popen(
+            args,
+            stdin=stdin,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE if timeout else None,
+            start_new_session=bool(timeout) and not _PSUTIL_AVAILABLE)
+        try:
+            out, _ = proc.communicate(data, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            _terminate_process_tree(proc.pid)
+            proc.communicate()
+            raise
+        except BaseException:
+            proc.kill()
+            proc.wait()
+            raise
+        return out.decode('utf-8')
+    finally:
+        if data is None:
+            stdin.close()
+
+
+async def run_subprocess_async(args, input, timeout=None):
+    """Same as `run_subprocess`, but does not block the event loop.
+
+    If the awaiting task is cancelled or `timeout` expires, the whole process
+    tree is terminated before `CancelledError` (or `TimeoutExpired`) is
+    propagated.
+    """
+    stdin, data = _spool_input(input)
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *args,
+            stdin=stdin,
+            stdout=asyncio.subprocess.PIPE,
+            start_new_session=not _PSUTIL_AVAILABLE)
+        try:
+            out, _ = await asyncio.wait_for(proc.communicate(data), timeout)
+        except asyncio.TimeoutError:
+            _terminate_process_tree(proc.pid)
+            await proc.wait()
+            raise subprocess.TimeoutExpired(args, timeout)
+        except BaseException:
+            _terminate_process_tree(proc.pid)
+            await asyncio.shield(proc.wait())
+            raise
+    finally:
+        if data is None:
+            stdin.close()
+    return out.decode('utf-8')
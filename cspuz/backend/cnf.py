@@ -0,0 +1,416 @@
+"""
+CSP backend which encodes constraints into CNF in-process.
+
+Integer terms are represented in the order encoding and boolean connectives
+are encoded by the Tseitin transformation. The CNF is fed to an incremental
+SAT engine (PySAT if available, otherwise a pure-Python one), so that no
+subprocess is launched and deduction can be done under assumptions.
+"""
+
+import bisect
+import subprocess
+
+from ..configuration import config
+from ..expr import Op, Expr, BoolExpr, BoolVar, IntVar
+from ..interning import ExprPool
+from ._sat import make_engine
+
+
+def _constant(e):
+    if isinstance(e, int) and not isinstance(e, bool):
+        return e
+    if isinstance(e, Expr) and e.op == Op.INT_CONSTANT:
+        return e.operands[0]
+    return None
+
+
+class _OrderInt(object):
+    # `lits[k]` is the literal for `x >= values[k]` (`lits[0]` is always
+    # true and is never used)
+    def __init__(self, values, lits):
+        self.values = values
+        self.lits = lits
+
+    def is_constant(self):
+        return len(self.values) == 1
+
+
+class CSPSolver(object):
+    def __init__(self, variables, engine=None):
+        self.variables = variables
+        self.engine = make_engine(engine or config.cnf_sat_engine)
+        self.num_sat_vars = 0
+        self.true_lit = self._new_lit()
+        self.engine.add_clause([self.true_lit])
+        self.memo = dict()
+        self.count_memo = dict()
+        # structurally identical subexpressions share one canonical node,
+        # and therefore one set of SAT variables, through the pool
+        self.pool = ExprPool() if config.share_subexpressions else None
+        self.var_lits = dict()
+        self.last_assumptions = []
+        # `time.time()` by which each call must end, set by `Solver.solve`
+        self.deadline = None
+
+        for v in variables:
+            if isinstance(v, BoolVar):
+                self.var_lits[v.id] = self._new_lit()
+            elif isinstance(v, IntVar):
+                self.var_lits[v.id] = self._new_int(
+                    list(range(v.lo, v.hi + 1)))
+            else:
+                raise TypeError()
+
+    def _new_lit(self):
+        self.num_sat_vars += 1
+        return self.num_sat_vars
+
+    def _add_clause(self, clause):
+        lits = []
+        for lit in clause:
+            if lit == self.true_lit:
+                return
+            if lit != -self.true_lit:
+                lits.append(lit)
+        self.engine.add_clause(lits)
+
+    def _new_int(self, values):
+        lits = [self.true_lit] + [self._new_lit() for _ in values[1:]]
+        for k in range(2, len(values)):
+            self._add_clause([-lits[k], lits[k - 1]])
+        return _OrderInt(values, lits)
+
+    def _ge(self, x, v):
+        # literal for `x >= v`
+        k = bisect.bisect_left(x.values, v)
+        if k == 0:
+            return self.true_lit
+        elif k == len(x.values):
+            return -self.true_lit
+        else:
+            return x.lits[k]
+
+    def _gate_and(self, lits):
+        lits2 = []
+        for lit in lits:
+            if lit == -self.true_lit:
+                return -self.true_lit
+            if lit != self.true_lit:
+                lits2.append(lit)
+        if len(lits2) == 0:
+            return self.true_lit
+        if len(lits2) == 1:
+            return lits2[0]
+        r = self._new_lit()
+        for lit in lits2:
+            self._add_clause([-r, lit])
+        self._add_clause([r] + [-lit for lit in lits2])
+        return r
+
+    def _gate_iff(self, a, b):
+        if a == self.true_lit or a == -self.true_lit:
+            return b if a == self.true_lit else -b
+        if b == self.true_lit or b == -self.true_lit:
+            return a if b == self.true_lit else -a
+        r = self._new_lit()
+        self._add_clause([-r, -a, b])
+        self._add_clause([-r, a, -b])
+        self._add_clause([r, a, b])
+        self._add_clause([r, -a, -b])
+        return r
+
+    def _le(self, x, y):
+        # literal for `x <= y`
+        if x.values[-1] <= y.values[0]:
+            return self.true_lit
+        if x.values[0] > y.values[-1]:
+            return -self.true_lit
+        if y.is_constant():
+            return -self._ge(x, y.values[0] + 1)
+        if x.is_constant():
+            return self._ge(y, x.values[0])
+        r = self._new_lit()
+        for a in x.values:
+            self._add_clause([-r, -self._ge(x, a), self._ge(y, a)])
+        for b in y.values:
+            self._add_clause([r, -self._ge(y, b), self._ge(x, b + 1)])
+        return r
+
+    def _neg(self, x):
+        n = len(x.values)
+        values = [-v for v in reversed(x.values)]
+        lits = [self.true_lit] + [-x.lits[n - k] for k in range(1, n)]
+        return _OrderInt(values, lits)
+
+    def _cap(self, x, cap):
+        # `min(x, cap)`, which needs no new variable
+        if cap is None or x.values[-1] <= cap:
+            return x
+        k = bisect.bisect_left(x.values, cap)
+        if k == 0:
+            return _OrderInt([cap], [self.true_lit])
+        return _OrderInt(x.values[:k] + [cap], x.lits[:k + 1])
+
+    def _add(self, x, y, cap=None):
+        # `x + y`, or `min(x + y, cap)` if `cap` is given
+        if y.is_constant() or x.is_constant():
+            if x.is_constant():
+                x, y = y, x
+            c = y.values[0]
+            return self._cap(_OrderInt([v + c for v in x.values], x.lits),
+                             cap)
+        values = set(a + b for a in x.values for b in y.values)
+        if cap is not None:
+            values = set(min(v, cap) for v in values)
+        z = self._new_int(sorted(values))
+        for a in x.values:
+            for b in y.values:
+                s = a + b if cap is None else min(a + b, cap)
+                self._add_clause(
+                    [-self._ge(x, a), -self._ge(y, b),
+                     self._ge(z, s)])
+                self._add_clause([
+                    self._ge(x, a + 1),
+                    self._ge(y, b + 1), -self._ge(z, a + b + 1)
+                ])
+        return z
+
+    def _sum(self, terms, cap=None):
+        # balanced merging keeps intermediate domains small (for 0-1 terms,
+        # this is a totalizer)
+        terms = [self._cap(x, cap) for x in terms]
+        while len(terms) > 1:
+            merged = []
+            for i in range(0, len(terms) - 1, 2):
+                merged.append(self._add(terms[i], terms[i + 1], cap))
+            if len(terms) % 2 == 1:
+                merged.append(terms[-1])
+            terms = merged
+        return terms[0]
+
+    def _count_true(self, e, cap=None):
+        # order-encoded `count_true(...)`; with `cap`, counting stops at
+        # `cap`, which suffices for the comparison with a constant below
+        # `cap` and keeps the totalizer small
+        key = (id(e), cap)
+        if key in self.count_memo:
+            return self.count_memo[key][1]
+        zero = _OrderInt([0], [self.true_lit])
+        one = _OrderInt([1], [self.true_lit])
+        terms = [
+            self._if(self._convert_bool(x), one, zero) for x in e.operands
+        ]
+        ret = self._sum(terms, cap) if len(terms) > 0 else zero
+        self.count_memo[key] = (e, ret)
+        return ret
+
+    def _compared_ints(self, a, b):
+        # a cardinality compared with a constant `k` is counted up to `k + 1`
+        for c, d in ((a, b), (b, a)):
+            if isinstance(c, Expr) and c.op == Op.COUNT_TRUE:
+                k = _constant(d)
+                if k is not None:
+                    x = self._count_true(c, max(k + 1, 0))
+                    y = self._convert_int(d)
+                    return (x, y) if c is a else (y, x)
+        return self._convert_int(a), self._convert_int(b)
+
+    def _if(self, c, t, f):
+        if c == self.true_lit:
+            return t
+        if c == -self.true_lit:
+            return f
+        if t.is_constant() and f.is_constant():
+            a = t.values[0]
+            b = f.values[0]
+            if a == b:
+                return t
+            elif a > b:
+                return _OrderInt([b, a], [self.true_lit, c])
+            else:
+                return _OrderInt([a, b], [self.true_lit, -c])
+        z = self._new_int(sorted(set(t.values) | set(f.values)))
+        for v in z.values[1:]:
+            zv = self._ge(z, v)
+            self._add_clause([-c, -self._ge(t, v), zv])
+            self._add_clause([-c, self._ge(t, v), -zv])
+            self._add_clause([c, -self._ge(f, v), zv])
+            self._add_clause([c, self._ge(f, v), -zv])
+        return z
+
+    def _convert_operands(self, e):
+        # Converts the subexpressions of `e` bottom-up with an explicit
+        # stack, so that converting `e` itself only looks up its operands
+        # and deeply nested expressions do not hit the recursion limit.
+        stack = [(x, False) for x in e.operands]
+        while len(stack) > 0:
+            x, expanded = stack.pop()
+            if not isinstance(x, Expr) or x.is_variable() or id(
+                    x) in self.memo:
+                continue
+            if not expanded:
+                stack.append((x, True))
+                for y in x.operands:
+                    stack.append((y, False))
+            elif x.op != Op.COUNT_TRUE:
+                # a cardinality is converted by its parent, which may cap it
+                if isinstance(x, BoolExpr):
+                    self._convert_bool(x)
+                else:
+                    self._convert_int(x)
+
+    def _convert_int(self, e):
+        if isinstance(e, int):
+            return _OrderInt([e], [self.true_lit])
+        if not isinstance(e, Expr):
+            raise TypeError()
+        if isinstance(e, IntVar):
+            return self.var_lits[e.id]
+        key = id(e)
+        if key in self.memo:
+            return self.memo[key][1]
+        self._convert_operands(e)
+
+        if e.op == Op.INT_CONSTANT:
+            ret = _OrderInt([e.operands[0]], [self.true_lit])
+        elif e.op == Op.NEG:
+            ret = self._neg(self._convert_int(e.operands[0]))
+        elif e.op == Op.ADD:
+            ret = self._sum([self._convert_int(x) for x in e.operands])
+        elif e.op == Op.SUB:
+            ret = self._convert_int(e.operands[0])
+            for x in e.operands[1:]:
+                ret = self._add(ret, self._neg(self._convert_int(x)))
+        elif e.op == Op.IF:
+            ret = self._if(self._convert_bool(e.operands[0]),
+                           self._convert_int(e.operands[1]),
+                           self._convert_int(e.operands[2]))
+        elif e.op == Op.COUNT_TRUE:
+            ret = self._count_true(e)
+        else:
+            raise ValueError('unsupported operator {}'.format(e.op))
+        self.memo[key] = (e, ret)
+        return ret
+
+    def _convert_bool(self, e):
+        if isinstance(e, bool):
+            return self.true_lit if e else -self.true_lit
+        if not isinstance(e, Expr):
+            raise TypeError()
+        if isinstance(e, BoolVar):
+            return self.var_lits[e.id]
+        key = id(e)
+        if key in self.memo:
+            return self.memo[key][1]
+        self._convert_operands(e)
+
+        op = e.op
+        if op == Op.BOOL_CONSTANT:
+            ret = self.true_lit if e.operands[0] else -self.true_lit
+        elif op == Op.NOT:
+            ret = -self._convert_bool(e.operands[0])
+        elif op == Op.AND:
+            ret = self._gate_and(
+                [self._convert_bool(x) for x in e.operands])
+        elif op == Op.OR:
+            ret = -self._gate_and(
+                [-self._convert_bool(x) for x in e.operands])
+        elif op == Op.IMP:
+            ret = -self._gate_and([
+                self._convert_bool(e.operands[0]),
+                -self._convert_bool(e.operands[1])
+            ])
+        elif op == Op.IFF:
+            ret = self._gate_iff(self._convert_bool(e.operands[0]),
+                                 self._convert_bool(e.operands[1]))
+        elif op == Op.XOR:
+            ret = -self._gate_iff(self._convert_bool(e.operands[0]),
+                                  self._convert_bool(e.operands[1]))
+        elif op in (Op.EQ, Op.NE, Op.LE, Op.LT, Op.GE, Op.GT):
+            x, y = self._compared_ints(e.operands[0], e.operands[1])
+            if op == Op.EQ:
+                ret = self._gate_and([self._le(x, y), self._le(y, x)])
+            elif op == Op.NE:
+                ret = -self._gate_and([self._le(x, y), self._le(y, x)])
+            elif op == Op.LE:
+                ret = self._le(x, y)
+            elif op == Op.LT:
+                ret = -self._le(y, x)
+            elif op == Op.GE:
+                ret = self._le(y, x)
+            else:
+                ret = -self._le(x, y)
+        elif op == Op.ALLDIFF:
+            terms = [self._convert_int(x) for x in e.operands]
+            ret = self._gate_and([
+                -self._gate_and([self._le(x, y), self._le(y, x)])
+                for i, x in enumerate(terms) for y in terms[:i]
+            ])
+        else:
+            raise ValueError('unsupported operator {}'.format(op))
+        self.memo[key] = (e, ret)
+        return ret
+
+    def _ensure(self, e):
+        # top-level conjunctions and disjunctions need no Tseitin variable
+        stack = [e]
+        while len(stack) > 0:
+            x = stack.pop()
+            if isinstance(x, Expr) and x.op == Op.AND:
+                stack += reversed(x.operands)
+            elif isinstance(x, Expr) and x.op == Op.OR:
+                self._add_clause([self._convert_bool(y) for y in x.operands])
+            else:
+                self._add_clause([self._convert_bool(x)])
+
+    def _intern(self, e):
+        return e if self.pool is None else self.pool.intern(e)
+
+    def add_constraint(self, constraint):
+        if isinstance(constraint, list):
+            for e in constraint:
+                self._ensure(self._intern(e))
+        else:
+            self._ensure(self._intern(constraint))
+
+    def _load_model(self):
+        for v in self.variables:
+            x = self.var_lits[v.id]
+            if isinstance(v, BoolVar):
+                v.sol = self.engine.value(x)
+            else:
+                sol = x.values[0]
+                for k in range(1, len(x.values)):
+                    if not self.engine.value(x.lits[k]):
+                        break
+                    sol = x.values[k]
+                v.sol = sol
+
+    def solve(self):
+        return self.solve_with_assumptions([])
+
+    def solve_with_assumptions(self, assumptions):
+        self.last_assumptions = [
+            self._convert_bool(self._intern(e)) for e in assumptions
+        ]
+        lits = []
+        for lit in self.last_assumptions:
+            if lit == -self.true_lit:
+                return False
+            if lit != self.true_lit:
+                lits.append(lit)
+        res = self.engine.solve(lits, self.deadline)
+        if res is None:
+            raise subprocess.TimeoutExpired('cnf', 0)
+        if not res:
+            return False
+        self._load_model()
+        return True
+
+    def unsat_core(self):
+        if -self.true_lit in self.last_assumptions:
+            return [self.last_assumptions.index(-self.true_lit)]
+        core = set(self.engine.core())
+        return [
+            i for i, lit in enumerate(self.last_assumptions) if lit in core
+        ]
@@ -0,0 +1,280 @@
+"""
+CSP backend which races several backends on the same problem.
+
+The entries of the portfolio are given by `config.portfolio`
+(`$CSPUZ_PORTFOLIO`), a comma-separated list of backend names, each of which
+may be followed by configuration overrides in the form of a URL query, e.g.
+
+    sugar_extended,z3,cnf?cnf_sat_engine=builtin
+
+Every entry is run in its own process, which solves the whole problem (with
+the deduction procedure of its backend in `Solver.solve`). The first result
+is taken, and the processes of the other entries (including their backend
+subprocesses) are terminated. Entries which fail, e.g. because the backend
+is not installed, are ignored as long as another entry succeeds.
+
+The winner of each race is recorded for the current puzzle type (see
+`puzzle_type`). Once enough races have been won, only the entries which win
+reasonably often are started, except for one race out of
+`_EXPLORATION_INTERVAL`, which starts all the entries again. The record can
+be kept across runs in a JSON file given by `config.portfolio_record_path`.
+"""
+
+import contextlib
+import importlib
+import json
+import multiprocessing
+import multiprocessing.connection
+import os
+import subprocess
+import threading
+import time
+from distutils.util import strtobool
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qsl
+
+from ..configuration import Config, config
+from ._subproc import _terminate_process_tree, call_timeout
+
+# number of races of a puzzle type before the entries are selected
+_MIN_RACES = 10
+# one race out of this many starts all the entries
+_EXPLORATION_INTERVAL = 10
+# entries winning at least this ratio of the wins of the best entry are
+# started
+_MIN_WIN_RATIO = 0.25
+
+_local = threading.local()
+
+
+@contextlib.contextmanager
+def puzzle_type(name: str) -> Iterator[None]:
+    """Problems solved in this context (in the current thread) are recorded
+    as puzzles of type `name`, e.g. `with puzzle_type('slitherlink'): ...`.
+    """
+    previous = getattr(_local, 'puzzle_type', None)
+    _local.puzzle_type = name
+    try:
+        yield
+    finally:
+        _local.puzzle_type = previous
+
+
+def _parse_value(key: str, value: str) -> Any:
+    t = Config.__annotations__.get(key)
+    if t is None:
+        raise ValueError('unknown configuration {}'.format(key))
+    if t is bool:
+        return strtobool(value)
+    if t is int:
+        return int(value)
+    if t is float or t == Optional[float]:
+        return float(value)
+    return value
+
+
+def parse_entry(entry: str) -> Tuple[str, Dict[str, Any]]:
+    """Returns the backend name of `entry` and its configuration overrides."""
+    name, _, query = entry.partition('?')
+    overrides = dict()
+    for key, value in parse_qsl(query, keep_blank_values=True):
+        overrides[key] = _parse_value(key, value)
+    return name, overrides
+
+
+def get_entries() -> List[str]:
+    return [e.strip() for e in config.portfolio.split(',') if e.strip()]
+
+
+def supports_op(op):
+    # a primitive is passed to the entries only if all of them accept it
+    from ..primitives import supports
+    for entry in get_entries():
+        name, overrides = parse_entry(entry)
+        backend = importlib.import_module('cspuz.backend.' + name)
+        saved = {key: getattr(config, key) for key in overrides}
+        try:
+            for key, value in overrides.items():
+                setattr(config, key, value)
+            if not supports(backend, op):
+                return False
+        finally:
+            for key, value in saved.items():
+                setattr(config, key, value)
+    return True
+
+
+class _Record(object):
+    # puzzle type -> number of races and wins of each entry
+    def __init__(self):
+        self.races: Dict[str, int] = dict()
+        self.wins: Dict[str, Dict[str, int]] = dict()
+        self.path: Optional[str] = None
+        self.lock = threading.Lock()
+
+    def _sync_path(self) -> None:
+        # (re)loads the record when `config.portfolio_record_path` changes
+        path = config.portfolio_record_path
+        if path == self.path:
+            return
+        self.path = path
+        self.races = dict()
+        self.wins = dict()
+        if path is not None and os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            self.races = data['races']
+            self.wins = data['wins']
+
+    def _save(self) -> None:
+        if self.path is None:
+            return
+        tmp_path = '{}.{}.tmp'.format(self.path, os.getpid())
+        with open(tmp_path, 'w') as f:
+            json.dump({'races': self.races, 'wins': self.wins}, f)
+        os.replace(tmp_path, self.path)
+
+    def select(self, ptype: str, entries: List[str]) -> List[str]:
+        with self.lock:
+            self._sync_path()
+            races = self.races.get(ptype, 0)
+            wins = self.wins.get(ptype, {})
+        if races < _MIN_RACES or races % _EXPLORATION_INTERVAL == 0:
+            return entries
+        best = max(wins.get(e, 0) for e in entries)
+        if best == 0:
+            return entries
+        return [e for e in entries if wins.get(e, 0) >= best * _MIN_WIN_RATIO]
+
+    def add(self, ptype: str, winner: Optional[str]) -> None:
+        with self.lock:
+            self._sync_path()
+            self.races[ptype] = self.races.get(ptype, 0) + 1
+            if winner is not None:
+                wins = self.wins.setdefault(ptype, {})
+                wins[winner] = wins.get(winner, 0) + 1
+            self._save()
+
+
+_record = _Record()
+
+
+def get_record() -> Dict[str, Dict[str, int]]:
+    """Returns the number of wins of each entry for each puzzle type."""
+    with _record.lock:
+        _record._sync_path()
+        return {k: dict(v) for k, v in _record.wins.items()}
+
+
+def _run_entry(conn: Any, entry: str, config_dict: Dict[str, Any],
+               variables: List[Any], constraints: List[Any],
+               is_answer_key: Optional[List[bool]]) -> None:
+    # the backend processes started by this entry are terminated along with
+    # it as a process group
+    os.setsid()
+    try:
+        for key, value in config_dict.items():
+            setattr(config, key, value)
+        name, overrides = parse_entry(entry)
+        for key, value in overrides.items():
+            setattr(config, key, value)
+        backend = importlib.import_module('cspuz.backend.' + name)
+        if is_answer_key is None:
+            csp_solver = backend.CSPSolver(variables)
+            csp_solver.add_constraint(constraints)
+            is_sat = csp_solver.solve()
+        else:
+            from ..solver import Solver, _run_steps
+            from ..stats import SolveStats
+            solver = Solver()
+            solver.stats = SolveStats('solve')
+            is_sat = _run_steps(
+                solver._solve(backend, variables, is_answer_key,
+                              constraints))
+        conn.send((True, is_sat, [v.sol for v in variables]))
+    except BaseException as e:
+        conn.send((False, repr(e), None))
+    finally:
+        conn.close()
+
+
+class CSPSolver(object):
+    def __init__(self, variables):
+        self.variables = variables
+        self.constraints = []
+        self.entries = get_entries()
+        if len(self.entries) == 0:
+            raise ValueError('no backend is given in config.portfolio')
+        self.puzzle_type = getattr(_local, 'puzzle_type', None) or 'default'
+        self.last_winner = None
+        self.backend_times = dict()
+        # `time.time()` by which each race must end, set by `Solver.solve`
+        self.deadline = None
+
+    def add_constraint(self, constraint):
+        if isinstance(constraint, list):
+            self.constraints += constraint
+        else:
+            self.constraints.append(constraint)
+
+    def _race(self, is_answer_key):
+        entries = _record.select(self.puzzle_type, self.entries)
+        context = multiprocessing.get_context()
+        config_dict = dict(vars(config))
+        start = time.perf_counter()
+        running = dict()
+        errors = []
+        result = None
+        try:
+            for entry in entries:
+                recv, send = context.Pipe(duplex=False)
+                proc = context.Process(target=_run_entry,
+                                       args=(send, entry, config_dict,
+                                             self.variables,
+                                             self.constraints, is_answer_key))
+                proc.start()
+                send.close()
+                running[recv] = (entry, proc)
+            while len(running) > 0 and result is None:
+                ready = multiprocessing.connection.wait(
+                    list(running), call_timeout(self.deadline))
+                if len(ready) == 0:
+                    raise subprocess.TimeoutExpired('portfolio', 0)
+                for conn in ready:
+                    entry, proc = running.pop(conn)
+                    try:
+                        msg = conn.recv()
+                    except EOFError:
+                        msg = (False, 'terminated', None)
+                    conn.close()
+                    proc.join()
+                    if msg[0]:
+                        result = (entry, msg[1], msg[2])
+                        break
+                    errors.append('{}: {}'.format(entry, msg[1]))
+        finally:
+            for conn, (_, proc) in running.items():
+                _terminate_process_tree(proc.pid)
+                # in case the entry has not started its own session yet
+                proc.terminate()
+                proc.join()
+                conn.close()
+
+        if result is None:
+            _record.add(self.puzzle_type, None)
+            raise RuntimeError('all the backends in the portfolio failed: ' +
+                               '; '.join(errors))
+        winner, is_sat, sol = result
+        self.last_winner = winner
+        self.backend_times[winner] = self.backend_times.get(
+            winner, 0.0) + time.perf_counter() - start
+        _record.add(self.puzzle_type, winner)
+        for v, x in zip(self.variables, sol):
+            v.sol = x
+        return is_sat
+
+    def solve(self):
+        return self._race(None)
+
+    def solve_irrefutably(self, is_answer_key):
+        return self._race(is_answer_key)
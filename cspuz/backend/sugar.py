@@ -2,10 +2,17 @@
 CSP backend using the Sugar CSP solver (http://bach.istc.kobe-u.ac.jp/sugar/).
 """
 
+import time
+
 from ..configuration import config
-from ..expr import Op, Expr, BoolVar, IntVar
+from ..expr import Op, Expr, BoolExpr, BoolVar, IntVar
+from ..interning import ExprPool
+from ..simplifier import int_bounds
+
+from ._subproc import call_timeout, run_subprocess, run_subprocess_async
 
-from ._subproc import run_subprocess
+# number of lines encoded and written at a time
+_WRITE_BATCH_LINES = 4096
 
 OP_TO_OPNAME = {
     Op.NEG: '-',
@@ -25,10 +32,16 @@ OP_TO_OPNAME = {
     Op.IMP: '=>',
     Op.IF: 'if',
     Op.ALLDIFF: 'alldifferent',
-    Op.GRAPH_ACTIVE_VERTICES_CONNECTED: 'graph-active-vertices-connected'
+    Op.GRAPH_ACTIVE_VERTICES_CONNECTED: 'graph-active-vertices-connected',
 }
 
 
+def supports_op(op):
+    # Sugar (csugar) accepts all the graph primitives; those not supported
+    # by a backend are expanded by `cspuz.primitives`.
+    return True
+
+
 def _convert_variable(v):
     if isinstance(v, BoolVar):
         return '(bool b{})'.format(v.id)
@@ -38,7 +51,9 @@ def _convert_variable(v):
         raise TypeError()
 
 
-def _convert_expr(e):
+def _convert_atom(e, aux_names):
+    # Returns the text of `e` if it has no operand to be converted (or is
+    # named as a shared subexpression), and None otherwise.
     if isinstance(e, bool):
         return ('true' if e else 'false')
     if isinstance(e, int):
@@ -54,12 +69,57 @@ def _convert_expr(e):
         return 'true' if e.operands[0] else 'false'
     elif e.op == Op.INT_CONSTANT:
         return str(e.operands[0])
-    else:
-        return '({} {})'.format(OP_TO_OPNAME[e.op],
-                                ' '.join(map(_convert_expr, e.operands)))
+    elif aux_names is not None and id(e) in aux_names:
+        return aux_names[id(e)][1]
+    return None
+
+
+def _write_expr(e, write, aux_names=None):
+    # `e` is written in pieces by `write`. An explicit stack of pieces (str)
+    # and expressions to be written replaces recursion, so that deeply
+    # nested expressions do not hit the recursion limit.
+    stack = [e]
+    while len(stack) > 0:
+        x = stack.pop()
+        if isinstance(x, str):
+            write(x)
+            continue
+        atom = _convert_atom(x, aux_names)
+        if atom is not None:
+            write(atom)
+            continue
+        if x.op == Op.COUNT_TRUE:
+            # Sugar has no cardinality constraint, but encodes this sum of
+            # 0-1 terms by itself
+            write('(+')
+            stack.append(')')
+            for y in reversed(x.operands):
+                stack += [' 1 0)', y, ' (if ']
+        else:
+            write('(' + OP_TO_OPNAME[x.op])
+            stack.append(')')
+            for y in reversed(x.operands):
+                stack += [y, ' ']
+
+
+def _convert_expr(e, aux_names=None):
+    atom = _convert_atom(e, aux_names)
+    if atom is not None:
+        return atom
+    pieces = []
+    _write_expr(e, pieces.append, aux_names)
+    return ''.join(pieces)
 
 
 class CSPSolver(object):
+    """A problem solved by the `sugar` script.
+
+    The constraints are converted once when they are added, but Sugar is not
+    incremental: every call of `solve` starts a new `sugar` process on the
+    whole description (including the constraints added by earlier refutation
+    rounds). A process kept across calls is only available through the
+    server mode of sugar_extended."""
+
     def __init__(self, variables):
         self.variables = variables
         max_var_id = -1
@@ -71,20 +131,129 @@ class CSPSolver(object):
         self.max_var_id = max_var_id
         self.converted_variables = list(map(_convert_variable, self.variables))
         self.converted_constraints = []
+        self.pool = ExprPool() if config.share_subexpressions else None
+        self.aux_names = dict()
+        self._int_bounds_memo = dict()
+        # statistics collected into `Solver.stats`
+        self.csp_bytes = 0
+        self.num_backend_rounds = 0
+        self.backend_times = dict()
+        # `time.time()` by which each call must end, set by `Solver.solve`
+        self.deadline = None
+
+    def _description_writer(self, extra_lines=()):
+        # Returns a function writing the CSP description to a binary stream.
+        # The description is streamed in batches of lines, so that the whole
+        # text (and its encoded copy) is never built in memory.
+        def write(f):
+            num_bytes = 0
+            batch = []
+            for lines in (self.converted_variables,
+                          self.converted_constraints, extra_lines):
+                for line in lines:
+                    batch.append(line)
+                    if len(batch) >= _WRITE_BATCH_LINES:
+                        data = ('\n'.join(batch) + '\n').encode('ascii')
+                        f.write(data)
+                        num_bytes += len(data)
+                        batch = []
+            if len(batch) > 0:
+                data = ('\n'.join(batch) + '\n').encode('ascii')
+                f.write(data)
+                num_bytes += len(data)
+            self.csp_bytes += num_bytes
+
+        return write
+
+    def _define_shared(self, e):
+        # Shared nodes below `e` are defined bottom-up as auxiliary variables
+        # `s<n>` just before the first constraint which refers to them. The
+        # nodes are visited in post-order with an explicit stack.
+        stack = [(e, False)]
+        while len(stack) > 0:
+            x, expanded = stack.pop()
+            if not isinstance(x, Expr) or x.is_variable() or id(
+                    x) in self.aux_names:
+                continue
+            if not expanded:
+                stack.append((x, True))
+                for y in reversed(x.operands):
+                    stack.append((y, False))
+                continue
+            if not self.pool.is_shared(x):
+                continue
+            self._define_aux(x)
+
+    def _define_aux(self, e):
+        name = 's{}'.format(len(self.aux_names))
+        body = _convert_expr(e, self.aux_names)
+        if isinstance(e, BoolExpr):
+            self.converted_constraints.append('(bool {})'.format(name))
+            self.converted_constraints.append('(iff {} {})'.format(
+                name, body))
+        else:
+            lo, hi = int_bounds(e, self._int_bounds_memo)
+            self.converted_constraints.append('(int {} {} {})'.format(
+                name, lo, hi))
+            self.converted_constraints.append('(= {} {})'.format(name, body))
+        self.aux_names[id(e)] = (e, name)
 
     def add_constraint(self, constraint):
-        if isinstance(constraint, list):
+        if not isinstance(constraint, list):
+            constraint = [constraint]
+        if self.pool is None:
             self.converted_constraints += map(_convert_expr, constraint)
-        else:
-            self.converted_constraints.append(_convert_expr(constraint))
+            return
+        # all constraints are interned first so that the reference counts
+        # cover the whole batch
+        interned = [self.pool.intern(e) for e in constraint]
+        for e in interned:
+            self._define_shared(e)
+            self.converted_constraints.append(
+                _convert_expr(e, self.aux_names))
 
-    def solve(self):
-        csp_description = '\n'.join(self.converted_variables +
-                                    self.converted_constraints)
+    def _run_solver(self, write_description):
         sugar_path = config.backend_path or 'sugar'
-        out = run_subprocess([sugar_path, '/dev/stdin'],
-                             csp_description,
-                             timeout=config.solver_timeout).split('\n')
+        return run_subprocess([sugar_path, '/dev/stdin'],
+                              write_description,
+                              timeout=call_timeout(
+                                  self.deadline,
+                                  config.solver_timeout)).split('\n')
+
+    async def _run_solver_async(self, write_description):
+        sugar_path = config.backend_path or 'sugar'
+        out = await run_subprocess_async(
+            [sugar_path, '/dev/stdin'],
+            write_description,
+            timeout=call_timeout(self.deadline, config.solver_timeout))
+        return out.split('\n')
+
+    def _load_with_stats(self, parse, out):
+        start = time.perf_counter()
+        for line in out:
+            # statistics reported by the backend (sugar_extended)
+            if line.startswith('c time '):
+                _, _, phase, elapsed = line.split(' ')
+                self.backend_times[phase] = self.backend_times.get(
+                    phase, 0.0) + float(elapsed)
+            elif line.startswith('c rounds '):
+                self.num_backend_rounds += int(line.split(' ')[2])
+        ret = parse(out)
+        self.backend_times['parse'] = self.backend_times.get(
+            'parse', 0.0) + time.perf_counter() - start
+        return ret
+
+    def solve(self):
+        return self._load_with_stats(
+            self._load_output,
+            self._run_solver(self._description_writer()))
+
+    async def solve_async(self):
+        return self._load_with_stats(
+            self._load_output, await
+            self._run_solver_async(self._description_writer()))
+
+    def _load_output(self, out):
         if 'UNSATISFIABLE' in out[0]:
             for v in self.variables:
                 v.sol = None
@@ -95,6 +264,9 @@ class CSPSolver(object):
             if len(line) <= 2:
                 break
             var, val = line[2:].strip().split('\t')
+            if var[0] == 's':
+                # auxiliary variable for a shared subexpression
+                continue
             if val == 'true':
                 converted_val = True
             elif val == 'false':
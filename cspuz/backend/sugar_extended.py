@@ -1,15 +1,202 @@
+import asyncio
+import atexit
+import functools
+import os
+import select
+import signal
+import subprocess
+import threading
+import time
+
 from ..configuration import config
 from ..expr import BoolVar, IntVar
 from . import sugar
+from ._subproc import call_timeout
+
+supports_op = sugar.supports_op
+
+_FRAME_END = '%END'
+
+
+class SugarExtServer(object):
+    """A warm `sugar_ext.sh --server` process which solves framed problems.
+
+    Problems (given as str or as a function writing the problem to a binary
+    stream) are written to the stdin of the server terminated by a line
+    `%END`, and the answer is read until a line `%END` appears. The process is
+    restarted automatically if it has died.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.proc = None
+        self.owner_pid = None
+        self._buffer = b''
+        self.num_requests = 0
+        self.num_restarts = 0
+        self.last_latency = None
+        self.total_latency = 0.0
+        # requests from multiple threads are serialized on the pipe
+        self._lock = threading.Lock()
+
+    def _start(self):
+        if self.proc is not None:
+            self.num_restarts += 1
+        # the server is started in its own session, so that the JVM is
+        # killed along with the wrapper script
+        self.proc = subprocess.Popen([self.path, '--server'],
+                                     stdin=subprocess.PIPE,
+                                     stdout=subprocess.PIPE,
+                                     start_new_session=True)
+        self.owner_pid = os.getpid()
+        self._buffer = b''
+
+    def is_alive(self):
+        return (self.proc is not None and self.owner_pid == os.getpid()
+                and self.proc.poll() is None)
+
+    def close(self):
+        if self.proc is not None and self.owner_pid == os.getpid():
+            try:
+                self.proc.stdin.close()
+            except OSError:
+                pass
+            try:
+                self.proc.wait(timeout=1.0)
+            except subprocess.TimeoutExpired:
+                self._kill()
+        self.proc = None
+
+    def _kill(self):
+        try:
+            os.killpg(self.proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        self.proc.wait()
+
+    def _readline(self, deadline):
+        while b'\n' not in self._buffer:
+            if deadline is not None:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    raise subprocess.TimeoutExpired(self.path, 0)
+                ready, _, _ = select.select([self.proc.stdout], [], [],
+                                            remaining)
+                if not ready:
+                    raise subprocess.TimeoutExpired(self.path, 0)
+            chunk = os.read(self.proc.stdout.fileno(), 65536)
+            if len(chunk) == 0:
+                raise EOFError('sugar_ext server terminated unexpectedly')
+            self._buffer += chunk
+        line, self._buffer = self._buffer.split(b'\n', 1)
+        return line.decode('utf-8')
+
+    def _request_once(self, csp_description, timeout):
+        if not self.is_alive():
+            self._start()
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        if isinstance(csp_description, str):
+            self.proc.stdin.write(csp_description.encode('ascii') + b'\n')
+        else:
+            # streamed into the pipe by the CSPSolver
+            csp_description(self.proc.stdin)
+        self.proc.stdin.write('{}\n'.format(_FRAME_END).encode('ascii'))
+        self.proc.stdin.flush()
+        out = []
+        while True:
+            line = self._readline(deadline)
+            if line == _FRAME_END:
+                return out
+            out.append(line)
+
+    def request(self, csp_description, timeout=None):
+        with self._lock:
+            return self._request(csp_description, timeout)
+
+    def _request(self, csp_description, timeout):
+        start = time.perf_counter()
+        try:
+            out = self._request_once(csp_description, timeout)
+        except (BrokenPipeError, EOFError):
+            # the server has crashed; retry once with a fresh process
+            self.close()
+            out = self._request_once(csp_description, timeout)
+        except subprocess.TimeoutExpired:
+            # the server may be still working on the problem, so it is no
+            # longer usable
+            self._kill()
+            self.close()
+            raise
+        if len(out) > 0 and out[0].startswith('error '):
+            raise RuntimeError('sugar_ext server: {}'.format(out[0][6:]))
 
-from ._subproc import run_subprocess
+        self.last_latency = time.perf_counter() - start
+        self.total_latency += self.last_latency
+        self.num_requests += 1
+        return out
+
+
+_servers = {}
+
+
+def get_server(path=None):
+    """Returns the warm server for `path` owned by the current process."""
+    if path is None:
+        path = config.backend_path or 'sugar'
+    server = _servers.get(path)
+    if server is None or server.owner_pid not in (None, os.getpid()):
+        # a server inherited through fork() must not be shared
+        server = SugarExtServer(path)
+        _servers[path] = server
+    return server
+
+
+@atexit.register
+def _close_servers():
+    for server in _servers.values():
+        server.close()
 
 
 class CSPSolver(sugar.CSPSolver):
-    def __init__(self, variables):
+    def __init__(self, variables, use_server=None):
         super(CSPSolver, self).__init__(variables)
+        if use_server is None:
+            use_server = config.sugar_ext_server
+        self.use_server = use_server
+        self.last_latency = None
 
-    def solve_irrefutably(self, is_answer_key):
+    def _run_solver(self, write_description):
+        if not self.use_server:
+            start = time.perf_counter()
+            out = super(CSPSolver, self)._run_solver(write_description)
+            self.last_latency = time.perf_counter() - start
+            return out
+        server = get_server()
+        out = server.request(write_description,
+                             timeout=call_timeout(self.deadline,
+                                                  config.solver_timeout))
+        self.last_latency = server.last_latency
+        return out
+
+    async def _run_solver_async(self, write_description):
+        if not self.use_server:
+            start = time.perf_counter()
+            out = await super(CSPSolver, self)._run_solver_async(
+                write_description)
+            self.last_latency = time.perf_counter() - start
+            return out
+        # requests to the server are serialized anyway, so they are simply
+        # handed to a worker thread
+        server = get_server()
+        out = await asyncio.get_running_loop().run_in_executor(
+            None,
+            functools.partial(server.request,
+                              write_description,
+                              timeout=call_timeout(
+                                  self.deadline, config.solver_timeout)))
+        self.last_latency = server.last_latency
+        return out
+
+    def _irrefutable_description_writer(self, is_answer_key):
         answer_keys = []
         for i in range(len(self.variables)):
             if is_answer_key[i]:
@@ -20,13 +207,20 @@ class CSPSolver(sugar.CSPSolver):
                 else:
                     raise TypeError()
         answer_keys_desc = '#' + ' '.join(answer_keys)
-        csp_description = '\n'.join(self.converted_variables +
-                                    self.converted_constraints +
-                                    [answer_keys_desc])
-        sugar_path = config.backend_path or 'sugar'
-        out = run_subprocess([sugar_path, '/dev/stdin'],
-                             csp_description,
-                             timeout=config.solver_timeout).split('\n')
+        return self._description_writer([answer_keys_desc])
+
+    def solve_irrefutably(self, is_answer_key):
+        return self._load_with_stats(
+            self._load_irrefutable_output,
+            self._run_solver(
+                self._irrefutable_description_writer(is_answer_key)))
+
+    async def solve_irrefutably_async(self, is_answer_key):
+        return self._load_with_stats(
+            self._load_irrefutable_output, await self._run_solver_async(
+                self._irrefutable_description_writer(is_answer_key)))
+
+    def _load_irrefutable_output(self, out):
         for v in self.variables:
             v.sol = None
 
@@ -35,7 +229,7 @@ class CSPSolver(sugar.CSPSolver):
 
         assignment = [None] * (self.max_var_id + 1)
         for line in out[1:]:
-            if len(line) <= 2:
+            if len(line) <= 2 or line.startswith('c '):
                 break
             var, val = line.split(' ')
             if val == 'true':
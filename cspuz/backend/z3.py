@@ -1,62 +1,148 @@
+import subprocess
+import time
+
 try:
     import z3  # type: ignore
     Z3_AVAILABLE = True
 except ImportError:
     Z3_AVAILABLE = False
 
+from ..configuration import config
 from ..expr import Op, Expr, BoolVar, IntVar
+from ..interning import ExprPool
+
+
+def _convert_expr(e, variables_dict, cache=None):
+    if cache is None:
+        cache = dict()
 
+    def converted(x):
+        if isinstance(x, (bool, int)):
+            return x
+        if not isinstance(x, Expr):
+            raise TypeError()
+        if isinstance(x, (BoolVar, IntVar)):
+            return variables_dict[x.id]
+        return cache[id(x)]
+
+    # post-order with an explicit stack, so that deeply nested expressions
+    # do not hit the recursion limit
+    stack = [(e, False)]
+    while len(stack) > 0:
+        x, expanded = stack.pop()
+        if not isinstance(x, Expr) or x.is_variable() or id(x) in cache:
+            continue
+        cardinality = _cardinality(x)
+        # the terms of a cardinality are converted without the sum
+        operands = x.operands if cardinality is None else cardinality[
+            0].operands
+        if not expanded:
+            stack.append((x, True))
+            for y in operands:
+                stack.append((y, False))
+            continue
+        operands = [converted(y) for y in operands]
+        if cardinality is None:
+            cache[id(x)] = _convert_op(x, operands)
+        else:
+            cache[id(x)] = _convert_cardinality(cardinality, operands)
+    return converted(e)
 
-def _convert_expr(e, variables_dict):
-    if isinstance(e, (bool, int)):
+
+def _constant(e):
+    if isinstance(e, int) and not isinstance(e, bool):
         return e
-    if not isinstance(e, Expr):
-        raise TypeError()
-    if isinstance(e, (BoolVar, IntVar)):
-        return variables_dict[e.id]
+    if isinstance(e, Expr) and e.op == Op.INT_CONSTANT:
+        return e.operands[0]
+    return None
+
+
+_FLIPPED = {
+    Op.EQ: Op.EQ,
+    Op.NE: Op.NE,
+    Op.LE: Op.GE,
+    Op.LT: Op.GT,
+    Op.GE: Op.LE,
+    Op.GT: Op.LT
+}
+
+
+def _cardinality(e):
+    # (count_true(...), op, k) if `e` compares a cardinality with a constant
+    if e.op not in _FLIPPED:
+        return None
+    a, b = e.operands
+    op = e.op
+    if _constant(a) is not None:
+        a, b = b, a
+        op = _FLIPPED[op]
+    k = _constant(b)
+    if k is None or not isinstance(a, Expr) or a.op != Op.COUNT_TRUE:
+        return None
+    return a, op, k
+
+
+def _convert_cardinality(cardinality, operands):
+    # a cardinality compared with a constant is a pseudo-boolean constraint
+    _, op, k = cardinality
+    terms = [(x, 1) for x in operands]
+    if op == Op.EQ:
+        return z3.PbEq(terms, k)
+    elif op == Op.NE:
+        return z3.Not(z3.PbEq(terms, k))
+    elif op == Op.LE:
+        return z3.PbLe(terms, k)
+    elif op == Op.LT:
+        return z3.PbLe(terms, k - 1)
+    elif op == Op.GE:
+        return z3.PbGe(terms, k)
     else:
-        operands = list(
-            map(lambda x: _convert_expr(x, variables_dict), e.operands))
-        if e.op == Op.NEG:
-            return -operands[0]
-        elif e.op == Op.ADD:
-            ret = operands[0]
-            for i in range(1, len(operands)):
-                ret = ret + operands[i]
-            return ret
-        elif e.op == Op.SUB:
-            ret = operands[0]
-            for i in range(1, len(operands)):
-                ret = ret - operands[i]
-            return ret
-        elif e.op == Op.EQ:
-            return operands[0] == operands[1]
-        elif e.op == Op.NE:
-            return operands[0] != operands[1]
-        elif e.op == Op.LE:
-            return operands[0] <= operands[1]
-        elif e.op == Op.LT:
-            return operands[0] < operands[1]
-        elif e.op == Op.GE:
-            return operands[0] >= operands[1]
-        elif e.op == Op.GT:
-            return operands[0] > operands[1]
-        elif e.op == Op.NOT:
-            return z3.Not(operands[0])
-        elif e.op == Op.AND:
-            return z3.And(operands)
-        elif e.op == Op.OR:
-            return z3.Or(operands)
-        elif e.op == Op.XOR:
-            return z3.Xor(operands[0], operands[1])
-        elif e.op == Op.IFF:
-            return operands[0] == operands[1]
-        elif e.op == Op.IMP:
-            return z3.Or(z3.Not(operands[0]), operands[1])
-        elif e.op == Op.IF:
-            return z3.If(operands[0], operands[1], operands[2])
-        elif e.op == Op.ALLDIFF:
-            return z3.Distinct(operands)
+        return z3.PbGe(terms, k + 1)
+
+
+def _convert_op(e, operands):
+    if e.op == Op.NEG:
+        return -operands[0]
+    elif e.op == Op.ADD:
+        ret = operands[0]
+        for i in range(1, len(operands)):
+            ret = ret + operands[i]
+        return ret
+    elif e.op == Op.SUB:
+        ret = operands[0]
+        for i in range(1, len(operands)):
+            ret = ret - operands[i]
+        return ret
+    elif e.op == Op.EQ:
+        return operands[0] == operands[1]
+    elif e.op == Op.NE:
+        return operands[0] != operands[1]
+    elif e.op == Op.LE:
+        return operands[0] <= operands[1]
+    elif e.op == Op.LT:
+        return operands[0] < operands[1]
+    elif e.op == Op.GE:
+        return operands[0] >= operands[1]
+    elif e.op == Op.GT:
+        return operands[0] > operands[1]
+    elif e.op == Op.NOT:
+        return z3.Not(operands[0])
+    elif e.op == Op.AND:
+        return z3.And(operands)
+    elif e.op == Op.OR:
+        return z3.Or(operands)
+    elif e.op == Op.XOR:
+        return z3.Xor(operands[0], operands[1])
+    elif e.op == Op.IFF:
+        return operands[0] == operands[1]
+    elif e.op == Op.IMP:
+        return z3.Or(z3.Not(operands[0]), operands[1])
+    elif e.op == Op.IF:
+        return z3.If(operands[0], operands[1], operands[2])
+    elif e.op == Op.COUNT_TRUE:
+        return z3.Sum([z3.If(x, 1, 0) for x in operands])
+    elif e.op == Op.ALLDIFF:
+        return z3.Distinct(operands)
 
 
 class CSPSolver(object):
@@ -71,33 +157,106 @@ class CSPSolver(object):
                 self.variables_dict[v.id] = z3.Int('i' + str(id_last))
             id_last += 1
         self.converted_constraints = []
+        self.solver = None
+        self.assumption_literals = dict()
+        self.last_assumptions = []
+        # converted z3 ASTs of canonical nodes, so that a subexpression shared
+        # among constraints is converted only once
+        self.pool = ExprPool() if config.share_subexpressions else None
+        self.cache = dict()
+        # `time.time()` by which each call must end, set by `Solver.solve`
+        self.deadline = None
+
+    def _convert(self, e):
+        if self.pool is None:
+            return _convert_expr(e, self.variables_dict)
+        return _convert_expr(self.pool.intern(e), self.variables_dict,
+                             self.cache)
 
     def add_constraint(self, constraint):
         if isinstance(constraint, list):
-            self.converted_constraints += map(
-                lambda e: _convert_expr(e, self.variables_dict), constraint)
+            converted = list(map(self._convert, constraint))
         else:
-            self.converted_constraints.append(
-                _convert_expr(constraint, self.variables_dict))
+            converted = [self._convert(constraint)]
+        self.converted_constraints += converted
+        if self.solver is not None:
+            # the session is already running: only the new constraints are
+            # sent to z3 so that the learnt state is kept
+            self.solver.add(converted)
 
-    def solve(self):
-        if not Z3_AVAILABLE:
-            raise ModuleNotFoundError('z3 is not found')
-        solver = z3.Solver()
-        for var in self.variables:
-            if isinstance(var, IntVar):
-                var_z3 = self.variables_dict[var.id]
-                solver.add(var.lo <= var_z3, var_z3 <= var.hi)
-        solver.add(self.converted_constraints)
+    def _get_solver(self):
+        if self.solver is None:
+            solver = z3.Solver()
+            for var in self.variables:
+                if isinstance(var, IntVar):
+                    var_z3 = self.variables_dict[var.id]
+                    solver.add(var.lo <= var_z3, var_z3 <= var.hi)
+            solver.add(self.converted_constraints)
+            self.solver = solver
+        return self.solver
 
-        if solver.check() == z3.unsat:
-            return False
+    def _check(self, *assumptions):
+        solver = self._get_solver()
+        # in milliseconds; the default of z3 means no limit
+        timeout = 4294967295
+        if self.deadline is not None:
+            remaining = self.deadline - time.time()
+            if remaining <= 0:
+                raise subprocess.TimeoutExpired('z3', 0)
+            timeout = max(int(remaining * 1000), 1)
+        solver.set('timeout', timeout)
+        res = solver.check(*assumptions)
+        if res == z3.unknown and self.deadline is not None:
+            raise subprocess.TimeoutExpired('z3', 0)
+        return res
 
-        model = solver.model()
+    def _load_model(self, model):
         for var in self.variables:
             var_z3 = self.variables_dict[var.id]
             if isinstance(var, BoolVar):
                 var.sol = z3.is_true(model[var_z3])
             elif isinstance(var, IntVar):
                 var.sol = model[var_z3].as_long()
+
+    def solve(self):
+        if not Z3_AVAILABLE:
+            raise ModuleNotFoundError('z3 is not found')
+        solver = self._get_solver()
+
+        if self._check() == z3.unsat:
+            return False
+
+        self._load_model(solver.model())
         return True
+
+    def _get_assumption_literal(self, e):
+        # Each assumed expression is tied to a fresh indicator literal once;
+        # callers are expected to pass the same Expr object across calls.
+        key = id(e)
+        if key not in self.assumption_literals:
+            lit = z3.Bool('a{}'.format(len(self.assumption_literals)))
+            self._get_solver().add(
+                z3.Implies(lit, self._convert(e)))
+            self.assumption_literals[key] = (e, lit)
+        return self.assumption_literals[key][1]
+
+    def solve_with_assumptions(self, assumptions):
+        if not Z3_AVAILABLE:
+            raise ModuleNotFoundError('z3 is not found')
+        solver = self._get_solver()
+        self.last_assumptions = [
+            self._get_assumption_literal(e) for e in assumptions
+        ]
+
+        if self._check(*self.last_assumptions) == z3.unsat:
+            return False
+
+        self._load_model(solver.model())
+        return True
+
+    def unsat_core(self):
+        core = set(str(lit) for lit in self.solver.unsat_core())
+        return [
+            i for i, lit in enumerate(self.last_assumptions)
+            if str(lit) in core
+        ]
@@ -0,0 +1,155 @@
+"""
+Solving many independent problems concurrently.
+
+The problems (`Solver` objects) are solved in a bounded pool of worker
+processes (or threads). The result of each problem is given as an
+`Assignment` and is also written back to the variables of the solver. Each
+worker process lives throughout the batch, so with `config.sugar_ext_server`
+enabled every worker keeps sending its problems to one warm backend process.
+"""
+
+import concurrent.futures
+import importlib
+import os
+import time
+from types import ModuleType
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .assignment import Assignment
+from .configuration import config
+from .solver import Solver, _get_default_backend
+from .stats import _notify
+
+
+class BatchResult(object):
+    def __init__(self, index: int, solver: Solver, assignment: Assignment,
+                 queue_wait: float, solve_time: float):
+        self.index = index
+        self.solver = solver
+        self.assignment = assignment
+        self.is_sat = assignment.is_sat
+        # time between the submission and the start of solving
+        self.queue_wait = queue_wait
+        self.solve_time = solve_time
+
+
+class BatchStats(object):
+    def __init__(self):
+        self.num_solved = 0
+        self.elapsed = 0.0
+        self.total_queue_wait = 0.0
+        self.max_queue_wait = 0.0
+        self.total_solve_time = 0.0
+
+    @property
+    def throughput(self) -> float:
+        """Number of problems solved per second."""
+        if self.elapsed == 0.0:
+            return 0.0
+        return self.num_solved / self.elapsed
+
+    def _add(self, result: BatchResult) -> None:
+        self.num_solved += 1
+        self.total_queue_wait += result.queue_wait
+        self.max_queue_wait = max(self.max_queue_wait, result.queue_wait)
+        self.total_solve_time += result.solve_time
+
+    def __repr__(self) -> str:
+        return ('BatchStats(num_solved={}, elapsed={:.3f}, '
+                'throughput={:.2f}/s, max_queue_wait={:.3f})'.format(
+                    self.num_solved, self.elapsed, self.throughput,
+                    self.max_queue_wait))
+
+
+def _solve_worker(solver: Solver, find_answer: bool, backend_name: str,
+                  config_dict: Dict[str, Any],
+                  submitted: float) -> Tuple[Assignment, float, float]:
+    start = time.time()
+    # worker processes do not necessarily inherit the configuration
+    for key, value in config_dict.items():
+        setattr(config, key, value)
+    backend = importlib.import_module(backend_name)
+    if find_answer:
+        solver.find_answer(backend)
+    else:
+        solver.solve(backend)
+    return solver.assignment, start - submitted, time.time() - start
+
+
+def solve_many_iter(solvers: Sequence[Solver],
+                    *,
+                    find_answer: bool = False,
+                    backend: Optional[ModuleType] = None,
+                    max_workers: Optional[int] = None,
+                    use_processes: bool = True,
+                    stats: Optional[BatchStats] = None
+                    ) -> Iterator[BatchResult]:
+    """Solves `solvers` concurrently and yields the results in the order of
+    completion. At most `2 * max_workers` problems are in flight at a time.
+    """
+    if backend is None:
+        backend = _get_default_backend()
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    # threads share the configuration of this process
+    config_dict = dict(vars(config)) if use_processes else {}
+    if stats is None:
+        stats = BatchStats()
+
+    executor_class: Any = (concurrent.futures.ProcessPoolExecutor
+                           if use_processes else
+                           concurrent.futures.ThreadPoolExecutor)
+    batch_start = time.time()
+    with executor_class(max_workers=max_workers) as executor:
+        capacity = 2 * max_workers
+        pending: Dict[concurrent.futures.Future, int] = dict()
+        next_index = 0
+        while next_index < len(solvers) or len(pending) > 0:
+            while next_index < len(solvers) and len(pending) < capacity:
+                future = executor.submit(_solve_worker, solvers[next_index],
+                                         find_answer, backend.__name__,
+                                         config_dict, time.time())
+                pending[future] = next_index
+                next_index += 1
+            done, _ = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                assignment, queue_wait, solve_time = future.result()
+                solver = solvers[index]
+                if use_processes:
+                    for v in solver.variables:
+                        v.sol = assignment.values.get(v.id)
+                    # hooks of this process have not seen the stats yet
+                    solver.stats = assignment.stats
+                    solver.deduction = assignment.deduction
+                    solver.assignment = assignment
+                    if assignment.stats is not None:
+                        _notify(assignment.stats)
+                result = BatchResult(index, solver, assignment, queue_wait,
+                                     solve_time)
+                stats._add(result)
+                stats.elapsed = time.time() - batch_start
+                yield result
+
+
+def solve_many(solvers: Sequence[Solver],
+               *,
+               find_answer: bool = False,
+               backend: Optional[ModuleType] = None,
+               max_workers: Optional[int] = None,
+               use_processes: bool = True,
+               stats: Optional[BatchStats] = None) -> List[bool]:
+    """Solves `solvers` concurrently and returns whether each of them is
+    satisfiable, in the input order. As with `Solver.solve` (or
+    `Solver.find_answer` if `find_answer` is set), the results are stored in
+    the `sol` of the variables and the `assignment` of each solver."""
+    ret: List[bool] = [False] * len(solvers)
+    for result in solve_many_iter(solvers,
+                                  find_answer=find_answer,
+                                  backend=backend,
+                                  max_workers=max_workers,
+                                  use_processes=use_processes,
+                                  stats=stats):
+        ret[result.index] = result.is_sat
+    return ret
@@ -0,0 +1,176 @@
+"""
+Caching the results of `Solver.solve` / `Solver.find_answer`.
+
+A problem is identified by the SHA-256 digest of its canonical serialization
+(variables, answer keys and constraints), so that a problem built again from
+scratch hits the entries of an earlier identical problem. The cache is
+enabled by `config.use_result_cache`. Entries are kept in an in-memory LRU
+and, if `config.result_cache_path` is set, in an sqlite database which can
+be shared by multiple processes (e.g. the workers of `cspuz.batch`).
+"""
+
+import collections
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, List, Optional, Sequence, Tuple, Union
+
+from .configuration import config
+from .expr import BoolExprLike, BoolVar, Expr, IntVar
+
+# bumped whenever the serialization or the stored values change
+_FORMAT_VERSION = 1
+
+CachedResult = Tuple[bool, List[Union[None, bool, int]]]
+
+
+def _serialize(variables: Sequence[Union[BoolVar, IntVar]],
+               is_answer_key: Sequence[bool],
+               constraints: Sequence[BoolExprLike]) -> List[str]:
+    lines = []
+    for v, key in zip(variables, is_answer_key):
+        if isinstance(v, BoolVar):
+            desc = 'b'
+        else:
+            desc = 'i {} {}'.format(v.lo, v.hi)
+        lines.append(desc + (' *' if key else ''))
+
+    # shared subexpressions are serialized only once
+    index = dict()
+
+    def ref(x):
+        if isinstance(x, bool):
+            return 'T' if x else 'F'
+        if isinstance(x, int):
+            return str(x)
+        if x.is_variable():
+            return 'v{}'.format(x.id)
+        return 'n{}'.format(index[id(x)])
+
+    for c in constraints:
+        stack: List[Tuple[Any, bool]] = [(c, False)]
+        while len(stack) > 0:
+            e, expanded = stack.pop()
+            if not isinstance(e, Expr) or e.is_variable() or id(e) in index:
+                continue
+            if expanded:
+                index[id(e)] = len(index)
+                lines.append(e.op.name + ' ' +
+                             ' '.join(ref(x) for x in e.operands))
+            else:
+                stack.append((e, True))
+                for x in e.operands:
+                    stack.append((x, False))
+        lines.append('! ' + ref(c))
+    return lines
+
+
+def problem_key(mode: str, variables: Sequence[Union[BoolVar, IntVar]],
+                is_answer_key: Sequence[bool],
+                constraints: Sequence[BoolExprLike]) -> str:
+    """Returns the digest identifying the problem. `mode` distinguishes
+    `solve` and `find_answer`, whose results differ."""
+    h = hashlib.sha256('{} {}\n'.format(_FORMAT_VERSION, mode).encode())
+    for line in _serialize(variables, is_answer_key, constraints):
+        h.update(line.encode())
+        h.update(b'\n')
+    return h.hexdigest()
+
+
+class ResultCache(object):
+    def __init__(self, maxsize: int = 1024, path: Optional[str] = None):
+        self.maxsize = maxsize
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'collections.OrderedDict[str, CachedResult]' = \
+            collections.OrderedDict()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._conn_pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        # a connection inherited through fork() must not be used
+        if self._conn is None or self._conn_pid != os.getpid():
+            assert self.path is not None
+            conn = sqlite3.connect(self.path,
+                                   timeout=30.0,
+                                   check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS results '
+                         '(key TEXT PRIMARY KEY, value TEXT)')
+            conn.commit()
+            self._conn = conn
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    def _remember(self, key: str, value: CachedResult) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def get(self, key: str) -> Optional[CachedResult]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            elif self.path is not None:
+                row = self._connect().execute(
+                    'SELECT value FROM results WHERE key = ?',
+                    (key, )).fetchone()
+                if row is not None:
+                    is_sat, sol = json.loads(row[0])
+                    value = (is_sat, sol)
+                    self._remember(key, value)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def put(self, key: str, value: CachedResult) -> None:
+        with self._lock:
+            self._remember(key, value)
+            if self.path is not None:
+                conn = self._connect()
+                conn.execute(
+                    'INSERT OR REPLACE INTO results (key, value) '
+                    'VALUES (?, ?)', (key, json.dumps(value)))
+                conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            if self.path is not None:
+                conn = self._connect()
+                conn.execute('DELETE FROM results')
+                conn.commit()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __repr__(self) -> str:
+        return 'ResultCache(size={}, hits={}, misses={}, path={!r})'.format(
+            len(self), self.hits, self.misses, self.path)
+
+
+_result_cache: Optional[ResultCache] = None
+
+
+def get_result_cache() -> Optional[ResultCache]:
+    """Returns the cache configured by `config`, or None if the cache is
+    disabled."""
+    global _result_cache
+    if not config.use_result_cache:
+        return None
+    if (_result_cache is None
+            or _result_cache.maxsize != config.result_cache_size
+            or _result_cache.path != config.result_cache_path):
+        _result_cache = ResultCache(config.result_cache_size,
+                                    config.result_cache_path)
+    return _result_cache
@@ -14,7 +14,21 @@ class Config(object):
     default_backend: str
     backend_path: Optional[str]
     use_graph_primitive: bool
+    lazy_connectivity: bool
+    graph_encoding: str
     solver_timeout: Optional[float]
+    sugar_ext_server: bool
+    deduction_workers: int
+    cnf_sat_engine: str
+    share_subexpressions: bool
+    use_simplifier: bool
+    use_presolve: bool
+    async_max_concurrency: int
+    use_result_cache: bool
+    result_cache_size: int
+    result_cache_path: Optional[str]
+    portfolio: str
+    portfolio_record_path: Optional[str]
 
     def __init__(self, infer_from_env=True):
         self.default_backend = _get_default(infer_from_env,
@@ -23,7 +37,40 @@ class Config(object):
                                          None)
         self.use_graph_primitive = strtobool(
             _get_default(infer_from_env, 'CSPUZ_USE_GRAPH_PRIMITIVE', 'False'))
+        self.lazy_connectivity = strtobool(
+            _get_default(infer_from_env, 'CSPUZ_LAZY_CONNECTIVITY', 'False'))
+        self.graph_encoding = _get_default(infer_from_env,
+                                           'CSPUZ_GRAPH_ENCODING', 'rank')
         self.solver_timeout = None
+        self.sugar_ext_server = strtobool(
+            _get_default(infer_from_env, 'CSPUZ_SUGAR_EXT_SERVER', 'False'))
+        # number of worker processes deciding the answer keys in `solve`
+        # (see `cspuz.parallel`); 1 disables the parallel deduction
+        self.deduction_workers = int(
+            _get_default(infer_from_env, 'CSPUZ_DEDUCTION_WORKERS', '1'))
+        self.cnf_sat_engine = _get_default(infer_from_env,
+                                           'CSPUZ_CNF_SAT_ENGINE', 'auto')
+        self.share_subexpressions = strtobool(
+            _get_default(infer_from_env, 'CSPUZ_SHARE_SUBEXPRESSIONS',
+                         'True'))
+        self.use_simplifier = strtobool(
+            _get_default(infer_from_env, 'CSPUZ_USE_SIMPLIFIER', 'True'))
+        self.use_presolve = strtobool(
+            _get_default(infer_from_env, 'CSPUZ_USE_PRESOLVE', 'True'))
+        self.async_max_concurrency = int(
+            _get_default(infer_from_env, 'CSPUZ_ASYNC_MAX_CONCURRENCY',
+                         str(os.cpu_count() or 1)))
+        self.use_result_cache = strtobool(
+            _get_default(infer_from_env, 'CSPUZ_USE_RESULT_CACHE', 'False'))
+        self.result_cache_size = int(
+            _get_default(infer_from_env, 'CSPUZ_RESULT_CACHE_SIZE', '1024'))
+        self.result_cache_path = _get_default(infer_from_env,
+                                              'CSPUZ_RESULT_CACHE_PATH', None)
+        # entries of the portfolio backend (see `cspuz.backend.portfolio`)
+        self.portfolio = _get_default(infer_from_env, 'CSPUZ_PORTFOLIO',
+                                      'sugar_extended,z3')
+        self.portfolio_record_path = _get_default(
+            infer_from_env, 'CSPUZ_PORTFOLIO_RECORD_PATH', None)
 
 
 config = Config()
@@ -30,7 +30,9 @@ def alldifferent(*args: Any) -> BoolExpr:
 
 
 def count_true(*args: Any) -> IntExpr:
-    operands: List[Union[IntExpr, int]] = []
+    # The backends encode a cardinality (and its comparison with a constant)
+    # directly rather than as a sum of integers.
+    operands: List[BoolExpr] = []
     constant = 0
 
     for x in flatten_iterator(*args):
@@ -38,16 +40,19 @@ def count_true(*args: Any) -> IntExpr:
             if x is True:
                 constant += 1
         elif isinstance(x, BoolExpr):
-            operands.append(x.cond(1, 0))
+            operands.append(x)
         else:
             raise TypeError()
 
-    if constant > 0:
-        operands.append(constant)
     if len(operands) == 0:
+        if constant > 0:
+            return IntExpr(Op.ADD, [constant])
         return IntExpr(Op.INT_CONSTANT, [0])
 
-    return IntExpr(Op.ADD, operands)  # type: ignore
+    ret = IntExpr(Op.COUNT_TRUE, operands)  # type: ignore
+    if constant > 0:
+        return IntExpr(Op.ADD, [ret, constant])
+    return ret
 
 
 def fold_or(*args: Any) -> BoolExpr:
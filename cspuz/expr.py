@@ -1,12 +1,12 @@
-from enum import Enum, auto
+from enum import IntEnum, auto
 from typing import (Any, List, Literal, Optional, Sequence, TYPE_CHECKING,
-                    Union, cast, overload)
+                    Tuple, Union, cast, overload)
 
 if TYPE_CHECKING:
     from .array import BoolArray1D, BoolArray2D, IntArray1D, IntArray2D
 
 
-class Op(Enum):
+class Op(IntEnum):
     VAR = auto()
     BOOL_CONSTANT = auto()
     INT_CONSTANT = auto()
@@ -28,6 +28,7 @@ class Op(Enum):
     IF = auto()  # if (bool) { int } else { int } : int
     ALLDIFF = auto()  # alldifferent(int*) : bool
     GRAPH_ACTIVE_VERTICES_CONNECTED = auto()
+    COUNT_TRUE = auto()  # count_true(bool*) : int
 
 
 BoolOp = Literal[Op.BOOL_CONSTANT, Op.EQ, Op.NE, Op.LE, Op.LT, Op.GE, Op.GT,
@@ -47,7 +48,9 @@ def is_bool_op(op: Op) -> bool:
 
 
 def is_int_op(op: Op) -> bool:
-    return op in [Op.INT_CONSTANT, Op.NEG, Op.ADD, Op.SUB, Op.IF]
+    return op in [
+        Op.INT_CONSTANT, Op.NEG, Op.ADD, Op.SUB, Op.IF, Op.COUNT_TRUE
+    ]
 
 
 def _is_bool_expr_like(value: Any) -> bool:
@@ -104,17 +107,23 @@ def _make_int_expr(op: IntOp, operands: List[ExprLike]) -> 'IntExpr':
 
 
 class Expr:
+    # Models may consist of hundreds of thousands of expressions, so they are
+    # kept small: no per-instance `__dict__` and operands in a tuple.
+    __slots__ = ('op', 'operands')
+
+    op: Op
+    operands: Tuple[ExprLike, ...]
+
     def __init__(self, op: Op, operands: Sequence[ExprLike]):
-        self.op: Op = op
-        self.operands: List[ExprLike] = list(operands)
+        self.op = op
+        self.operands = tuple(operands)
 
     def is_variable(self) -> bool:
         return False
 
 
 class BoolExpr(Expr):
-    def __init__(self, op: Op, operands: Sequence[ExprLike]):
-        super().__init__(op, operands)
+    __slots__ = ()
 
     @overload
     def cond(self, t: IntExprLike, f: IntExprLike) -> 'IntExpr':
@@ -230,8 +239,7 @@ class BoolExpr(Expr):
 
 
 class IntExpr(Expr):
-    def __init__(self, op: Op, operands: Sequence[ExprLike]):
-        super().__init__(op, operands)
+    __slots__ = ()
 
     def __neg__(self) -> 'IntExpr':
         return _make_int_expr(Op.NEG, [self])
@@ -276,38 +284,50 @@ class IntExpr(Expr):
 
 
 class BoolVar(BoolExpr):
+    __slots__ = ('id', '_sol')
+
+    id: int
+    _sol: Optional[bool]
+
     def __init__(self, var_id: int):
-        super().__init__(Op.VAR, [])
-        self.id: int = var_id
-        self.__sol: Optional[bool] = None
+        super().__init__(Op.VAR, ())
+        self.id = var_id
+        self._sol = None
 
     def is_variable(self) -> bool:
         return True
 
     @property
     def sol(self) -> Optional[bool]:
-        return self.__sol
+        return self._sol
 
     @sol.setter
     def sol(self, value: Optional[bool]):
-        self.__sol = value
+        self._sol = value
 
 
 class IntVar(IntExpr):
+    __slots__ = ('id', 'lo', 'hi', '_sol')
+
+    id: int
+    lo: int
+    hi: int
+    _sol: Optional[int]
+
     def __init__(self, var_id: int, lo: int, hi: int):
-        super().__init__(Op.VAR, [])
-        self.id: int = var_id
-        self.lo: int = lo
-        self.hi: int = hi
-        self.__sol: Optional[int] = None
+        super().__init__(Op.VAR, ())
+        self.id = var_id
+        self.lo = lo
+        self.hi = hi
+        self._sol = None
 
     def is_variable(self) -> bool:
         return True
 
     @property
     def sol(self) -> Optional[int]:
-        return self.__sol
+        return self._sol
 
     @sol.setter
     def sol(self, value: Optional[int]):
-        self.__sol = value
+        self._sol = value
@@ -1,12 +1,13 @@
-from typing import (Iterator, List, Optional, Sequence, Tuple, Union, cast,
-                    overload)
+from typing import (Any, Iterator, List, Optional, Sequence, Tuple, Union,
+                    cast, overload)
 
 from .array import (Array2D, BoolArray1D, BoolArray2D, IntArray1D, IntArray2D,
                     _infer_shape)
-from .constraints import (IntExpr, BoolExpr, Op, count_true, then)
+from .constraints import (IntExpr, BoolExpr, Op, count_true, fold_or, then)
 from .expr import BoolExprLike, IntExprLike
 from .grid_frame import BoolGridFrame
 from .configuration import config
+from .lazy import LazyConstraint, evaluate
 from .solver import Solver
 
 
@@ -71,13 +72,146 @@ def _from_grid_frame(grid_frame):
     return edges, graph
 
 
+ENCODINGS = ['rank', 'binary', 'distance']
+
+
+class _Ranks(object):
+    # Ranks of the vertices by which connectivity and acyclicity are encoded
+    # as a spanning tree (forest): every vertex but the root has a parent of
+    # lower rank among its neighbors.
+    #
+    # - rank: integers in [0, n-1] (order-encoded by the backends)
+    # - binary: bit vectors of length ceil(log2(n)) compared by Boolean
+    #   circuits, so that no integer variable is involved
+    # - distance: integers equal to the distance from the root along the tree
+    #   (a parent is exactly one layer above its children), in
+    #   [0, num_nodes-1] where `num_nodes` is the number of vertices which
+    #   can be in the tree
+    def __init__(self,
+                 solver: Solver,
+                 n: int,
+                 encoding: Optional[str],
+                 num_nodes: Optional[int] = None):
+        if encoding is None:
+            encoding = config.graph_encoding
+        if encoding not in ENCODINGS:
+            raise ValueError('unknown encoding {}'.format(encoding))
+        self.encoding = encoding
+        if encoding == 'binary':
+            num_bits = max(1, (n - 1).bit_length())
+            self.bits = [solver.bool_array(num_bits) for _ in range(n)]
+        elif encoding == 'distance' and num_nodes is not None:
+            self.rank = solver.int_array(n, 0, max(min(num_nodes, n) - 1, 0))
+        else:
+            self.rank = solver.int_array(n, 0, n - 1)
+        # the ranks of any two adjacent vertices may be required to differ
+        # (otherwise only the tree edges are)
+        self.all_distinct = encoding != 'distance'
+
+    def _lt(self, i: int, j: int) -> BoolExprLike:
+        a = self.bits[i]
+        b = self.bits[j]
+        ret = ~a[0] & b[0]
+        for p in range(1, len(a)):
+            ret = (~a[p] & b[p]) | ((a[p] == b[p]) & ret)
+        return ret
+
+    def parent(self, i: int, j: int) -> BoolExprLike:
+        # `j` may be the parent of `i`
+        if self.encoding == 'binary':
+            return self._lt(j, i)
+        elif self.encoding == 'distance':
+            return self.rank[j] + 1 == self.rank[i]
+        return self.rank[j] < self.rank[i]
+
+    def not_parent(self, i: int, j: int) -> BoolExprLike:
+        if self.encoding == 'rank':
+            return self.rank[j] >= self.rank[i]
+        return ~self.parent(i, j)
+
+    def tree_edge(self, i: int, j: int) -> BoolExprLike:
+        # required for the edges of the tree
+        if self.encoding == 'binary':
+            return fold_or(
+                [x != y for x, y in zip(self.bits[i], self.bits[j])])
+        elif self.encoding == 'distance':
+            return self.parent(i, j) | self.parent(j, i)
+        return self.rank[i] != self.rank[j]
+
+
+def _num_incident_vertices(is_active_edge: Sequence[BoolExprLike],
+                           graph: Graph) -> int:
+    # the number of vertices which may be incident to an active edge
+    return sum(1 for i in range(graph.num_vertices) if any(
+        is_active_edge[e] is not False for _, e in graph.incident_edges[i]))
+
+
+class _LazyConnectivity(LazyConstraint):
+    # Cuts off models whose active vertices are disconnected: for each
+    # connected component C, if a vertex of C and a vertex of another
+    # component are both active, some vertex adjacent to C must be active.
+    def __init__(self, is_active: Sequence[BoolExprLike], graph: Graph):
+        super().__init__(
+            BoolExpr(
+                Op.GRAPH_ACTIVE_VERTICES_CONNECTED,
+                [graph.num_vertices, len(graph)] +
+                list(is_active) +  # type: ignore
+                sum([[x, y] for x, y in graph.edges], [])))
+        self.is_active = list(is_active)
+        self.graph = graph
+
+    def cuts(self, assignment: Any) -> List[BoolExprLike]:
+        n = self.graph.num_vertices
+        active = [evaluate(x, assignment) for x in self.is_active]
+        component: List[Optional[int]] = [None] * n
+        components: List[List[int]] = []
+        for s in range(n):
+            if not active[s] or component[s] is not None:
+                continue
+            c = len(components)
+            component[s] = c
+            queue = [s]
+            for v in queue:
+                for w, _ in self.graph.incident_edges[v]:
+                    if active[w] and component[w] is None:
+                        component[w] = c
+                        queue.append(w)
+            components.append(queue)
+        if len(components) <= 1:
+            return []
+
+        def negate(x):
+            return (not x) if isinstance(x, bool) else ~x
+
+        ret: List[BoolExprLike] = []
+        for c, vertices in enumerate(components):
+            other = components[c - 1][0]
+            boundary = set()
+            for v in vertices:
+                for w, _ in self.graph.incident_edges[v]:
+                    if not active[w]:
+                        boundary.add(w)
+            ret.append(
+                fold_or([
+                    negate(self.is_active[vertices[0]]),
+                    negate(self.is_active[other])
+                ] + [self.is_active[w] for w in sorted(boundary)]))
+        return ret
+
+
 def _active_vertices_connected(solver: Solver,
                                is_active: Sequence[BoolExprLike],
                                graph: Graph,
                                acyclic: bool = False,
-                               use_graph_primitive: Optional[bool] = None):
+                               use_graph_primitive: Optional[bool] = None,
+                               lazy: Optional[bool] = None,
+                               encoding: Optional[str] = None):
     if use_graph_primitive is None:
         use_graph_primitive = config.use_graph_primitive
+    if encoding == 'lazy':
+        lazy = True
+    elif lazy is None:
+        lazy = config.lazy_connectivity
     if use_graph_primitive and not acyclic:
         solver.ensure(
             BoolExpr(
@@ -86,19 +220,29 @@ def _active_vertices_connected(solver: Solver,
                 list(is_active) +  # type: ignore
                 sum([[x, y] for x, y in graph.edges], [])))
         return
+    if lazy and not acyclic:
+        solver.add_lazy_constraint(_LazyConnectivity(is_active, graph))
+        return
 
     n = graph.num_vertices
 
-    ranks = solver.int_array(n, 0, n - 1)
+    # a tree cannot be deeper than the number of vertices which may be active
+    num_nodes = sum(1 for x in is_active if x is not False)
+    ranks = _Ranks(solver, n, None if encoding == 'lazy' else encoding,
+                   num_nodes)
     is_root = solver.bool_array(n)
 
     for i in range(n):
-        less_ranks = [((ranks[j] < ranks[i]) & is_active[j])
+        less_ranks = [(ranks.parent(i, j) & is_active[j])
                       for j, _ in graph.incident_edges[i]]
         if acyclic:
             for j, _ in graph.incident_edges[i]:
                 if i < j:
-                    solver.ensure(ranks[j] != ranks[i])
+                    if ranks.all_distinct:
+                        solver.ensure(ranks.tree_edge(j, i))
+                    else:
+                        solver.ensure((is_active[i] & is_active[j]).then(
+                            ranks.tree_edge(j, i)))
             solver.ensure(
                 then(is_active[i],
                      count_true(less_ranks + [is_root[i]]) == 1))
@@ -116,7 +260,9 @@ def active_vertices_connected(solver: Solver,
                               graph: Graph,
                               *,
                               acyclic: bool = False,
-                              use_graph_primitive: Optional[bool] = None):
+                              use_graph_primitive: Optional[bool] = None,
+                              lazy: Optional[bool] = None,
+                              encoding: Optional[str] = None):
     ...
 
 
@@ -125,7 +271,9 @@ def active_vertices_connected(solver: Solver,
                               is_active: BoolArray2D,
                               *,
                               acyclic: bool = False,
-                              use_graph_primitive: Optional[bool] = None):
+                              use_graph_primitive: Optional[bool] = None,
+                              lazy: Optional[bool] = None,
+                              encoding: Optional[str] = None):
     ...
 
 
@@ -136,7 +284,18 @@ def active_vertices_connected(
     *,
     acyclic: bool = False,
     use_graph_primitive: Optional[bool] = None,
+    lazy: Optional[bool] = None,
+    encoding: Optional[str] = None,
 ):
+    """Ensures that the active vertices are connected.
+
+    Unless `use_graph_primitive` is set, connectivity is encoded by ranks of
+    the vertices, whose encoding is chosen by `encoding` (one of `ENCODINGS`,
+    default: `config.graph_encoding`). If `lazy` is set (default:
+    `config.lazy_connectivity`) or `encoding` is 'lazy', it is instead
+    checked on each model found by the backend and enforced by cuts (see
+    `cspuz.lazy`); this does not apply to `acyclic`.
+    """
     if graph is None:
         if not isinstance(is_active, BoolArray2D):
             raise TypeError(
@@ -159,7 +318,9 @@ def active_vertices_connected(
                                is_active2,
                                graph2,
                                acyclic=acyclic,
-                               use_graph_primitive=use_graph_primitive)
+                               use_graph_primitive=use_graph_primitive,
+                               lazy=lazy,
+                               encoding=encoding)
 
 
 @overload
@@ -246,17 +407,25 @@ def active_vertices_not_adjacent_and_not_segmenting(
 
 def active_edges_acyclic(solver: Solver,
                          is_active_edge: Union[Sequence[BoolExprLike],
-                                               BoolArray1D], graph: Graph):
+                                               BoolArray1D],
+                         graph: Graph,
+                         *,
+                         encoding: Optional[str] = None):
     n = graph.num_vertices
 
-    ranks = solver.int_array(n, 0, n - 1)
+    ranks = _Ranks(solver, n, encoding,
+                   _num_incident_vertices(is_active_edge, graph))
 
     for i in range(n):
         less_ranks = []
         for j, e in graph.incident_edges[i]:
-            less_ranks.append((ranks[j] < ranks[i]) & is_active_edge[e])
+            less_ranks.append(ranks.parent(i, j) & is_active_edge[e])
             if i < j:
-                solver.ensure(ranks[i] != ranks[j])
+                if ranks.all_distinct:
+                    solver.ensure(ranks.tree_edge(i, j))
+                else:
+                    solver.ensure(is_active_edge[e].then(
+                        ranks.tree_edge(i, j)))
         solver.ensure(count_true(less_ranks) <= 1)
 
 
@@ -266,7 +435,8 @@ def _division_connected(solver: Solver,
                         graph: Graph,
                         roots: Optional[Sequence[Optional[int]]] = None,
                         allow_empty_group: bool = False,
-                        use_graph_primitive: Optional[bool] = None):
+                        use_graph_primitive: Optional[bool] = None,
+                        encoding: Optional[str] = None):
     if use_graph_primitive is None:
         use_graph_primitive = config.use_graph_primitive
 
@@ -294,18 +464,18 @@ def _division_connected(solver: Solver,
                     solver.ensure(division[r] == i)
         return
 
-    rank = solver.int_array(n, 0, n - 1)
+    ranks = _Ranks(solver, n, encoding)
     is_root = solver.bool_array(n)
     spanning_forest = solver.bool_array(m)
 
     for i in range(n):
         less_ranks = []
         for j, e in graph.incident_edges[i]:
-            less_ranks.append(spanning_forest[e] & (rank[i] > rank[j]))
+            less_ranks.append(spanning_forest[e] & ranks.parent(i, j))
             if i < j:
                 solver.ensure(
                     spanning_forest[e].then((division[i] == division[j])
-                                            & (rank[i] != rank[j])))
+                                            & ranks.tree_edge(i, j)))
         solver.ensure(count_true(less_ranks) == is_root[i].cond(0, 1))
     for i in range(num_regions):
         if allow_empty_group:
@@ -330,7 +500,8 @@ def division_connected(solver: Solver,
                        graph: Graph = None,
                        *,
                        roots: Optional[Sequence[Optional[int]]] = None,
-                       allow_empty_group=False):
+                       allow_empty_group=False,
+                       encoding: Optional[str] = None):
     ...
 
 
@@ -340,7 +511,8 @@ def division_connected(solver: Solver,
                        num_regions: int,
                        *,
                        roots: Optional[Sequence[Optional[int]]] = None,
-                       allow_empty_group=False):
+                       allow_empty_group=False,
+                       encoding: Optional[str] = None):
     ...
 
 
@@ -353,7 +525,8 @@ def division_connected(solver: Solver,
                        roots: Union[Sequence[Optional[int]],
                                     Sequence[Optional[Tuple[int,
                                                             int]]]] = None,
-                       allow_empty_group=False):
+                       allow_empty_group=False,
+                       encoding: Optional[str] = None):
     if graph is None:
         if not isinstance(division, IntArray2D):
             raise TypeError(
@@ -379,7 +552,8 @@ def division_connected(solver: Solver,
                             num_regions,
                             _grid_graph(height, width),
                             roots=roots_conv,
-                            allow_empty_group=allow_empty_group)
+                            allow_empty_group=allow_empty_group,
+                            encoding=encoding)
     else:
         if isinstance(division, IntArray2D):
             raise TypeError(
@@ -390,7 +564,8 @@ def division_connected(solver: Solver,
                             graph,
                             roots=cast('Union[Sequence[Optional[int]]]',
                                        roots),
-                            allow_empty_group=allow_empty_group)
+                            allow_empty_group=allow_empty_group,
+                            encoding=encoding)
 
 
 def _division_connected_variable_groups(
@@ -512,7 +687,8 @@ def division_connected_variable_groups(
 def _active_edges_single_cycle(solver: Solver,
                                is_active_edge: Sequence[BoolExprLike],
                                graph: Graph,
-                               use_graph_primitive: Optional[bool] = None):
+                               use_graph_primitive: Optional[bool] = None,
+                               encoding: Optional[str] = None):
     if use_graph_primitive is None:
         use_graph_primitive = config.use_graph_primitive
     n = graph.num_vertices
@@ -541,7 +717,8 @@ def _active_edges_single_cycle(solver: Solver,
                 list(is_active_edge) +  # type: ignore
                 sum([[x, y] for x, y in edge_graph], [])))
     else:
-        rank = solver.int_array(n, 0, n - 1)
+        ranks = _Ranks(solver, n, encoding,
+                       _num_incident_vertices(is_active_edge, graph))
         is_root = solver.bool_array(n)
 
         for i in range(n):
@@ -550,7 +727,7 @@ def _active_edges_single_cycle(solver: Solver,
             solver.ensure(degree == is_passed[i].cond(2, 0))
             solver.ensure(is_passed[i].then(
                 count_true([
-                    is_active_edge[e] & (rank[j] >= rank[i])
+                    is_active_edge[e] & ranks.not_parent(i, j)
                     for j, e in graph.incident_edges[i]
                 ]) <= is_root[i].cond(2, 1)))
         solver.ensure(count_true(is_root) == 1)
@@ -561,7 +738,8 @@ def _active_edges_single_cycle(solver: Solver,
 def active_edges_single_cycle(solver: Solver,
                               is_active_edge: BoolGridFrame,
                               *,
-                              use_graph_primitive: Optional[bool] = None):
+                              use_graph_primitive: Optional[bool] = None,
+                              encoding: Optional[str] = None):
     ...
 
 
@@ -571,7 +749,8 @@ def active_edges_single_cycle(solver: Solver,
                                                     BoolArray1D],
                               graph: Graph,
                               *,
-                              use_graph_primitive: Optional[bool] = None):
+                              use_graph_primitive: Optional[bool] = None,
+                              encoding: Optional[str] = None):
     ...
 
 
@@ -581,7 +760,8 @@ def active_edges_single_cycle(solver: Solver,
                                                     BoolArray1D],
                               graph: Optional[Graph] = None,
                               *,
-                              use_graph_primitive: Optional[bool] = None):
+                              use_graph_primitive: Optional[bool] = None,
+                              encoding: Optional[str] = None):
     if graph is None:
         if not isinstance(is_active_edge, BoolGridFrame):
             raise TypeError(
@@ -589,7 +769,11 @@ def active_edges_single_cycle(solver: Solver,
                 'specified')
         edges, graph = _from_grid_frame(is_active_edge)
         is_passed_flat = _active_edges_single_cycle(
-            solver, edges, graph, use_graph_primitive=use_graph_primitive)
+            solver,
+            edges,
+            graph,
+            use_graph_primitive=use_graph_primitive,
+            encoding=encoding)
         return is_passed_flat.reshape(
             (is_active_edge.height + 1, is_active_edge.width + 1))
     else:
@@ -603,4 +787,5 @@ def active_edges_single_cycle(solver: Solver,
             solver,
             is_active_edge,
             graph,
-            use_graph_primitive=use_graph_primitive)
+            use_graph_primitive=use_graph_primitive,
+            encoding=encoding)
@@ -0,0 +1,108 @@
+"""
+Hash-consing of expressions.
+
+`ExprPool` maps structurally identical expressions to one canonical node, so
+that the expressions added to a solver form a DAG instead of a forest of
+trees. Backends use it to encode every shared subexpression only once.
+"""
+
+from typing import Any, Dict, Hashable, Iterable, Tuple
+
+from .expr import Expr, ExprLike
+
+
+class ExprPool(object):
+    def __init__(self):
+        # structural key -> canonical node
+        self.nodes: Dict[Hashable, Expr] = dict()
+        # id(expr) -> (expr, canonical node of expr)
+        self.canonical: Dict[int, Tuple[Expr, Expr]] = dict()
+        # id(canonical node) -> number of references from parents and roots
+        self.ref_count: Dict[int, int] = dict()
+        # id(canonical node) -> number of nodes of the node as a tree
+        self.tree_size: Dict[int, int] = dict()
+        self.num_tree_nodes = 0
+
+    @property
+    def num_dag_nodes(self) -> int:
+        return len(self.nodes)
+
+    def _key(self, e: Any) -> Hashable:
+        if isinstance(e, bool):
+            return ('b', e)
+        elif isinstance(e, int):
+            return ('i', e)
+        else:
+            return id(self.canonical[id(e)][1])
+
+    def _register(self, e: Expr) -> None:
+        if e.is_variable():
+            # keyed by id rather than identity, so that the clones made by
+            # `Solver` share the nodes of the original variables
+            key: Hashable = (type(e), e.id)  # type: ignore
+        else:
+            key = (e.op, tuple(self._key(x) for x in e.operands))
+        node = self.nodes.get(key)
+        if node is None:
+            operands = [
+                self.canonical[id(x)][1] if isinstance(x, Expr) else x
+                for x in e.operands
+            ]
+            if all(x is y for x, y in zip(operands, e.operands)):
+                node = e
+            else:
+                node = type(e)(e.op, operands)
+            self.nodes[key] = node
+            self.ref_count[id(node)] = 0
+            size = 1
+            for x in operands:
+                if isinstance(x, Expr):
+                    self.ref_count[id(x)] += 1
+                    size += self.tree_size[id(x)]
+            self.tree_size[id(node)] = size
+        self.canonical[id(e)] = (e, node)
+
+    def intern(self, e: ExprLike) -> ExprLike:
+        """Returns the canonical node structurally identical to `e`."""
+        if not isinstance(e, Expr):
+            return e
+        canonical = self.canonical
+        stack = [e]
+        while len(stack) > 0:
+            top = stack[-1]
+            if id(top) in canonical:
+                stack.pop()
+                continue
+            pending = [
+                x for x in top.operands
+                if isinstance(x, Expr) and id(x) not in canonical
+            ]
+            if len(pending) > 0:
+                stack += pending
+                continue
+            stack.pop()
+            self._register(top)
+        node = canonical[id(e)][1]
+        self.ref_count[id(node)] += 1
+        self.num_tree_nodes += self.tree_size[id(node)]
+        return node
+
+    def is_shared(self, e: ExprLike) -> bool:
+        """Returns whether the canonical node `e` is worth an auxiliary
+        variable: it is referenced more than once and is not a leaf or an
+        operator applied to leaves only."""
+        if not isinstance(e, Expr) or e.is_variable():
+            return False
+        if self.ref_count.get(id(e), 0) < 2:
+            return False
+        return any(
+            isinstance(x, Expr) and not x.is_variable() for x in e.operands)
+
+
+def sharing_stats(exprs: Iterable[ExprLike]) -> Tuple[int, int]:
+    """Returns the number of expression nodes in `exprs` counted as trees and
+    as a DAG after structurally identical subexpressions are merged."""
+    pool = ExprPool()
+    for e in exprs:
+        pool.intern(e)
+    return pool.num_tree_nodes, pool.num_dag_nodes
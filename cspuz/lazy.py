@@ -0,0 +1,177 @@
+"""
+Lazily enforced constraints.
+
+A `LazyConstraint` is not encoded in the backend. Instead, every model found
+by the backend is checked by `LazyConstraint.cuts`, which returns clauses
+violated by the model (and implied by the constraint); these clauses are
+added to the backend and the backend is asked again, until a model satisfying
+all the lazy constraints is found or the problem turns out to be
+unsatisfiable. This is worthwhile for constraints whose eager encoding is
+large but which are usually satisfied after a few cuts, e.g. connectivity.
+"""
+
+from typing import Any, Dict, List
+
+from .expr import BoolExpr, BoolExprLike, Expr, ExprLike, Op
+
+
+def evaluate(e: ExprLike, assignment: Any = None) -> Any:
+    """Returns the value of `e` under `assignment` (an `Assignment`; the `sol`
+    of the variables by default), or None if some of the variables are
+    undetermined."""
+    memo: Dict[int, Any] = dict()
+
+    def value(x):
+        if not isinstance(x, Expr):
+            return x
+        if x.is_variable():
+            if assignment is None:
+                return x.sol
+            return assignment.values.get(x.id)
+        return memo[id(x)]
+
+    # post-order with an explicit stack, so that deeply nested expressions
+    # do not hit the recursion limit
+    stack = [(e, False)]
+    while len(stack) > 0:
+        x, expanded = stack.pop()
+        if not isinstance(x, Expr) or x.is_variable() or id(x) in memo:
+            continue
+        if not expanded:
+            stack.append((x, True))
+            for y in x.operands:
+                stack.append((y, False))
+            continue
+        memo[id(x)] = _evaluate_node(x, [value(y) for y in x.operands])
+    return value(e)
+
+
+def _evaluate_node(e: Expr, values: List[Any]) -> Any:
+    op = e.op
+    if op == Op.IF:
+        c = values[0]
+        if c is None:
+            return None
+        return values[1] if c else values[2]
+    if any(v is None for v in values):
+        return None
+    if op in (Op.BOOL_CONSTANT, Op.INT_CONSTANT):
+        return values[0]
+    elif op == Op.NEG:
+        return -values[0]
+    elif op == Op.ADD:
+        return sum(values)
+    elif op == Op.SUB:
+        return values[0] - values[1]
+    elif op == Op.EQ:
+        return values[0] == values[1]
+    elif op == Op.NE:
+        return values[0] != values[1]
+    elif op == Op.LE:
+        return values[0] <= values[1]
+    elif op == Op.LT:
+        return values[0] < values[1]
+    elif op == Op.GE:
+        return values[0] >= values[1]
+    elif op == Op.GT:
+        return values[0] > values[1]
+    elif op == Op.NOT:
+        return not values[0]
+    elif op == Op.AND:
+        return all(values)
+    elif op == Op.OR:
+        return any(values)
+    elif op == Op.IFF:
+        return values[0] == values[1]
+    elif op == Op.XOR:
+        return values[0] != values[1]
+    elif op == Op.IMP:
+        return (not values[0]) or values[1]
+    elif op == Op.ALLDIFF:
+        return len(set(values)) == len(values)
+    elif op == Op.COUNT_TRUE:
+        return sum(1 for x in values if x)
+    else:
+        raise ValueError('unsupported operator {}'.format(op))
+
+
+class LazyConstraint(object):
+    def __init__(self, constraint: BoolExpr):
+        # an expression equivalent to this constraint, which identifies the
+        # constraint in the result cache
+        self.constraint = constraint
+
+    def cuts(self, assignment: Any) -> List[BoolExprLike]:
+        """Returns clauses which the model `assignment` (an `Assignment`)
+        violates, or an empty list if the model satisfies this constraint."""
+        raise NotImplementedError
+
+
+# methods of the backend which are re-exported by `LazySession` when the
+# backend provides them
+_SOLVING_METHODS = [
+    'solve_with_assumptions', 'solve_async', 'solve_with_assumptions_async'
+]
+
+
+class LazySession(object):
+    # Wraps a backend CSPSolver so that its models satisfy the lazy
+    # constraints. Cuts are implied by the constraints, so they are kept in
+    # the backend for the following calls (and the unsat cores of
+    # `solve_with_assumptions` are not affected by them).
+    def __init__(self, csp_solver: Any,
+                 lazy_constraints: List[LazyConstraint]):
+        self.csp_solver = csp_solver
+        self.lazy_constraints = lazy_constraints
+        self.num_cuts = 0
+
+    def add_constraint(self, constraint: Any) -> None:
+        self.csp_solver.add_constraint(constraint)
+
+    def _cuts(self) -> List[BoolExprLike]:
+        from .assignment import Assignment
+        # the model is read from the variables of the backend, which are not
+        # necessarily the ones in the constraints
+        assignment = Assignment.from_variables(True, self.csp_solver.variables)
+        cuts: List[BoolExprLike] = []
+        for c in self.lazy_constraints:
+            cuts += c.cuts(assignment)
+        if len(cuts) > 0:
+            self.num_cuts += len(cuts)
+            self.csp_solver.add_constraint(cuts)
+        return cuts
+
+    def solve(self) -> bool:
+        return self._solve('solve', ())
+
+    def _solve(self, method: str, args: Any) -> bool:
+        while True:
+            if not getattr(self.csp_solver, method)(*args):
+                return False
+            if len(self._cuts()) == 0:
+                return True
+
+    async def _solve_async(self, method: str, args: Any) -> bool:
+        while True:
+            if not await getattr(self.csp_solver, method)(*args):
+                return False
+            if len(self._cuts()) == 0:
+                return True
+
+    def unsat_core(self) -> List[int]:
+        return self.csp_solver.unsat_core()
+
+    def __getattr__(self, name: str) -> Any:
+        if name not in _SOLVING_METHODS or not hasattr(
+                self.csp_solver, name):
+            raise AttributeError(name)
+        if name.endswith('_async'):
+            return lambda *args: self._solve_async(name, args)
+        return lambda *args: self._solve(name, args)
+
+
+def lazy_session(csp_solver: Any,
+                 lazy_constraints: List[LazyConstraint]) -> Any:
+    if len(lazy_constraints) == 0:
+        return csp_solver
+    return LazySession(csp_solver, lazy_constraints)
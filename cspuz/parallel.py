@@ -0,0 +1,165 @@
+"""
+Parallel deduction of the answer keys.
+
+Once a solution is known, whether each answer key is forced can be decided
+independently of the others, by asking whether the key can differ from the
+known solution. With `config.deduction_workers` > 1, `Solver.solve` shards
+these queries over a pool of worker processes. Each worker builds the backend
+problem only once, so that a backend supporting `solve_with_assumptions`
+(z3, cnf) keeps its state across the queries of the worker. A model found by
+a worker refutes every key it disagrees with; refuted keys are published
+through shared memory, and the other workers skip them. Keys which are not
+checked by the deadline of `solve` are reported as pending.
+"""
+
+import concurrent.futures
+import importlib
+import multiprocessing
+import subprocess
+import time
+from types import ModuleType
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from .configuration import config
+from .expr import BoolExprLike, BoolVar, IntVar
+from .lazy import LazyConstraint, lazy_session
+
+# the keys are split into this many shards per worker, so that a worker whose
+# shards turn out to be refuted by the others picks up more work
+_SHARDS_PER_WORKER = 4
+
+# state of a worker process
+_worker: Any = None
+
+
+class _Worker(object):
+    def __init__(self, backend_name: str,
+                 variables: List[Union[BoolVar, IntVar]],
+                 constraints: List[BoolExprLike],
+                 lazy_constraints: List[LazyConstraint],
+                 answer: List[Any], refuted: Any, deadline: Optional[float],
+                 config_dict: Dict[str, Any]):
+        # worker processes do not necessarily inherit the configuration
+        for key, value in config_dict.items():
+            setattr(config, key, value)
+        self.backend = importlib.import_module(backend_name)
+        self.variables = variables
+        self.constraints = constraints
+        self.lazy_constraints = lazy_constraints
+        self.answer = answer
+        self.keys = [i for i, a in enumerate(answer) if a is not None]
+        self.refuted = refuted
+        self.deadline = deadline
+        self.session = None
+        if hasattr(self.backend.CSPSolver, 'solve_with_assumptions'):
+            self.session = self._new_session()
+
+    def _new_session(self) -> Any:
+        csp_solver = self.backend.CSPSolver(self.variables)
+        csp_solver.deadline = self.deadline
+        csp_solver.add_constraint(self.constraints)
+        return lazy_session(csp_solver, self.lazy_constraints)
+
+    def _can_differ(self, i: int) -> bool:
+        query = self.variables[i] != self.answer[i]
+        if self.session is not None:
+            return self.session.solve_with_assumptions([query])
+        # other backends solve the problem from scratch for each query
+        csp_solver = self._new_session()
+        csp_solver.add_constraint(query)
+        return csp_solver.solve()
+
+    def check(
+        self, shard: Sequence[int]
+    ) -> Tuple[List[int], List[int], List[float]]:
+        # Returns the keys in `shard` found to be forced, those not checked
+        # by the deadline and the time of each query.
+        forced = []
+        pending = []
+        times = []
+        for i in shard:
+            if self.refuted[i]:
+                continue
+            if self.deadline is not None and time.time() >= self.deadline:
+                pending.append(i)
+                continue
+            start = time.perf_counter()
+            try:
+                is_sat = self._can_differ(i)
+            except subprocess.TimeoutExpired:
+                pending.append(i)
+                continue
+            finally:
+                times.append(time.perf_counter() - start)
+            if is_sat:
+                for j in self.keys:
+                    if not self.refuted[j] and self.variables[
+                            j].sol != self.answer[j]:
+                        self.refuted[j] = 1
+            else:
+                forced.append(i)
+                if self.session is not None:
+                    self.session.add_constraint(
+                        self.variables[i] == self.answer[i])
+        return forced, pending, times
+
+
+def _init_worker(*args: Any) -> None:
+    global _worker
+    _worker = _Worker(*args)
+
+
+def _check(
+        shard: Sequence[int]) -> Tuple[List[int], List[int], List[float]]:
+    return _worker.check(shard)
+
+
+class ParallelDeduction(object):
+    # A step of the solving procedures (see `Solver._solve`) which decides
+    # the answer keys in a process pool.
+    def __init__(self, backend: ModuleType,
+                 variables: List[Union[BoolVar, IntVar]],
+                 constraints: List[BoolExprLike],
+                 lazy_constraints: List[LazyConstraint], num_workers: int,
+                 deadline: Optional[float]):
+        self.backend = backend
+        self.variables = variables
+        self.constraints = constraints
+        self.lazy_constraints = lazy_constraints
+        self.num_workers = num_workers
+        # `time.time()` by which the workers stop checking the keys
+        self.deadline = deadline
+        self.round_times: List[float] = []
+        # keys not checked by the deadline
+        self.pending: List[int] = []
+
+    def deduce(self, answer: List[Any]) -> List[Any]:
+        """Given a solution `answer` (None for the variables other than the
+        answer keys), returns the answer keys forced by the problem, with
+        None for the keys which may differ or are left in `self.pending`."""
+        keys = [i for i, a in enumerate(answer) if a is not None]
+        num_shards = min(len(keys), self.num_workers * _SHARDS_PER_WORKER)
+        if num_shards == 0:
+            return answer
+        shards = [keys[k::num_shards] for k in range(num_shards)]
+        context = multiprocessing.get_context()
+        refuted = context.Array('b', len(answer), lock=False)
+        config_dict = dict(vars(config))
+        forced = set()
+        with concurrent.futures.ProcessPoolExecutor(
+                max_workers=min(self.num_workers, num_shards),
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(self.backend.__name__, self.variables,
+                          self.constraints, self.lazy_constraints, answer,
+                          refuted, self.deadline, config_dict)) as executor:
+            for shard_forced, pending, times in executor.map(_check, shards):
+                forced.update(shard_forced)
+                self.pending += pending
+                self.round_times += times
+        # keys may have been refuted by other workers in the meantime
+        self.pending = [i for i in self.pending if not refuted[i]]
+        ret: List[Optional[Any]] = [None] * len(answer)
+        for i in forced:
+            ret[i] = answer[i]
+        return ret
@@ -0,0 +1,270 @@
+"""
+Presolving of constraints on the Python side.
+
+Unit facts (`b`, `~b`, `x == 3`, `x <= 3`, ...) and equivalences between
+variables (`b1 == b2`, `b1 != b2`, `x == y`) are extracted from the top-level
+constraints and substituted into the remaining ones, merging equivalent
+variables by union-find and tightening integer bounds, until no more facts
+are found. The backend then only sees the reduced problem: variables which
+are fixed or no longer appear in any constraint are not sent to it.
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from .expr import Op, Expr, BoolExpr, BoolExprLike, BoolVar, ExprLike, IntVar
+from .simplifier import simplify_constraints
+
+Variable = Union[BoolVar, IntVar]
+
+_FLIPPED = {Op.LE: Op.GE, Op.LT: Op.GT, Op.GE: Op.LE, Op.GT: Op.LT}
+
+
+class PresolveUnsat(Exception):
+    pass
+
+
+def _as_literal(e: ExprLike) -> Optional[Tuple[int, bool]]:
+    # (var id, negated) if `e` is a bool variable or its negation
+    if isinstance(e, BoolVar):
+        return e.id, False
+    if isinstance(e, Expr) and e.op == Op.NOT and isinstance(
+            e.operands[0], BoolVar):
+        return e.operands[0].id, True
+    return None
+
+
+class PresolveResult(object):
+    """The reduced problem and the way back to the original variables."""
+    def __init__(self, presolver: '_Presolver',
+                 constraints: List[BoolExprLike]):
+        self.presolver = presolver
+        self.constraints = constraints
+
+        used = set()
+        stack: List[ExprLike] = list(constraints)
+        visited = set()
+        while len(stack) > 0:
+            e = stack.pop()
+            if not isinstance(e, Expr) or id(e) in visited:
+                continue
+            visited.add(id(e))
+            if e.is_variable():
+                used.add(e.id)  # type: ignore
+            else:
+                stack += e.operands
+        self.used = used
+        self.variables: List[Variable] = [
+            presolver.proxies[i] for i in sorted(used)
+        ]
+
+    def is_answer_key(self, variables: Sequence[Variable],
+                      is_answer_key: Sequence[bool]) -> List[bool]:
+        """Answer key flags of `self.variables`: a reduced variable is an
+        answer key if any original answer key is merged into it."""
+        keys = set()
+        for v, k in zip(variables, is_answer_key):
+            if k:
+                keys.add(self.presolver.find(v.id)[0])
+        return [v.id in keys for v in self.variables]
+
+    def load_solution(self, variables: Sequence[Variable],
+                      fill_free: bool) -> None:
+        """Sets `sol` of the original `variables` from the reduced ones.
+        Variables which appear in no constraint take an arbitrary value if
+        `fill_free` is set and are left undetermined (`None`) otherwise."""
+        presolver = self.presolver
+        for v in variables:
+            root, negated = presolver.find(v.id)
+            value = presolver.fixed_value(root)
+            if value is None:
+                proxy = presolver.proxies[root]
+                if root in self.used:
+                    value = proxy.sol
+                elif fill_free:
+                    value = False if isinstance(proxy, BoolVar) else proxy.lo
+            if negated and value is not None:
+                value = not value
+            v.sol = value
+
+
+class _Presolver(object):
+    def __init__(self, variables: Sequence[Variable]):
+        self.parent: Dict[int, Tuple[int, bool]] = dict()
+        self.value: Dict[int, bool] = dict()
+        self.proxies: Dict[int, Variable] = dict()
+        for v in variables:
+            if isinstance(v, BoolVar):
+                self.proxies[v.id] = BoolVar(v.id)
+            else:
+                self.proxies[v.id] = IntVar(v.id, v.lo, v.hi)
+
+    def find(self, i: int) -> Tuple[int, bool]:
+        negated = False
+        path = []
+        while i in self.parent:
+            path.append(i)
+            i, p = self.parent[i]
+            negated ^= p
+        # path compression
+        parity = negated
+        for j in path:
+            p = self.parent[j][1]
+            self.parent[j] = (i, parity)
+            parity ^= p
+        return i, negated
+
+    def fixed_value(self, root: int) -> Union[None, bool, int]:
+        proxy = self.proxies[root]
+        if isinstance(proxy, BoolVar):
+            return self.value.get(root)
+        if proxy.lo == proxy.hi:
+            return proxy.lo
+        return None
+
+    def fix_bool(self, i: int, value: bool) -> None:
+        root, negated = self.find(i)
+        value ^= negated
+        if self.value.get(root, value) != value:
+            raise PresolveUnsat()
+        self.value[root] = value
+
+    def restrict_int(self, i: int, lo: int, hi: int) -> None:
+        root, _ = self.find(i)
+        proxy = self.proxies[root]
+        assert isinstance(proxy, IntVar)
+        proxy.lo = max(proxy.lo, lo)
+        proxy.hi = min(proxy.hi, hi)
+        if proxy.lo > proxy.hi:
+            raise PresolveUnsat()
+
+    def union(self, i: int, j: int, negated: bool) -> None:
+        ri, pi = self.find(i)
+        rj, pj = self.find(j)
+        parity = pi ^ pj ^ negated
+        if ri == rj:
+            if parity:
+                raise PresolveUnsat()
+            return
+        self.parent[ri] = (rj, parity)
+        proxy = self.proxies[ri]
+        # `ri` now resolves to `rj`, so its facts are moved over there
+        if isinstance(proxy, BoolVar):
+            if ri in self.value:
+                self.fix_bool(ri, self.value.pop(ri))
+        else:
+            self.restrict_int(ri, proxy.lo, proxy.hi)
+
+    def consume(self, e: BoolExprLike) -> bool:
+        """Records `e` and returns True if it is a unit fact or an
+        equivalence between variables."""
+        if not isinstance(e, Expr):
+            return False
+        lit = _as_literal(e)
+        if lit is not None:
+            self.fix_bool(lit[0], not lit[1])
+            return True
+        if e.op in (Op.IFF, Op.XOR):
+            a = _as_literal(e.operands[0])
+            b = _as_literal(e.operands[1])
+            if a is None or b is None:
+                return False
+            self.union(a[0], b[0], a[1] ^ b[1] ^ (e.op == Op.XOR))
+            return True
+        if e.op in (Op.EQ, Op.NE, Op.LE, Op.LT, Op.GE, Op.GT):
+            x, y = e.operands
+            op = e.op
+            if isinstance(y, IntVar) and not isinstance(x, IntVar):
+                x, y = y, x
+                op = _FLIPPED.get(op, op)
+            if not isinstance(x, IntVar):
+                return False
+            if isinstance(y, IntVar):
+                if op != Op.EQ:
+                    return False
+                self.union(x.id, y.id, False)
+                return True
+            if not isinstance(y, int):
+                return False
+            if op == Op.EQ:
+                self.restrict_int(x.id, y, y)
+            elif op == Op.LE:
+                self.restrict_int(x.id, -(1 << 62), y)
+            elif op == Op.LT:
+                self.restrict_int(x.id, -(1 << 62), y - 1)
+            elif op == Op.GE:
+                self.restrict_int(x.id, y, 1 << 62)
+            elif op == Op.GT:
+                self.restrict_int(x.id, y + 1, 1 << 62)
+            else:
+                proxy = self.proxies[self.find(x.id)[0]]
+                if proxy.lo == y:  # type: ignore
+                    self.restrict_int(x.id, y + 1, 1 << 62)
+                elif proxy.hi == y:  # type: ignore
+                    self.restrict_int(x.id, -(1 << 62), y - 1)
+                else:
+                    return False
+            return True
+        return False
+
+    def _replacement(self, v: Variable) -> ExprLike:
+        root, negated = self.find(v.id)
+        value = self.fixed_value(root)
+        if value is not None:
+            return (not value) if negated else value
+        proxy = self.proxies[root]
+        if negated:
+            return BoolExpr(Op.NOT, [proxy])
+        return proxy
+
+    def substitute(self, e: ExprLike, memo: Dict[int, Tuple[ExprLike,
+                                                          ExprLike]]):
+        def substituted(x: ExprLike) -> ExprLike:
+            if not isinstance(x, Expr):
+                return x
+            if x.is_variable():
+                return self._replacement(x)  # type: ignore
+            return memo[id(x)][1]
+
+        # post-order with an explicit stack, so that deeply nested
+        # expressions do not hit the recursion limit
+        stack: List[Tuple[ExprLike, bool]] = [(e, False)]
+        while len(stack) > 0:
+            x, expanded = stack.pop()
+            if not isinstance(x, Expr) or x.is_variable() or id(x) in memo:
+                continue
+            if not expanded:
+                stack.append((x, True))
+                for y in x.operands:
+                    stack.append((y, False))
+                continue
+            operands = [substituted(y) for y in x.operands]
+            if all(y is z for y, z in zip(operands, x.operands)):
+                ret: ExprLike = x
+            else:
+                ret = type(x)(x.op, operands)
+            memo[id(x)] = (x, ret)
+        return substituted(e)
+
+
+def presolve(variables: Sequence[Variable],
+             constraints: List[BoolExprLike]) -> Optional[PresolveResult]:
+    """Presolves `constraints` over `variables`. Returns `None` if the
+    constraints turn out to be unsatisfiable."""
+    presolver = _Presolver(variables)
+    current: Optional[List[BoolExprLike]] = constraints
+    first = True
+    try:
+        while True:
+            assert current is not None
+            rest = [e for e in current if not presolver.consume(e)]
+            if len(rest) == len(current) and not first:
+                break
+            first = False
+            memo: Dict[int, Tuple[ExprLike, ExprLike]] = dict()
+            current = simplify_constraints(
+                [presolver.substitute(e, memo) for e in rest])
+            if current is None:
+                return None
+    except PresolveUnsat:
+        return None
+    return PresolveResult(presolver, current)
@@ -0,0 +1,97 @@
+"""
+Fallback encodings of the graph primitives.
+
+With `config.use_graph_primitive`, the constraints of `cspuz.graph` are
+emitted as primitive operators (`Op.GRAPH_*`) instead of their encodings.
+A backend declares the primitives it understands by a module-level
+`supports_op(op)`; the other primitives are expanded here, just before the
+problem is sent to the backend, into the encodings of `cspuz.graph` over
+auxiliary variables.
+"""
+
+from types import ModuleType
+from typing import List, Optional, Sequence, Tuple, Union
+
+from .configuration import config
+from .expr import BoolExprLike, BoolVar, Expr, ExprLike, IntVar, Op
+from .simplifier import simplify_constraints
+from .solver import Solver
+
+GRAPH_OPS = (Op.GRAPH_ACTIVE_VERTICES_CONNECTED, )
+
+
+def supports(backend: ModuleType, op: Op) -> bool:
+    supports_op = getattr(backend, 'supports_op', None)
+    return supports_op is not None and supports_op(op)
+
+
+class _AuxSolver(Solver):
+    # auxiliary variables are numbered after those of the original problem
+    def __init__(self, first_id: int):
+        super().__init__()
+        self.first_id = first_id
+
+    def bool_var(self) -> BoolVar:
+        v = BoolVar(self.first_id + len(self.variables))
+        self.variables.append(v)
+        self.is_answer_key.append(False)
+        return v
+
+    def int_var(self, lo, hi) -> IntVar:
+        v = IntVar(self.first_id + len(self.variables), lo, hi)
+        self.variables.append(v)
+        self.is_answer_key.append(False)
+        return v
+
+
+def _graph(n: int, m: int, edges: Sequence[ExprLike]):
+    from .graph import Graph
+    graph = Graph(n)
+    for i in range(m):
+        graph.add_edge(edges[i * 2], edges[i * 2 + 1])
+    return graph
+
+
+def _expand(solver: Solver, e: Expr) -> None:
+    from . import graph
+
+    operands = e.operands
+    n, m = operands[0], operands[1]
+    if e.op == Op.GRAPH_ACTIVE_VERTICES_CONNECTED:
+        # [n, m, is_active * n, edges * 2m]
+        graph._active_vertices_connected(solver,
+                                         operands[2:2 + n],
+                                         _graph(n, m, operands[2 + n:]),
+                                         use_graph_primitive=False,
+                                         lazy=False)
+    else:
+        raise ValueError('unknown graph primitive {}'.format(e.op))
+
+
+def expand_primitives(
+    backend: ModuleType, constraints: List[BoolExprLike], first_id: int
+) -> Tuple[List[Union[BoolVar, IntVar]], List[BoolExprLike]]:
+    """Expands the primitives in `constraints` not supported by `backend`.
+    Returns the auxiliary variables, whose ids start from `first_id`, and
+    the resulting constraints."""
+    if all(supports(backend, op) for op in GRAPH_OPS):
+        return [], constraints
+    aux: Optional[_AuxSolver] = None
+    ret: List[BoolExprLike] = []
+    for c in constraints:
+        if isinstance(c, Expr) and c.op in GRAPH_OPS and not supports(
+                backend, c.op):
+            if aux is None:
+                aux = _AuxSolver(first_id)
+            _expand(aux, c)
+        else:
+            ret.append(c)
+    if aux is None:
+        return [], constraints
+    expanded: Optional[List[BoolExprLike]] = aux.constraints
+    if config.use_simplifier:
+        # the operands may have been fixed by presolving
+        expanded = simplify_constraints(aux.constraints)
+        if expanded is None:
+            expanded = [False]
+    return aux.variables, ret + expanded  # type: ignore
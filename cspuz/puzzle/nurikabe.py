@@ -3,44 +3,64 @@ import sys
 import subprocess
 
 import cspuz
-from cspuz import Solver, graph, count_true
+from cspuz import graph, count_true
 from cspuz.puzzle import util
+from cspuz.template import Template, cached_template
 from cspuz.generator import (generate_problem, count_non_default_values,
                              ArrayBuilder2D)
 
 
+def _nurikabe_template(height, width):
+    # The islands are the groups of `group_id`, each of which is identified
+    # by its root cell, so that the rules do not depend on the positions of
+    # the clues: every island is rooted at a clue cell.
+    template = Template()
+    is_white = template.bool_array((height, width))
+    template.add_answer_key(is_white)
+    group_id = graph.division_connected_variable_groups(template,
+                                                        shape=(height, width))
+
+    template.ensure((is_white[:-1, :] == is_white[1:, :]) == (
+        group_id[:-1, :] == group_id[1:, :]))
+    template.ensure((is_white[:, :-1] == is_white[:, 1:]) == (
+        group_id[:, :-1] == group_id[:, 1:]))
+    template.ensure(is_white[:-1, :-1] | is_white[:-1, 1:] | is_white[1:, :-1]
+                    | is_white[1:, 1:])
+    graph.active_vertices_connected(template, ~is_white)
+    template.ensure(count_true(~is_white) >= 1)
+
+    is_root = [[is_white[y, x] & (group_id[y, x] == y * width + x)
+                for x in range(width)] for y in range(height)]
+    # island sizes, built for the cells which have ever been a clue
+    island_size = dict()
+    return template, is_white, group_id, is_root, island_size
+
+
 def solve_nurikabe(height, width, problem, unknown_low=None):
-    solver = Solver()
+    template, is_white, group_id, is_root, island_size = cached_template(
+        ('nurikabe', height, width),
+        lambda: _nurikabe_template(height, width))
+
     clues = []
     for y in range(height):
         for x in range(width):
-            if problem[y][x] >= 1 or problem[y][x] == -1:
-                clues.append((y, x, problem[y][x]))
-    division = solver.int_array((height, width), 0, len(clues))
-
-    roots = [None] + list(map(lambda x: (x[0], x[1]), clues))
-    graph.division_connected(solver, division, len(clues) + 1, roots=roots)
-    is_white = solver.bool_array((height, width))
-    solver.ensure(is_white == (division != 0))
-    solver.add_answer_key(is_white)
-
-    solver.ensure(
-        (is_white[:-1, :]
-         & is_white[1:, :]).then(division[:-1, :] == division[1:, :]))
-    solver.ensure((is_white[:, :-1]
-                   & is_white[:, 1:]).then(division[:, :-1] == division[:,
-                                                                        1:]))
-    solver.ensure(is_white[:-1, :-1] | is_white[:-1, 1:] | is_white[1:, :-1]
-                  | is_white[1:, 1:])
-    for i, (y, x, n) in enumerate(clues):
-        if n > 0:
-            solver.ensure(count_true(division == (i + 1)) == n)
-        elif n == -1 and unknown_low is not None:
-            solver.ensure(count_true(division == (i + 1)) >= unknown_low)
-
-    is_sat = solver.solve()
-
-    return is_sat, is_white
+            n = problem[y][x]
+            if not (n >= 1 or n == -1):
+                clues.append(~is_root[y][x])
+                continue
+            clues.append(is_root[y][x])
+            if n == -1 and unknown_low is None:
+                continue
+            if (y, x) not in island_size:
+                island_size[y, x] = count_true(group_id == y * width + x)
+            if n > 0:
+                clues.append(island_size[y, x] == n)
+            else:
+                clues.append(island_size[y, x] >= unknown_low)
+    template.set_clues(clues)
+    is_sat = template.solve()
+    # the arrays of the template are shared among the calls
+    return is_sat, template.assignment.detached(is_white)
 
 
 def resolve_unknown(height, width, problem, unknown_low=None):
@@ -2,27 +2,39 @@ import sys
 import subprocess
 
 import cspuz
-from cspuz import Solver, graph
+from cspuz import graph
 from cspuz.grid_frame import BoolGridFrame
 from cspuz.constraints import count_true
 from cspuz.puzzle import util
+from cspuz.template import Template, cached_template
 from cspuz.generator import (generate_problem, count_non_default_values,
                              ArrayBuilder2D)
 
 
+def _slitherlink_template(height, width):
+    template = Template()
+    grid_frame = BoolGridFrame(template, height, width)
+    template.add_answer_key(grid_frame)
+    graph.active_edges_single_cycle(template, grid_frame)
+    num_lines = [[
+        count_true(grid_frame.cell_neighbors(y, x)) for x in range(width)
+    ] for y in range(height)]
+    return template, grid_frame, num_lines
+
+
 def solve_slitherlink(height, width, problem):
-    solver = Solver()
-    grid_frame = BoolGridFrame(solver, height, width)
-    solver.add_answer_key(grid_frame)
-    graph.active_edges_single_cycle(solver, grid_frame)
+    template, grid_frame, num_lines = cached_template(
+        ('slitherlink', height, width),
+        lambda: _slitherlink_template(height, width))
+    clues = []
     for y in range(height):
         for x in range(width):
             if problem[y][x] >= 0:
-                solver.ensure(
-                    count_true(grid_frame.cell_neighbors(y, x)) == problem[y]
-                    [x])
-    is_sat = solver.solve()
-    return is_sat, grid_frame
+                clues.append(num_lines[y][x] == problem[y][x])
+    template.set_clues(clues)
+    is_sat = template.solve()
+    # the grid frame of the template is shared among the calls
+    return is_sat, template.assignment.detached(grid_frame)
 
 
 def generate_slitherlink(height, width, symmetry=False, verbose=False):
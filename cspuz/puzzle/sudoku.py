@@ -1,32 +1,41 @@
 import sys
 import subprocess
 
-from cspuz import Solver
 from cspuz.constraints import alldifferent
 from cspuz.puzzle import util
+from cspuz.template import Template, cached_template
 from cspuz.generator import (generate_problem, count_non_default_values,
                              ArrayBuilder2D)
 
 
-def solve_sudoku(problem, n=3):
+def _sudoku_template(n):
     size = n * n
-    solver = Solver()
-    answer = solver.int_array((size, size), 1, size)
-    solver.add_answer_key(answer)
+    template = Template()
+    answer = template.int_array((size, size), 1, size)
+    template.add_answer_key(answer)
     for i in range(size):
-        solver.ensure(alldifferent(answer[i, :]))
-        solver.ensure(alldifferent(answer[:, i]))
+        template.ensure(alldifferent(answer[i, :]))
+        template.ensure(alldifferent(answer[:, i]))
     for y in range(n):
         for x in range(n):
-            solver.ensure(
+            template.ensure(
                 alldifferent(answer[y * n:(y + 1) * n, x * n:(x + 1) * n]))
+    return template, answer
+
+
+def solve_sudoku(problem, n=3):
+    size = n * n
+    template, answer = cached_template(('sudoku', n),
+                                       lambda: _sudoku_template(n))
+    clues = []
     for y in range(size):
         for x in range(size):
             if problem[y][x] >= 1:
-                solver.ensure(answer[y, x] == problem[y][x])
-    is_sat = solver.solve()
-
-    return is_sat, answer
+                clues.append(answer[y, x] == problem[y][x])
+    template.set_clues(clues)
+    is_sat = template.solve()
+    # the arrays of the template are shared among the calls
+    return is_sat, template.assignment.detached(answer)
 
 
 def generate_sudoku(n, max_clue=None, symmetry=False, verbose=False):
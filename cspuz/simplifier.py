@@ -0,0 +1,295 @@
+"""
+Constant folding and algebraic simplification of expressions.
+
+`Solver` runs this pass over the constraints before they are handed to a
+backend, so that trivially reducible structure is not serialized and
+trivially (un)satisfiable constraints never reach the backend.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+from .expr import Op, Expr, BoolExpr, BoolExprLike, ExprLike, IntVar
+
+
+def int_bounds(e: ExprLike,
+               memo: Optional[Dict[int, Tuple[int, int]]] = None
+               ) -> Tuple[int, int]:
+    """Returns an interval which contains every possible value of `e`."""
+    if memo is None:
+        memo = dict()
+
+    def bounds(x: ExprLike) -> Tuple[int, int]:
+        if isinstance(x, int):
+            return x, x
+        if isinstance(x, IntVar):
+            return x.lo, x.hi
+        return memo[id(x)]
+
+    # post-order with an explicit stack, as in `_Simplifier.simplify`
+    stack: List[Tuple[ExprLike, bool]] = [(e, False)]
+    while len(stack) > 0:
+        x, expanded = stack.pop()
+        if isinstance(x, (int, IntVar)) or id(x) in memo:
+            continue
+        assert isinstance(x, Expr)
+        if not expanded:
+            stack.append((x, True))
+            if x.op in (Op.NEG, Op.ADD, Op.SUB):
+                stack += [(y, False) for y in x.operands]
+            elif x.op == Op.IF:
+                stack += [(y, False) for y in x.operands[1:]]
+            continue
+        if x.op == Op.INT_CONSTANT:
+            ret = (x.operands[0], x.operands[0])
+        elif x.op == Op.NEG:
+            lo, hi = bounds(x.operands[0])
+            ret = (-hi, -lo)
+        elif x.op in (Op.ADD, Op.SUB):
+            lo, hi = bounds(x.operands[0])
+            for y in x.operands[1:]:
+                lo2, hi2 = bounds(y)
+                if x.op == Op.ADD:
+                    lo, hi = lo + lo2, hi + hi2
+                else:
+                    lo, hi = lo - hi2, hi - lo2
+            ret = (lo, hi)
+        elif x.op == Op.IF:
+            lo, hi = bounds(x.operands[1])
+            lo2, hi2 = bounds(x.operands[2])
+            ret = (min(lo, lo2), max(hi, hi2))
+        elif x.op == Op.COUNT_TRUE:
+            ret = (0, len(x.operands))
+        else:
+            raise ValueError('unsupported operator {}'.format(x.op))
+        memo[id(x)] = ret
+    return bounds(e)
+
+
+def _is_const(e: ExprLike) -> bool:
+    return not isinstance(e, Expr)
+
+
+def _negate(e: BoolExprLike) -> BoolExprLike:
+    if isinstance(e, bool):
+        return not e
+    if e.op == Op.NOT:
+        return e.operands[0]
+    return BoolExpr(Op.NOT, [e])
+
+
+def _rebuild(e: Expr, operands: List[ExprLike]) -> Expr:
+    if len(operands) == len(e.operands) and all(
+            x is y for x, y in zip(operands, e.operands)):
+        return e
+    return type(e)(e.op, operands)
+
+
+class _Simplifier(object):
+    def __init__(self):
+        self.memo: Dict[int, Tuple[ExprLike, ExprLike]] = dict()
+        self.bounds: Dict[int, Tuple[int, int]] = dict()
+
+    def _simplified(self, e: ExprLike) -> ExprLike:
+        if not isinstance(e, Expr) or e.is_variable():
+            return e
+        return self.memo[id(e)][1]
+
+    def simplify(self, e: ExprLike) -> ExprLike:
+        # the nodes are simplified in post-order with an explicit stack, so
+        # that deeply nested expressions do not hit the recursion limit
+        stack: List[Tuple[ExprLike, bool]] = [(e, False)]
+        while len(stack) > 0:
+            x, expanded = stack.pop()
+            if not isinstance(x, Expr) or x.is_variable() or id(
+                    x) in self.memo:
+                continue
+            if not expanded:
+                stack.append((x, True))
+                for y in x.operands:
+                    stack.append((y, False))
+                continue
+            ret = self._simplify_node(
+                x, [self._simplified(y) for y in x.operands])
+            self.memo[id(x)] = (x, ret)
+        return self._simplified(e)
+
+    def _simplify_node(self, e: Expr, operands: List[ExprLike]) -> ExprLike:
+        op = e.op
+        if op in (Op.BOOL_CONSTANT, Op.INT_CONSTANT):
+            return operands[0]
+        elif op == Op.NOT:
+            return _negate(operands[0])
+        elif op in (Op.AND, Op.OR):
+            return self._simplify_and_or(e, operands)
+        elif op == Op.IMP:
+            a, b = operands
+            if a is False or b is True:
+                return True
+            if a is True:
+                return b
+            if b is False:
+                return _negate(a)
+            if a is b:
+                return True
+        elif op in (Op.IFF, Op.XOR):
+            a, b = operands
+            if _is_const(a):
+                a, b = b, a
+            if _is_const(b):
+                if _is_const(a):
+                    return (a == b) == (op == Op.IFF)
+                return a if b == (op == Op.IFF) else _negate(a)
+            if a is b:
+                return op == Op.IFF
+        elif op == Op.NEG:
+            a = operands[0]
+            if _is_const(a):
+                return -a
+            if isinstance(a, Expr) and a.op == Op.NEG:
+                return a.operands[0]
+        elif op == Op.ADD:
+            return self._simplify_add(e, operands)
+        elif op == Op.SUB:
+            if all(map(_is_const, operands)):
+                return operands[0] - sum(operands[1:])
+            rest = [x for x in operands[1:] if not (_is_const(x) and x == 0)]
+            if len(rest) == 0:
+                return operands[0]
+            operands = [operands[0]] + rest
+        elif op == Op.IF:
+            c, t, f = operands
+            if _is_const(c):
+                return t if c else f
+            if t is f or (_is_const(t) and _is_const(f) and t == f):
+                return t
+        elif op in (Op.EQ, Op.NE, Op.LE, Op.LT, Op.GE, Op.GT):
+            decided = self._compare_by_bounds(op, operands[0], operands[1])
+            if decided is not None:
+                return decided
+            a, b = operands
+            if isinstance(a, Expr) and a.op == Op.ADD and len(
+                    a.operands) == 2 and _is_const(
+                        a.operands[1]) and _is_const(b):
+                # `count_true(...) + c == k` is compared as a cardinality
+                operands = [a.operands[0], b - a.operands[1]]
+        elif op == Op.COUNT_TRUE:
+            return self._simplify_count_true(e, operands)
+        elif op == Op.ALLDIFF:
+            constants = [x for x in operands if _is_const(x)]
+            if len(set(constants)) != len(constants):
+                return False
+            if len(constants) == len(operands):
+                return True
+        return _rebuild(e, operands)
+
+    def _simplify_and_or(self, e: Expr, operands: List[ExprLike]):
+        # `unit` is the identity element (and its negation is absorbing)
+        op = e.op
+        unit = op == Op.AND
+        flat: List[ExprLike] = []
+        for x in operands:
+            if isinstance(x, Expr) and x.op == op:
+                flat += x.operands
+            else:
+                flat.append(x)
+        ret = []
+        seen = set()
+        for x in flat:
+            if _is_const(x):
+                if x == unit:
+                    continue
+                return not unit
+            if id(x) in seen:
+                continue
+            seen.add(id(x))
+            ret.append(x)
+        for x in ret:
+            if x.op == Op.NOT and id(x.operands[0]) in seen:
+                # x & ~x, x | ~x
+                return not unit
+        if len(ret) == 0:
+            return unit
+        if len(ret) == 1:
+            return ret[0]
+        return _rebuild(e, ret)
+
+    def _simplify_add(self, e: Expr, operands: List[ExprLike]):
+        flat: List[ExprLike] = []
+        for x in operands:
+            if isinstance(x, Expr) and x.op == Op.ADD:
+                flat += x.operands
+            else:
+                flat.append(x)
+        constant = 0
+        ret = []
+        for x in flat:
+            if _is_const(x):
+                constant += x
+            else:
+                ret.append(x)
+        if constant != 0 or len(ret) == 0:
+            ret.append(constant)
+        if len(ret) == 1:
+            return ret[0]
+        return _rebuild(e, ret)
+
+    def _simplify_count_true(self, e: Expr, operands: List[ExprLike]):
+        constant = sum(1 for x in operands if x is True)
+        ret = [x for x in operands if not _is_const(x)]
+        if len(ret) == 0:
+            return constant
+        e = _rebuild(e, ret)
+        if constant > 0:
+            return type(e)(Op.ADD, [e, constant])
+        return e
+
+    def _compare_by_bounds(self, op: Op, a: ExprLike,
+                           b: ExprLike) -> Optional[bool]:
+        lo1, hi1 = int_bounds(a, self.bounds)
+        lo2, hi2 = int_bounds(b, self.bounds)
+        if op in (Op.GE, Op.GT):
+            op = Op.LE if op == Op.GE else Op.LT
+            lo1, hi1, lo2, hi2 = lo2, hi2, lo1, hi1
+        if op == Op.EQ or op == Op.NE:
+            if lo1 == hi1 == lo2 == hi2:
+                return op == Op.EQ
+            if hi1 < lo2 or hi2 < lo1:
+                return op == Op.NE
+        elif op == Op.LE:
+            if hi1 <= lo2:
+                return True
+            if lo1 > hi2:
+                return False
+        elif op == Op.LT:
+            if hi1 < lo2:
+                return True
+            if lo1 >= hi2:
+                return False
+        return None
+
+
+def simplify(e: ExprLike) -> ExprLike:
+    """Returns an expression equivalent to `e` after constant folding,
+    flattening of nested AND/OR/ADD and elimination of trivial subterms.
+    Fully constant expressions are returned as Python `bool` or `int`."""
+    return _Simplifier().simplify(e)
+
+
+def simplify_constraints(
+        constraints: List[BoolExprLike]) -> Optional[List[BoolExprLike]]:
+    """Simplifies `constraints`, dropping the satisfied ones and splitting
+    top-level conjunctions. Returns `None` if any constraint is trivially
+    unsatisfiable."""
+    simplifier = _Simplifier()
+    ret: List[BoolExprLike] = []
+    for c in constraints:
+        s = simplifier.simplify(c)
+        if s is True:
+            continue
+        if s is False:
+            return None
+        if isinstance(s, Expr) and s.op == Op.AND:
+            ret += s.operands
+        else:
+            ret.append(s)
+    return ret
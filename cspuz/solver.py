@@ -1,12 +1,23 @@
+import asyncio
 import functools
+import subprocess
+import time
+import weakref
 from types import ModuleType
-from typing import Any, List, Tuple, Union, cast, overload
+from typing import (Any, Generator, List, Optional, Set, Tuple, Union, cast,
+                    overload)
 
 from . import backend
+from .assignment import Assignment
+from .cache import get_result_cache, problem_key
 from .array import BoolArray1D, BoolArray2D, IntArray1D, IntArray2D
 from .configuration import config
 from .expr import BoolExpr, BoolExprLike, BoolVar, IntVar, Op
 from .constraints import flatten_iterator
+from .lazy import LazyConstraint, lazy_session
+from .presolve import presolve
+from .simplifier import simplify_constraints
+from .stats import SolveStats, _notify
 
 
 def _get_default_backend() -> ModuleType:
@@ -17,19 +28,137 @@ def _get_default_backend() -> ModuleType:
         return backend.sugar_extended
     elif backend_name == 'z3':
         return backend.z3
+    elif backend_name == 'cnf':
+        return backend.cnf
+    elif backend_name == 'portfolio':
+        return backend.portfolio
     else:
         raise ValueError('invalid default backend {}'.format(backend_name))
 
 
+# with `config.deduction_workers` > 1, problems with at least this many answer
+# keys are deduced in parallel; for fewer keys, starting the worker processes
+# does not pay off
+MIN_PARALLEL_DEDUCTION_KEYS = 16
+
+
+# The solving procedures are generators which yield the backend calls as
+# `(csp_solver, method name, args)` and receive their results, so that the
+# same code is driven both by the blocking and the asyncio API.
+_Steps = Generator[Tuple[Any, str, Tuple[Any, ...]], Any, bool]
+
+
+def _run_steps(steps: _Steps) -> bool:
+    try:
+        csp_solver, method, args = next(steps)
+        while True:
+            try:
+                res = getattr(csp_solver, method)(*args)
+            except Exception as e:
+                # the procedure may recover from the error (e.g. a timeout)
+                csp_solver, method, args = steps.throw(e)
+                continue
+            csp_solver, method, args = steps.send(res)
+    except StopIteration as e:
+        return e.value
+
+
+async def _run_steps_async(steps: _Steps) -> bool:
+    loop = asyncio.get_running_loop()
+    try:
+        csp_solver, method, args = next(steps)
+        while True:
+            method_async = getattr(csp_solver, method + '_async', None)
+            try:
+                if method_async is not None:
+                    res = await method_async(*args)
+                else:
+                    res = await loop.run_in_executor(
+                        None,
+                        functools.partial(getattr(csp_solver, method),
+                                          *args))
+            except Exception as e:
+                csp_solver, method, args = steps.throw(e)
+                continue
+            csp_solver, method, args = steps.send(res)
+    except StopIteration as e:
+        return e.value
+
+
+# event loop -> (size, semaphore)
+_async_limiters: Any = weakref.WeakKeyDictionary()
+
+
+def _get_async_limiter(
+        limiter: Optional[asyncio.Semaphore]) -> asyncio.Semaphore:
+    if limiter is not None:
+        return limiter
+    # a semaphore must not be shared between event loops
+    loop = asyncio.get_running_loop()
+    size = config.async_max_concurrency
+    entry = _async_limiters.get(loop)
+    if entry is None or entry[0] != size:
+        entry = (size, asyncio.Semaphore(size))
+        _async_limiters[loop] = entry
+    return entry[1]
+
+
+class DeductionResult(object):
+    """Outcome of the deduction of the answer keys by `Solver.solve`.
+
+    The `sol` of a key is set only if the key is proven to be forced. If the
+    deadline of `solve` expires, `complete` is False and the undecided keys
+    are split into `undetermined` (proven to take several values) and
+    `pending` (not checked in time); otherwise `pending` is empty."""
+    def __init__(self, complete: bool, undetermined: List[Union[BoolVar,
+                                                                 IntVar]],
+                 pending: List[Union[BoolVar, IntVar]]):
+        self.complete = complete
+        self.undetermined = undetermined
+        self.pending = pending
+
+    def __repr__(self) -> str:
+        return ('DeductionResult(complete={}, undetermined={}, '
+                'pending={})'.format(self.complete, len(self.undetermined),
+                                     len(self.pending)))
+
+
+class _DeadlineExpired(Exception):
+    pass
+
+
+def _clone_variable(v: Union[BoolVar, IntVar]) -> Union[BoolVar, IntVar]:
+    if isinstance(v, BoolVar):
+        return BoolVar(v.id)
+    return IntVar(v.id, v.lo, v.hi)
+
+
 class Solver(object):
     variables: List[Union[BoolVar, IntVar]]
     is_answer_key: List[bool]
     constraints: List[BoolExprLike]
+    lazy_constraints: List[LazyConstraint]
+    refutation_round_times: List[float]
+    stats: Optional[SolveStats]
+    deduction: Optional[DeductionResult]
+    assignment: Optional[Assignment]
 
     def __init__(self):
         self.variables = []
         self.is_answer_key = []
         self.constraints = []
+        self.lazy_constraints = []
+        self.refutation_round_times = []
+        self.stats = None
+        self.deduction = None
+        self.assignment = None
+        self._build_start = time.perf_counter()
+        self._backend_sessions: List[Any] = []
+        # `time.time()` by which the current `solve` must end
+        self._deadline: Optional[float] = None
+        # ids of the (presolved) answer keys left undecided at the deadline
+        self._pending_ids: Set[int] = set()
+        self._presolved: Any = None
 
     def bool_var(self) -> BoolVar:
         v = BoolVar(len(self.variables))
@@ -97,6 +226,11 @@ class Solver(object):
                 raise TypeError(
                     'each element in \'constraint\' must be BoolExpr-like')
 
+    def add_lazy_constraint(self, constraint: LazyConstraint):
+        """Adds a constraint which is enforced by adding its cuts to the
+        backend whenever a model violates it; see `cspuz.lazy`."""
+        self.lazy_constraints.append(constraint)
+
     def add_answer_key(self, *variable: Any):
         for x in flatten_iterator(*variable):
             if isinstance(x, (BoolVar, IntVar)):
@@ -105,48 +239,434 @@ class Solver(object):
                 raise TypeError(
                     'each element in \'variable\' must be BoolVar or IntVar')
 
+    def _get_constraints(self) -> Optional[List[BoolExprLike]]:
+        # Returns None if the constraints are trivially unsatisfiable.
+        if not config.use_simplifier:
+            return self.constraints
+        start = time.perf_counter()
+        constraints = simplify_constraints(self.constraints)
+        self.stats._add_time('simplify', time.perf_counter() - start)
+        return constraints
+
+    def _set_unsat(self) -> bool:
+        for v in self.variables:
+            v.sol = None
+        return False
+
+    @staticmethod
+    def solve_many(solvers: List['Solver'], **kwargs: Any) -> List[bool]:
+        """Solves many independent problems concurrently; see
+        `cspuz.batch.solve_many`."""
+        from .batch import solve_many
+        return solve_many(solvers, **kwargs)
+
+    def _presolve(self, constraints: List[BoolExprLike]) -> Any:
+        # Returns the reduced problem, False if the problem turned out to be
+        # unsatisfiable, or None if presolving is disabled.
+        # the cuts of lazy constraints may refer to any variable
+        if not config.use_presolve or len(self.lazy_constraints) > 0:
+            return None
+        start = time.perf_counter()
+        presolved = presolve(self.variables, constraints)
+        self.stats._add_time('presolve', time.perf_counter() - start)
+        if presolved is None:
+            return False
+        return presolved
+
+    def _new_backend(self, backend: ModuleType,
+                     variables: List[Union[BoolVar, IntVar]],
+                     constraints: List[BoolExprLike]) -> Any:
+        start = time.perf_counter()
+        variables, constraints = self._expand_primitives(
+            backend, variables, constraints)
+        csp_solver = backend.CSPSolver(variables)  # type: ignore
+        csp_solver.deadline = self._deadline
+        csp_solver.add_constraint(constraints)
+        self.stats._add_time('convert', time.perf_counter() - start)
+        self.stats.backend = backend.__name__.split('.')[-1]
+        self._backend_sessions.append(csp_solver)
+        return self._lazy_session(csp_solver)
+
+    def _expand_primitives(
+        self, backend: ModuleType, variables: List[Union[BoolVar, IntVar]],
+        constraints: List[BoolExprLike]
+    ) -> Tuple[List[Union[BoolVar, IntVar]], List[BoolExprLike]]:
+        # graph primitives not supported by the backend are encoded here
+        from .primitives import expand_primitives
+        aux_variables, constraints = expand_primitives(
+            backend, constraints, len(self.variables))
+        return variables + aux_variables, constraints
+
+    def _lazy_session(self, csp_solver: Any) -> Any:
+        session = lazy_session(csp_solver, self.lazy_constraints)
+        if session is not csp_solver:
+            self._backend_sessions.append(session)
+        return session
+
+    def _call_backend(self, csp_solver: Any, method: str,
+                      *args: Any) -> Generator[Any, Any, Any]:
+        # With a deadline, a timeout of the backend raises `_DeadlineExpired`,
+        # upon which the deduction procedures stop with partial results.
+        if self._deadline is not None and time.time() >= self._deadline:
+            raise _DeadlineExpired()
+        start = time.perf_counter()
+        try:
+            res = yield (csp_solver, method, args)
+        except subprocess.TimeoutExpired:
+            if self._deadline is None:
+                raise
+            raise _DeadlineExpired()
+        finally:
+            self.stats._add_time('backend', time.perf_counter() - start)
+            self.stats.num_backend_calls += 1
+        return res
+
+    def _recorded_steps(self, mode: str, steps: _Steps) -> _Steps:
+        start = time.perf_counter()
+        stats = SolveStats(mode)
+        stats._add_time('build', start - self._build_start)
+        stats.num_variables = len(self.variables)
+        stats.num_constraints = len(self.constraints)
+        self.stats = stats
+        self._backend_sessions = []
+        try:
+            is_sat = yield from steps
+        finally:
+            sessions = self._backend_sessions
+            self._backend_sessions = []
+        for csp_solver in sessions:
+            # statistics provided by Sugar-based backends
+            stats.csp_bytes += getattr(csp_solver, 'csp_bytes', 0)
+            stats.num_rounds += getattr(csp_solver, 'num_backend_rounds', 0)
+            stats.num_lazy_cuts += getattr(csp_solver, 'num_cuts', 0)
+            for k, v in getattr(csp_solver, 'backend_times', {}).items():
+                stats.backend_times[k] = stats.backend_times.get(k, 0.0) + v
+        stats.num_rounds += len(self.refutation_round_times)
+        stats.is_sat = is_sat
+        end = time.perf_counter()
+        stats.total_time = end - start
+        self._build_start = end
+        _notify(stats)
+        return is_sat
+
+    def _key_constraints(self) -> List[BoolExprLike]:
+        # constraints identifying the problem in the result cache
+        return self.constraints + [c.constraint for c in self.lazy_constraints]
+
+    def _cached_steps(self, mode: str, steps: _Steps) -> _Steps:
+        # `steps` is not started at all if the result is in the cache
+        cache = get_result_cache()
+        if cache is None:
+            return (yield from steps)
+        key = problem_key(mode, self.variables, self.is_answer_key,
+                          self._key_constraints())
+        cached = cache.get(key)
+        if cached is not None:
+            self.stats.cache_hit = True
+            is_sat, sol = cached
+            self.refutation_round_times = []
+            for v, x in zip(self.variables, sol):
+                v.sol = x
+            return is_sat
+        is_sat = yield from steps
+        if len(self._pending_ids) == 0:
+            # partial results are not cached
+            cache.put(key, (is_sat, [v.sol for v in self.variables]))
+        return is_sat
+
+    def _deduction_steps(self, steps: _Steps) -> _Steps:
+        self._pending_ids = set()
+        self._presolved = None
+        keys = [v for v, k in zip(self.variables, self.is_answer_key) if k]
+        try:
+            is_sat = yield from steps
+        except _DeadlineExpired:
+            # no solution has been found in time
+            self._set_unsat()
+            self.deduction = DeductionResult(False, [], keys)
+            return False
+        undetermined = []
+        pending = []
+        if is_sat:
+            for v in keys:
+                if v.sol is not None:
+                    continue
+                i = v.id
+                if self._presolved is not None:
+                    i = self._presolved.presolver.find(i)[0]
+                if i in self._pending_ids:
+                    pending.append(v)
+                else:
+                    undetermined.append(v)
+        self.deduction = DeductionResult(
+            len(self._pending_ids) == 0, undetermined, pending)
+        return is_sat
+
+    def _run_context(self) -> 'Solver':
+        # A shallow copy of this solver for a single call. The backends write
+        # the results onto its variables, which are private copies of those
+        # of this solver (with the same ids, so that they are interchangeable
+        # in the constraints).
+        run = object.__new__(type(self))
+        run.__dict__.update(self.__dict__)
+        run.variables = [_clone_variable(v) for v in self.variables]
+        run.refutation_round_times = []
+        run.stats = None
+        run.deduction = None
+        run.assignment = None
+        run._backend_sessions = []
+        run._pending_ids = set()
+        run._presolved = None
+        return run
+
+    def _steps(self,
+               mode: str,
+               backend: Optional[ModuleType],
+               deadline: Optional[float] = None) -> _Steps:
+        run = self._run_context()
+        run._deadline = None if deadline is None else time.time() + deadline
+        if mode == 'solve':
+            steps = run._deduction_steps(
+                run._cached_steps(mode, run._solve_steps(backend)))
+        else:
+            steps = run._cached_steps(mode, run._find_answer_steps(backend))
+        try:
+            is_sat = yield from run._recorded_steps(mode, steps)
+        finally:
+            # the attributes of this solver describe the latest call
+            self.stats = run.stats
+            self.refutation_round_times = run.refutation_round_times
+            self._build_start = run._build_start
+            self.deduction = self._original_deduction(run.deduction)
+
+        values = {v.id: v.sol for v in run.variables}
+        for v in self.variables:
+            v.sol = values.get(v.id)
+        self.assignment = Assignment(is_sat, values, self.stats,
+                                     self.deduction)
+        return is_sat
+
+    def _original_deduction(
+            self,
+            deduction: Optional[DeductionResult]) -> Optional[DeductionResult]:
+        # `deduction` of a run context refers to the copied variables
+        if deduction is None:
+            return None
+        return DeductionResult(
+            deduction.complete,
+            [self.variables[v.id] for v in deduction.undetermined],
+            [self.variables[v.id] for v in deduction.pending])
+
     def find_answer(self, backend: ModuleType = None) -> bool:
+        """Finds a solution; see `solve` for `self.assignment`."""
+        return _run_steps(self._steps('find_answer', backend))
+
+    async def find_answer_async(
+            self,
+            backend: ModuleType = None,
+            limiter: Optional[asyncio.Semaphore] = None) -> bool:
+        """Same as `find_answer`, but waits for the backend without blocking
+        the event loop. See `solve_async`."""
+        async with _get_async_limiter(limiter):
+            return await _run_steps_async(self._steps('find_answer', backend))
+
+    def _find_answer_steps(self, backend: Optional[ModuleType]) -> _Steps:
         if backend is None:
             backend = _get_default_backend()
-        csp_solver = backend.CSPSolver(self.variables)  # type: ignore
-        csp_solver.add_constraint(self.constraints)
-        return csp_solver.solve()
+        constraints = self._get_constraints()
+        if constraints is None:
+            return self._set_unsat()
+        presolved = self._presolve(constraints)
+        if presolved is False:
+            return self._set_unsat()
+        if presolved is None:
+            csp_solver = self._new_backend(backend, self.variables,
+                                           constraints)
+            if not (yield from self._call_backend(csp_solver, 'solve')):
+                # models rejected by lazy constraints may have been loaded
+                return self._set_unsat()
+            return True
+
+        if len(presolved.constraints) > 0:
+            csp_solver = self._new_backend(backend, presolved.variables,
+                                           presolved.constraints)
+            if not (yield from self._call_backend(csp_solver, 'solve')):
+                return self._set_unsat()
+        presolved.load_solution(self.variables, fill_free=True)
+        return True
+
+    def solve(self,
+              backend: ModuleType = None,
+              deadline: Optional[float] = None) -> bool:
+        """Finds a solution and decides which answer keys are forced by the
+        problem; returns whether a solution exists. The `sol` of the forced
+        keys is set, and that of the other keys is None. The outcome is also
+        described by `self.deduction`.
+
+        The values of the call are also stored in `self.assignment`, an
+        `Assignment` which is not affected by later calls on this solver
+        (the `sol` of the variables is).
+
+        If `deadline` (in seconds) is given, the deduction stops when the
+        time runs out (or a backend times out) and the keys decided so far
+        are returned, with `self.deduction.complete` set to False. If no
+        solution has been found by then, False is returned with all the keys
+        pending.
+        """
+        return _run_steps(self._steps('solve', backend, deadline))
+
+    async def solve_async(self,
+                          backend: ModuleType = None,
+                          limiter: Optional[asyncio.Semaphore] = None,
+                          deadline: Optional[float] = None) -> bool:
+        """Same as `solve`, but waits for the backend without blocking the
+        event loop.
 
-    def solve(self, backend: ModuleType = None) -> bool:
+        Sugar-based backends are run with `asyncio.create_subprocess_exec`,
+        and cancelling the task terminates the backend process tree.
+        In-process backends (z3, cnf) are run in the default executor of the
+        loop; they are not interrupted by cancellation.
+
+        At most `config.async_max_concurrency` problems are solved at a time
+        in each event loop unless another semaphore is given as `limiter`.
+        """
+        async with _get_async_limiter(limiter):
+            return await _run_steps_async(
+                self._steps('solve', backend, deadline))
+
+    def _solve_steps(self, backend: Optional[ModuleType]) -> _Steps:
         if backend is None:
             backend = _get_default_backend()
-        csp_solver = backend.CSPSolver(self.variables)  # type: ignore
-        csp_solver.add_constraint(self.constraints)
+        self.refutation_round_times = []
+        constraints = self._get_constraints()
+        if constraints is None:
+            return self._set_unsat()
+        presolved = self._presolve(constraints)
+        if presolved is False:
+            return self._set_unsat()
+        if presolved is None:
+            if not (yield from self._solve(backend, self.variables,
+                                           self.is_answer_key, constraints)):
+                return self._set_unsat()
+            return True
+
+        # answer keys fixed by presolving are determined without querying
+        # the backend
+        self._presolved = presolved
+        if len(presolved.constraints) > 0:
+            is_sat = yield from self._solve(
+                backend, presolved.variables,
+                presolved.is_answer_key(self.variables, self.is_answer_key),
+                presolved.constraints)
+            if not is_sat:
+                return self._set_unsat()
+        presolved.load_solution(self.variables, fill_free=False)
+        return True
+
+    def _solve(self, backend: ModuleType, variables: List[Union[BoolVar,
+                                                                 IntVar]],
+               is_answer_key: List[bool],
+               constraints: List[BoolExprLike]) -> _Steps:
+        csp_solver = self._new_backend(backend, variables, constraints)
+
+        # the models of the refutation inside the backend would not be
+        # checked against the lazy constraints
+        if hasattr(csp_solver, 'solve_irrefutably') and len(
+                self.lazy_constraints) == 0:
+            return (yield from self._call_backend(
+                csp_solver, 'solve_irrefutably', is_answer_key))
+
+        if config.deduction_workers > 1 and sum(
+                is_answer_key) >= MIN_PARALLEL_DEDUCTION_KEYS:
+            return (yield from self._solve_in_parallel(
+                backend, csp_solver, variables, is_answer_key, constraints))
+
+        return (yield from self._solve_by_refutation(csp_solver, variables,
+                                                     is_answer_key))
 
-        if hasattr(csp_solver, 'solve_irrefutably'):
-            return csp_solver.solve_irrefutably(self.is_answer_key)
+    def _solve_in_parallel(self, backend: ModuleType, csp_solver: Any,
+                           variables: List[Union[BoolVar, IntVar]],
+                           is_answer_key: List[bool],
+                           constraints: List[BoolExprLike]) -> _Steps:
+        # The first solution is found by `csp_solver`; the answer keys are
+        # then decided by the workers of `cspuz.parallel`.
+        from .parallel import ParallelDeduction
+        if not (yield from self._call_backend(csp_solver, 'solve')):
+            return False
+
+        start = time.perf_counter()
+        expanded_variables, constraints = self._expand_primitives(
+            backend, variables, constraints)
+        self.stats._add_time('convert', time.perf_counter() - start)
+        answer: List[Union[None, bool, int]] = [None] * len(
+            expanded_variables)
+        for i in range(len(variables)):
+            if is_answer_key[i]:
+                answer[i] = variables[i].sol
+        deduction = ParallelDeduction(backend, expanded_variables,
+                                      constraints, self.lazy_constraints,
+                                      config.deduction_workers,
+                                      self._deadline)
+        answer = yield from self._call_backend(deduction, 'deduce', answer)
+        self.refutation_round_times += deduction.round_times
+        self.stats.num_backend_calls += len(deduction.round_times)
+        self._pending_ids.update(variables[i].id for i in deduction.pending)
+
+        self._load_deduced(variables, is_answer_key, answer)
+        return True
 
-        if not csp_solver.solve():
+    def _load_deduced(self, variables: List[Union[BoolVar, IntVar]],
+                      is_answer_key: List[bool],
+                      answer: List[Union[None, bool, int]]) -> None:
+        for i in range(len(variables)):
+            if is_answer_key[i]:
+                if variables[i].id in self._pending_ids:
+                    variables[i].sol = None
+                else:
+                    variables[i].sol = answer[i]
+
+    def _solve_by_refutation(self, csp_solver: Any,
+                             variables: List[Union[BoolVar, IntVar]],
+                             is_answer_key: List[bool]) -> _Steps:
+        # `csp_solver` is used as a session throughout the deduction: each
+        # round only adds a new refuting clause to it, so that incremental
+        # backends (z3, cnf) can keep their state between rounds. For Sugar,
+        # this only saves converting the constraints again: every round
+        # still runs the whole sugar pipeline on the full description.
+        if not (yield from self._call_backend(csp_solver, 'solve')):
             # inconsistent problem
             return False
 
-        n_var = len(self.variables)
+        n_var = len(variables)
         answer: List[Union[None, bool, int]] = [None] * n_var
         for i in range(n_var):
-            if self.is_answer_key[i]:
-                answer[i] = self.variables[i].sol
+            if is_answer_key[i]:
+                answer[i] = variables[i].sol
 
-        while True:
-            difference_cond = []
-            for i in range(n_var):
-                a = answer[i]
-                if self.is_answer_key[i] and a is not None:
-                    difference_cond.append(self.variables[i] != a)
-            csp_solver.add_constraint(BoolExpr(Op.OR, difference_cond))
-            if not csp_solver.solve():
-                break
-
-            for i in range(n_var):
-                if self.is_answer_key[i] and answer[
-                        i] is not None and answer[i] != self.variables[i].sol:
-                    answer[i] = None
+        try:
+            while True:
+                round_start = time.perf_counter()
+                difference_cond = []
+                for i in range(n_var):
+                    a = answer[i]
+                    if is_answer_key[i] and a is not None:
+                        difference_cond.append(variables[i] != a)
+                csp_solver.add_constraint(BoolExpr(Op.OR, difference_cond))
+                is_sat = yield from self._call_backend(csp_solver, 'solve')
+                self.refutation_round_times.append(time.perf_counter() -
+                                                   round_start)
+                if not is_sat:
+                    break
 
-        for i in range(n_var):
-            if self.is_answer_key[i]:
-                self.variables[i].sol = answer[i]
+                for i in range(n_var):
+                    if is_answer_key[i] and answer[
+                            i] is not None and answer[i] != variables[i].sol:
+                        answer[i] = None
+        except _DeadlineExpired:
+            # none of the remaining keys is proven to be forced
+            self._pending_ids.update(
+                variables[i].id for i in range(n_var)
+                if is_answer_key[i] and answer[i] is not None)
+
+        self._load_deduced(variables, is_answer_key, answer)
         return True
@@ -0,0 +1,118 @@
+"""
+Instrumentation of `Solver.solve` / `Solver.find_answer`.
+
+After each call, `solver.stats` holds a `SolveStats` of the call, and every
+function registered by `add_hook` is called with it. `StatsAggregator` is a
+hook which sums up the stats of many calls, e.g. of a whole generator run:
+
+    aggregator = StatsAggregator()
+    add_hook(aggregator)
+    ...
+    print(aggregator.report())
+"""
+
+import threading
+from typing import Callable, Dict, List
+
+# phases measured on the Python side, in the order of execution:
+# - build: model building (since the creation of the solver or the end of the
+#   last solve)
+# - simplify / presolve: cspuz's own preprocessing
+# - convert: creating the backend problem (`_convert_expr` serialization for
+#   Sugar)
+# - backend: waiting for the backend, including process startup and parsing
+#   of its output
+PHASES = ['build', 'simplify', 'presolve', 'convert', 'backend']
+
+
+class SolveStats(object):
+    def __init__(self, mode: str):
+        # 'solve' or 'find_answer'
+        self.mode = mode
+        self.backend = None
+        self.is_sat = None
+        self.cache_hit = False
+        self.total_time = 0.0
+        self.phase_times: Dict[str, float] = dict()
+        self.num_variables = 0
+        self.num_constraints = 0
+        # size of the CSP descriptions sent to a Sugar-based backend
+        self.csp_bytes = 0
+        self.num_backend_calls = 0
+        # refutation rounds, either of cspuz or reported by the backend
+        self.num_rounds = 0
+        # clauses added to the backend by lazy constraints
+        self.num_lazy_cuts = 0
+        # timings measured or reported by the backend, e.g. 'parse' (of the
+        # backend output) and 'sat' (MiniSat) for sugar_extended
+        self.backend_times: Dict[str, float] = dict()
+
+    def _add_time(self, phase: str, elapsed: float) -> None:
+        self.phase_times[phase] = self.phase_times.get(phase, 0.0) + elapsed
+
+    def __repr__(self) -> str:
+        return ('SolveStats(mode={}, backend={}, total_time={:.3f}, '
+                'phase_times={{{}}}, num_rounds={}, csp_bytes={})'.format(
+                    self.mode, self.backend, self.total_time, ', '.join(
+                        '{}: {:.3f}'.format(k, v)
+                        for k, v in self.phase_times.items()),
+                    self.num_rounds, self.csp_bytes))
+
+
+_hooks: List[Callable[[SolveStats], None]] = []
+
+
+def add_hook(hook: Callable[[SolveStats], None]) -> None:
+    _hooks.append(hook)
+
+
+def remove_hook(hook: Callable[[SolveStats], None]) -> None:
+    _hooks.remove(hook)
+
+
+def _notify(stats: SolveStats) -> None:
+    for hook in list(_hooks):
+        hook(stats)
+
+
+class StatsAggregator(object):
+    def __init__(self):
+        self.num_solves = 0
+        self.num_cache_hits = 0
+        self.total_time = 0.0
+        self.phase_times: Dict[str, float] = dict()
+        self.backend_times: Dict[str, float] = dict()
+        self.csp_bytes = 0
+        self.num_backend_calls = 0
+        self.num_rounds = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, stats: SolveStats) -> None:
+        with self._lock:
+            self.num_solves += 1
+            if stats.cache_hit:
+                self.num_cache_hits += 1
+            self.total_time += stats.total_time
+            for k, v in stats.phase_times.items():
+                self.phase_times[k] = self.phase_times.get(k, 0.0) + v
+            for k, v in stats.backend_times.items():
+                self.backend_times[k] = self.backend_times.get(k, 0.0) + v
+            self.csp_bytes += stats.csp_bytes
+            self.num_backend_calls += stats.num_backend_calls
+            self.num_rounds += stats.num_rounds
+
+    def report(self) -> str:
+        lines = [
+            'solves: {} (cache hits: {}), backend calls: {}, rounds: {}, '
+            'CSP bytes: {}'.format(self.num_solves, self.num_cache_hits,
+                                   self.num_backend_calls, self.num_rounds,
+                                   self.csp_bytes)
+        ]
+        for phase in PHASES:
+            if phase in self.phase_times:
+                lines.append('  {:<10} {:>10.3f}s'.format(
+                    phase, self.phase_times[phase]))
+        for k, v in sorted(self.backend_times.items()):
+            lines.append('  {:<10} {:>10.3f}s (backend)'.format(k, v))
+        lines.append('  {:<10} {:>10.3f}s'.format('total', self.total_time))
+        return '\n'.join(lines)
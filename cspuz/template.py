@@ -0,0 +1,250 @@
+"""
+Compiled puzzle templates.
+
+A `Template` is a `Solver` whose constraints are only the rules of a puzzle
+of a fixed size. The clues of each instance are given by `set_clues` and,
+with a backend supporting `solve_with_assumptions` (z3, cnf), they are passed
+as assumptions to a backend session which lives as long as the template. The
+rules are therefore converted and encoded only once, and solving a new
+instance costs only the SAT calls:
+
+    template = Template()
+    answer = template.int_array((9, 9), 1, 9)
+    ...  # rules
+    template.add_answer_key(answer)
+
+    template.set_clues(answer[0, 0] == 5, answer[0, 1] == 3, ...)
+    template.solve()
+
+With the other backends (Sugar-based ones), the clues are simply added to the
+constraints and the problem is solved from scratch every time.
+
+A clue should be an operation on the variables or the expressions owned by
+the template (e.g. `answer[y, x] == n`), so that the same clue is mapped to
+the same backend literal across instances. The constraints made during the
+deduction of an instance are specific to it; as the backends keep a literal
+for each of them, the session is started again once
+`_MAX_SESSION_ASSUMPTIONS` of them have been passed. A template is not
+thread-safe; `cached_template` keeps one instance of each template per thread.
+"""
+
+import collections
+import threading
+import time
+from types import ModuleType
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set
+
+from .configuration import config
+from .constraints import flatten_iterator
+from .expr import BoolExpr, BoolExprLike, Expr
+from .simplifier import simplify_constraints
+from .solver import Solver, _Steps, _get_default_backend
+
+# number of assumptions other than the clues (e.g. the refutation clauses)
+# passed to a session before it is started again
+_MAX_SESSION_ASSUMPTIONS = 256
+
+
+class _ClueSession(object):
+    # Presents a persistent backend session, under the clues of the current
+    # instance, as a CSPSolver of the instance. Constraints added during the
+    # deduction are also passed as assumptions so that the session is kept
+    # free of them. Unlike the clues, they are not canonicalized: they are
+    # counted in `Template._num_assumed` of the backend instead.
+    def __init__(self, template: 'Template', name: str, csp_solver: Any,
+                 variables: List[Any], assumptions: List[BoolExprLike]):
+        self.template = template
+        self.name = name
+        self.csp_solver = csp_solver
+        # the variables of the template as known to the session, which are
+        # those of the call which started the session
+        self.variables = variables
+        self.assumptions = assumptions
+        self.num_base_assumptions = 0
+
+    def load_solution(self, variables: List[Any]) -> None:
+        for v, w in zip(variables, self.variables):
+            v.sol = w.sol
+
+    def add_constraint(self, constraint: Any) -> None:
+        if not isinstance(constraint, list):
+            constraint = [constraint]
+        self.assumptions += constraint
+        self.template._num_assumed[self.name] += len(constraint)
+
+    def solve(self) -> bool:
+        return self.solve_with_assumptions([])
+
+    def solve_with_assumptions(self, assumptions: List[BoolExprLike]) -> bool:
+        self.num_base_assumptions = len(self.assumptions)
+        self.template._num_assumed[self.name] += len(assumptions)
+        return self.csp_solver.solve_with_assumptions(self.assumptions +
+                                                      list(assumptions))
+
+    def unsat_core(self) -> List[int]:
+        n = self.num_base_assumptions
+        return [i - n for i in self.csp_solver.unsat_core() if i >= n]
+
+
+class Template(Solver):
+    clues: List[BoolExprLike]
+
+    def __init__(self):
+        super().__init__()
+        self.clues = []
+        # backend name -> (session, number of constraints sent to it, number
+        # of variables known to it)
+        self._sessions: Dict[str, Any] = dict()
+        # backend name -> number of assumptions other than the clues passed
+        # to the session
+        self._num_assumed: Dict[str, int] = collections.defaultdict(int)
+        # canonical nodes of clues
+        self._canonical_nodes: Dict[Hashable, Expr] = dict()
+        self._canonical_ids: Set[int] = set()
+
+    def __getstate__(self):
+        # backend sessions are not carried to other processes
+        state = dict(self.__dict__)
+        state['_sessions'] = dict()
+        state['_num_assumed'] = collections.defaultdict(int)
+        return state
+
+    def set_clues(self, *clue: Any) -> None:
+        """Replaces the clues of the instance to be solved next."""
+        clues = []
+        for x in flatten_iterator(*clue):
+            if isinstance(x, (BoolExpr, bool)):
+                clues.append(self._canonical(x))
+            else:
+                raise TypeError(
+                    'each element in \'clue\' must be BoolExpr-like')
+        self.clues = clues
+
+    def _canonical(self, e: Any) -> Any:
+        # Maps structurally identical expressions to the same object; the
+        # backends (z3 in particular) reuse the literal of an assumption only
+        # if the same object is passed again.
+        if not isinstance(e, Expr) or e.is_variable() or id(
+                e) in self._canonical_ids:
+            return e
+        operands = [self._canonical(x) for x in e.operands]
+        key = (e.op,
+               tuple(
+                   id(x) if isinstance(x, Expr) else (type(x).__name__, x)
+                   for x in operands))
+        node = self._canonical_nodes.get(key)
+        if node is None:
+            if all(x is y for x, y in zip(operands, e.operands)):
+                node = e
+            else:
+                node = type(e)(e.op, operands)
+            self._canonical_nodes[key] = node
+            self._canonical_ids.add(id(node))
+        return node
+
+    def _get_constraints(self) -> Optional[List[BoolExprLike]]:
+        # only used when the clues are not passed as assumptions
+        constraints = self.constraints + self.clues
+        if not config.use_simplifier:
+            return constraints
+        start = time.perf_counter()
+        simplified = simplify_constraints(constraints)
+        self.stats._add_time('simplify', time.perf_counter() - start)
+        return simplified
+
+    def _key_constraints(self) -> List[BoolExprLike]:
+        return super()._key_constraints() + self.clues
+
+    def _simplified(
+            self,
+            constraints: List[BoolExprLike]) -> List[BoolExprLike]:
+        if not config.use_simplifier:
+            return constraints
+        simplified = simplify_constraints(constraints)
+        if simplified is None:
+            return [False]
+        return simplified
+
+    def _clue_session(self, backend: ModuleType) -> Optional[_ClueSession]:
+        if not hasattr(backend.CSPSolver, 'solve_with_assumptions'):
+            return None
+        start = time.perf_counter()
+        name = backend.__name__
+        csp_solver, num_sent, num_variables = self._sessions.get(
+            name, (None, 0, 0))
+        if self._num_assumed[name] > _MAX_SESSION_ASSUMPTIONS:
+            # the literals of the past instances are dropped with the session
+            csp_solver = None
+        if csp_solver is not None:
+            # rules added since the last call are sent to the running session
+            variables, new_constraints = self._expand_primitives(
+                backend, self.variables,
+                self._simplified(self.constraints[num_sent:]))
+            if len(variables) != num_variables:
+                # the session does not know the new (or auxiliary) variables
+                csp_solver = None
+        if csp_solver is None:
+            variables, new_constraints = self._expand_primitives(
+                backend, self.variables, self._simplified(self.constraints))
+            csp_solver = backend.CSPSolver(variables)  # type: ignore
+            self._num_assumed[name] = 0
+        csp_solver.deadline = self._deadline
+        if len(new_constraints) > 0:
+            csp_solver.add_constraint(new_constraints)
+        self._sessions[name] = (csp_solver, len(self.constraints),
+                                len(self.variables))
+        self.stats._add_time('convert', time.perf_counter() - start)
+        self.stats.backend = name.split('.')[-1]
+        return _ClueSession(self, name, self._lazy_session(csp_solver),
+                            csp_solver.variables[:len(self.variables)],
+                            list(self.clues))
+
+    def _find_answer_steps(self, backend: Optional[ModuleType]) -> _Steps:
+        if backend is None:
+            backend = _get_default_backend()
+        session = self._clue_session(backend)
+        if session is None:
+            return (yield from super()._find_answer_steps(backend))
+        if not (yield from self._call_backend(session, 'solve')):
+            return self._set_unsat()
+        session.load_solution(self.variables)
+        return True
+
+    def _solve_steps(self, backend: Optional[ModuleType]) -> _Steps:
+        if backend is None:
+            backend = _get_default_backend()
+        session = self._clue_session(backend)
+        if session is None:
+            return (yield from super()._solve_steps(backend))
+        self.refutation_round_times = []
+        is_sat = yield from self._solve_by_refutation(
+            session, session.variables, self.is_answer_key)
+        if not is_sat:
+            return self._set_unsat()
+        session.load_solution(self.variables)
+        return True
+
+
+# per-thread LRU of the templates built by `cached_template`
+_local = threading.local()
+_MAX_CACHED_TEMPLATES = 16
+
+
+def cached_template(key: Hashable, build: Callable[[], Any]) -> Any:
+    """Returns `build()`, which is evaluated only once for each `key` in
+    each thread. `build` is expected to return a `Template` (possibly along
+    with its arrays), e.g. `key` is `('sudoku', n)`. Templates are built
+    again when the configuration changes, as it may affect the encoding of
+    the rules (e.g. `config.graph_encoding`)."""
+    key = (key, tuple(sorted(vars(config).items())))
+    templates = getattr(_local, 'templates', None)
+    if templates is None:
+        templates = _local.templates = collections.OrderedDict()
+    if key in templates:
+        templates.move_to_end(key)
+        return templates[key]
+    ret = build()
+    templates[key] = ret
+    while len(templates) > _MAX_CACHED_TEMPLATES:
+        templates.popitem(last=False)
+    return ret
@@ -6,5 +6,8 @@ setup(
     version='0.0.1',
     packages=['cspuz',
               'cspuz.backend',
-              'cspuz.puzzle']
-)
+              'cspuz.puzzle'],
+    extras_require={
+        # fast SAT solvers for the cnf backend
+        'pysat': ['python-sat'],
+    })
@@ -58,12 +58,24 @@ class CspuzSugarInterface {
     String satFile, mapFile, outFile;
     String[] answerKeys;
 
-    void loadProblem() throws IOException {
+    static final String FRAME_END = "%END";
+
+    PrintStream out;
+
+    // time spent in each phase (in nanoseconds) and the number of refutation
+    // rounds during the current problem, reported as "c time <phase> <seconds>" and
+    // "c rounds <n>" lines at the end of the answer
+    long convertTime, encodeTime, satTime, decodeTime;
+    int rounds;
+
+    CspuzSugarInterface(PrintStream out) {
+        this.out = out;
+    }
+
+    void loadProblem(List<String> input) throws IOException {
         ArrayList<String> lines = new ArrayList<String>();
-        BufferedReader reader = new BufferedReader(new InputStreamReader(System.in));
-        String line;
         answerKeys = null;
-        while ((line = reader.readLine()) != null) {
+        for (String line : input) {
             if (line.startsWith("#")) {
                 answerKeys = line.substring(1).split(" ");
             } else {
@@ -107,32 +119,48 @@ class CspuzSugarInterface {
         }
     }
     private File tempFile(String name, String ext) throws IOException {
-        File file = File.createTempFile(name, ext);
-        file.deleteOnExit();
-        return file;
+        return File.createTempFile(name, ext);
     }
     private void setupTempFiles() throws IOException {
         satFile = tempFile("temp", ".cnf").getAbsolutePath();
         mapFile = tempFile("temp", ".map").getAbsolutePath();
         outFile = tempFile("temp", ".out").getAbsolutePath();
     }
+    // The temporary files are deleted after each problem rather than by
+    // File.deleteOnExit, whose list would grow for the whole life of a
+    // server.
+    private void deleteTempFiles() {
+        for (String path : new String[] { satFile, mapFile, outFile }) {
+            if (path != null) {
+                new File(path).delete();
+            }
+        }
+        satFile = mapFile = outFile = null;
+    }
     boolean solveCSP() throws IOException, SugarException {
         // CSP -> SAT
+        long start = System.nanoTime();
         csp = new CSP();
         Converter converter = new Converter(csp);
         converter.convert(problem);
         csp.propagate();
         if (csp.isUnsatisfiable()) {
+            convertTime += System.nanoTime() - start;
             return false;
         }
         Simplifier simplifier = new Simplifier(csp);
         simplifier.simplify();
         if (csp.isUnsatisfiable()) {
+            convertTime += System.nanoTime() - start;
             return false;
         }
+        long convertEnd = System.nanoTime();
+        convertTime += convertEnd - start;
         Encoder encoder = new Encoder(csp);
         encoder.encode(satFile);
         encoder.outputMap(mapFile);
+        long encodeEnd = System.nanoTime();
+        encodeTime += encodeEnd - convertEnd;
 
         // Solve SAT
         String command[] = new String[] { "minisat", satFile, outFile };
@@ -143,32 +171,55 @@ class CspuzSugarInterface {
 	        process.destroy();
 	        e.printStackTrace();
         }
-        
-        return encoder.decode(outFile);
+        long satEnd = System.nanoTime();
+        satTime += satEnd - encodeEnd;
+
+        boolean ret = encoder.decode(outFile);
+        decodeTime += System.nanoTime() - satEnd;
+        return ret;
     }
-    void run() throws IOException, SugarException {
-        loadProblem();
-        setupTempFiles();
+    void printStats() {
+        out.println("c time convert " + convertTime / 1e9);
+        out.println("c time encode " + encodeTime / 1e9);
+        out.println("c time sat " + satTime / 1e9);
+        out.println("c time decode " + decodeTime / 1e9);
+        out.println("c rounds " + rounds);
+    }
+    void run(List<String> input) throws IOException, SugarException {
+        convertTime = encodeTime = satTime = decodeTime = 0;
+        rounds = 0;
+        try {
+            runProblem(input);
+        } finally {
+            deleteTempFiles();
+        }
+        printStats();
+    }
+    void runProblem(List<String> input) throws IOException, SugarException {
+        loadProblem(input);
+        if (satFile == null) {
+            setupTempFiles();
+        }
         boolean isSat = solveCSP();
 
         if (answerKeys == null) {
             // answer finder mode
             if (isSat) {
-                System.out.println("s SATISFIABLE");
+                out.println("s SATISFIABLE");
                 for (String name : intVars) {
-                    System.out.println("a " + name + "\t" + csp.getIntegerVariable(name).getValue());
+                    out.println("a " + name + "\t" + csp.getIntegerVariable(name).getValue());
                 }
                 for (String name : boolVars) {
-                    System.out.println("a " + name + "\t" + csp.getBooleanVariable(name).getValue());
+                    out.println("a " + name + "\t" + csp.getBooleanVariable(name).getValue());
                 }
-                System.out.println("a");
+                out.println("a");
             } else {
-                System.out.println("s UNSATISFIABLE");
+                out.println("s UNSATISFIABLE");
             }
         } else {
             // deduction mode
             if (!isSat) {
-                System.out.println("unsat");
+                out.println("unsat");
                 return;
             }
             boolean[] notRefutedInt = new boolean[isAnswerKeyInt.length];
@@ -197,6 +248,7 @@ class CspuzSugarInterface {
                 }
                 problem.add(Expression.create(Expression.OR, refutingExpr));
 
+                rounds += 1;
                 isSat = solveCSP();
                 if (!isSat) {
                     break;
@@ -212,21 +264,63 @@ class CspuzSugarInterface {
                     }
                 }
             }
-            System.out.println("sat");
+            out.println("sat");
             for (int i = 0; i < isAnswerKeyInt.length; ++i) {
                 if (isAnswerKeyInt[i] && notRefutedInt[i]) {
-                    System.out.println(intVars.get(i) + " " + answerInt[i]);
+                    out.println(intVars.get(i) + " " + answerInt[i]);
                 }
             }
             for (int i = 0; i < isAnswerKeyBool.length; ++i) {
                 if (isAnswerKeyBool[i] && notRefutedBool[i]) {
-                    System.out.println(boolVars.get(i) + " " + answerBool[i]);
+                    out.println(boolVars.get(i) + " " + answerBool[i]);
                 }
             }
         }
     }
+    static List<String> readFrame(BufferedReader reader, boolean framed) throws IOException {
+        ArrayList<String> lines = new ArrayList<String>();
+        String line;
+        while ((line = reader.readLine()) != null) {
+            if (framed && line.equals(FRAME_END)) {
+                return lines;
+            }
+            lines.add(line);
+        }
+        if (framed) {
+            // EOF before the end of a frame: the client has gone away
+            return null;
+        }
+        return lines;
+    }
+    static void runServer(BufferedReader reader) throws IOException {
+        // Server mode: each problem is terminated by a line "%END", and so is
+        // each answer. The JVM (and loaded Sugar classes) are reused across
+        // problems until stdin is closed.
+        ByteArrayOutputStream buffer = new ByteArrayOutputStream();
+        PrintStream bufferOut = new PrintStream(buffer, false, "UTF-8");
+        CspuzSugarInterface inf = new CspuzSugarInterface(bufferOut);
+        List<String> input;
+        while ((input = readFrame(reader, true)) != null) {
+            buffer.reset();
+            try {
+                inf.run(input);
+            } catch (Exception e) {
+                buffer.reset();
+                bufferOut.println("error " + e.toString().replace('\n', ' '));
+            }
+            bufferOut.flush();
+            System.out.print(buffer.toString("UTF-8"));
+            System.out.println(FRAME_END);
+            System.out.flush();
+        }
+    }
     public static void main(String[] args) throws IOException, SugarException {
-        CspuzSugarInterface inf = new CspuzSugarInterface();
-        inf.run();
+        BufferedReader reader = new BufferedReader(new InputStreamReader(System.in));
+        if (args.length >= 1 && args[0].equals("--server")) {
+            runServer(reader);
+            return;
+        }
+        CspuzSugarInterface inf = new CspuzSugarInterface(System.out);
+        inf.run(readFrame(reader, false));
     }
 }
@@ -1,3 +1,3 @@
 #!/bin/bash
 cd `dirname $0`
-java -cp ".:${SUGAR_JAR}" CspuzSugarInterface
+exec java -cp ".:${SUGAR_JAR}" CspuzSugarInterface "$@"
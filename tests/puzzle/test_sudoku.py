@@ -0,0 +1,29 @@
+import pytest
+
+import cspuz
+from cspuz.puzzle import sudoku
+
+
+@pytest.fixture(autouse=True)
+def default_backend():
+    previous = cspuz.config.default_backend
+    cspuz.config.default_backend = 'cnf'
+    yield
+    cspuz.config.default_backend = previous
+
+
+def test_results_are_not_shared():
+    p1 = [[1, 2, 3, 4], [3, 4, 1, 2], [2, 1, 4, 3], [4, 3, 2, 0]]
+    p2 = [[2, 1, 4, 3], [4, 3, 2, 1], [1, 2, 3, 4], [3, 4, 1, 0]]
+    is_sat, a = sudoku.solve_sudoku(p1, n=2)
+    assert is_sat is True
+    assert a[0, 0].sol == 1
+    assert a[3, 3].sol == 1
+    is_sat, b = sudoku.solve_sudoku(p2, n=2)
+    assert is_sat is True
+    assert b is not a
+    assert b[0, 0].sol == 2
+    assert b[3, 3].sol == 2
+    # the result of the first call is kept
+    assert a[0, 0].sol == 1
+    assert a[3, 3].sol == 1
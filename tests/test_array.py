@@ -43,7 +43,8 @@ ARRAY_INDEX_TEST_PATTERN = [
     (slice(4, 7, None), [4, 5, 6]), (slice(4, 2, None), []),
     (slice(2, -2, None), [2, 3, 4, 5, 6, 7]), (slice(8, 0, -2), [8, 6, 4, 2]),
     (slice(2, 11, 1), [2, 3, 4, 5, 6, 7, 8, 9]),
-    (slice(-5, None, 1), [5, 6, 7, 8, 9]), (slice(4, 8, -1), [])
+    (slice(-5, None, 1), [5, 6, 7, 8, 9]), (slice(4, 8, -1), []),
+    (slice(12, 6, -1), [9, 8, 7]), (slice(3, -12, -1), [3, 2, 1, 0])
 ]
 
 FOUR_NEIGHBOR_TEST_PATTERN = [
@@ -0,0 +1,109 @@
+import concurrent.futures
+
+import pytest
+
+import cspuz
+from cspuz import Assignment, BoolGridFrame, count_true
+from cspuz.backend import cnf
+
+
+def _make_problem():
+    # the black cells of each row of a 2x3 grid are on its left
+    solver = cspuz.Solver()
+    is_black = solver.bool_array((2, 3))
+    n = solver.int_var(0, 6)
+    solver.add_answer_key(is_black, n)
+    for y in range(2):
+        for x in range(2):
+            solver.ensure(is_black[y, x + 1].then(is_black[y, x]))
+    solver.ensure(count_true(is_black) == n)
+    solver.ensure(is_black[0, 1], ~is_black[1, 1], n >= 3)
+    return solver, is_black, n
+
+
+class TestAssignment:
+    def test_solve(self):
+        solver, is_black, n = _make_problem()
+        assert solver.solve(cnf) is True
+        assignment = solver.assignment
+        assert isinstance(assignment, Assignment)
+        assert assignment
+        assert assignment.stats is solver.stats
+        assert assignment.deduction is solver.deduction
+        assert assignment[is_black[0, 0]] is True
+        assert assignment[is_black[1, 2]] is False
+        assert assignment[is_black[0, 2]] is None
+        assert assignment[is_black[1, 0]] is None
+        assert assignment[n] is None
+        assert assignment.get(n, -1) == -1
+        assert assignment[is_black[0, 0] & ~is_black[1, 1]] is True
+        assert assignment[list(is_black)] == [v.sol for v in is_black]
+
+    def test_unsat(self):
+        solver, is_black, n = _make_problem()
+        solver.ensure(n == 6)
+        assert solver.find_answer(cnf) is False
+        assignment = solver.assignment
+        assert not assignment
+        assert assignment[list(is_black)] == [None] * 6
+
+    def test_results_are_kept(self):
+        solver, is_black, n = _make_problem()
+        assert solver.find_answer(cnf)
+        first = solver.assignment
+        solver.ensure(n == 3, ~is_black[1, 0])
+        assert solver.solve(cnf)
+        second = solver.assignment
+        assert second[is_black[0, 2]] is True
+        assert is_black[0, 2].sol is True
+        # the latest call does not affect the earlier result
+        assert first[n] == 2 + first[is_black[0, 2]] + first[is_black[1, 0]]
+        assert first[n] in (3, 4)
+
+    def test_detached(self):
+        solver, is_black, n = _make_problem()
+        frame = BoolGridFrame(solver, 1, 1)
+        solver.ensure(frame[0, 1], ~frame[1, 0])
+        assert solver.solve(cnf)
+        assignment = solver.assignment
+        black = assignment.detached(is_black)
+        frame2 = assignment.detached(frame)
+        solver.ensure(n == 3, ~is_black[1, 0], frame[1, 0] | frame[2, 1])
+        assert solver.solve(cnf)
+        assert is_black[0, 2].sol is True
+        assert frame[2, 1].sol is True
+        # the copies keep the first result
+        assert black.shape == (2, 3)
+        assert [v.sol for v in black] == [True, True, None, None, False, False]
+        assert frame2[0, 1].sol is True
+        assert frame2[2, 1].sol is None
+        assert assignment.detached(n).sol is None
+
+    def test_threads(self):
+        solver, is_black, n = _make_problem()
+        assert solver.solve(cnf)
+        expected = solver.assignment
+        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(
+                executor.map(lambda _: solver.solve(cnf), range(16)))
+        assert all(is_sat is True for is_sat in results)
+        # concurrent calls do not mix up their results
+        assert solver.assignment.values == expected.values
+        assert [v.sol for v in solver.variables] == [
+            expected.values[v.id] for v in solver.variables
+        ]
+
+    def test_array(self):
+        pytest.importorskip('numpy')
+        solver, is_black, n = _make_problem()
+        assert solver.solve(cnf)
+        assignment = solver.assignment
+        array = assignment[is_black]
+        assert array.shape == (2, 3)
+        assert array.dtype == bool
+        assert list(array.mask.flatten()) == [
+            False, False, True, True, False, False
+        ]
+        assert array[0, 1]
+        assert not array[1, 2]
+        assert assignment[is_black[0, :]].tolist() == [True, True, None]
@@ -0,0 +1,138 @@
+import asyncio
+import os
+import subprocess
+import time
+
+import pytest
+
+import cspuz
+from cspuz import count_true
+from cspuz.backend import cnf
+from cspuz.backend._subproc import run_subprocess_async
+
+
+class _TrackingBackend:
+    # cnf backend with an asynchronous `solve` which records how many
+    # problems are being solved at a time
+    running = 0
+    max_running = 0
+
+    class CSPSolver(cnf.CSPSolver):
+        async def solve_async(self):
+            _TrackingBackend.running += 1
+            _TrackingBackend.max_running = max(_TrackingBackend.max_running,
+                                               _TrackingBackend.running)
+            try:
+                await asyncio.sleep(0.01)
+                return self.solve()
+            finally:
+                _TrackingBackend.running -= 1
+
+
+def _make_problem(n):
+    solver = cspuz.Solver()
+    a = solver.bool_array(4)
+    solver.add_answer_key(a)
+    solver.ensure(count_true(a) == n)
+    for i in range(3):
+        solver.ensure(a[i].then(a[i + 1]))
+    return solver, a
+
+
+def _is_running(pid):
+    try:
+        with open('/proc/{}/stat'.format(pid)) as f:
+            return f.read().split(')')[-1].split()[0] != 'Z'
+    except FileNotFoundError:
+        return False
+
+
+class TestAsync:
+    def test_solve_async(self):
+        solver = cspuz.Solver()
+        a = solver.bool_array(4)
+        solver.add_answer_key(a)
+        solver.ensure(a[0] | a[1])
+        solver.ensure(~a[0])
+        solver.ensure(a[2] != a[3])
+        assert asyncio.run(solver.solve_async(cnf))
+        assert [v.sol for v in a] == [False, True, None, None]
+
+    def test_unsat(self):
+        solver, a = _make_problem(5)
+        assert not asyncio.run(solver.solve_async(cnf))
+        assert not asyncio.run(solver.find_answer_async(cnf))
+
+    def test_find_answer_async(self):
+        solver, a = _make_problem(2)
+        assert asyncio.run(solver.find_answer_async(cnf))
+        assert [v.sol for v in a] == [False, False, True, True]
+
+    def test_limiter(self):
+        problems = [_make_problem(n % 5) for n in range(8)]
+
+        async def run():
+            limiter = asyncio.Semaphore(3)
+            return await asyncio.gather(*[
+                solver.solve_async(_TrackingBackend, limiter=limiter)
+                for solver, _ in problems
+            ])
+
+        _TrackingBackend.max_running = 0
+        assert asyncio.run(run()) == [True] * 8
+        assert _TrackingBackend.max_running == 3
+        for n, (_, a) in enumerate(problems):
+            assert count_true(v.sol for v in a) == n % 5
+
+    def test_default_limiter(self):
+        problems = [_make_problem(1) for _ in range(4)]
+
+        async def run():
+            return await asyncio.gather(*[
+                solver.solve_async(_TrackingBackend)
+                for solver, _ in problems
+            ])
+
+        cspuz.config.async_max_concurrency = 1
+        _TrackingBackend.max_running = 0
+        try:
+            assert asyncio.run(run()) == [True] * 4
+        finally:
+            cspuz.config.async_max_concurrency = os.cpu_count() or 1
+        assert _TrackingBackend.max_running == 1
+
+
+class TestRunSubprocessAsync:
+    def test_output(self):
+        assert asyncio.run(run_subprocess_async(['cat'], 'abc\n')) == 'abc\n'
+
+    def test_timeout(self):
+        start = time.perf_counter()
+        with pytest.raises(subprocess.TimeoutExpired):
+            asyncio.run(
+                run_subprocess_async(['sh', '-c', 'sleep 30'], '',
+                                     timeout=0.2))
+        assert time.perf_counter() - start < 10
+
+    @pytest.mark.skipif(not os.path.exists('/proc'),
+                        reason='/proc is not available')
+    def test_cancel_terminates_process_tree(self, tmp_path):
+        pid_file = tmp_path / 'pid'
+        script = 'sleep 30 & echo $! > {}; wait'.format(pid_file)
+
+        async def run():
+            task = asyncio.create_task(
+                run_subprocess_async(['sh', '-c', script], ''))
+            while not pid_file.exists() or pid_file.read_text() == '':
+                await asyncio.sleep(0.01)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(run())
+        child_pid = int(pid_file.read_text())
+        for _ in range(100):
+            if not _is_running(child_pid):
+                break
+            time.sleep(0.01)
+        assert not _is_running(child_pid)
@@ -0,0 +1,67 @@
+import pytest
+
+import cspuz
+from cspuz import count_true
+from cspuz.backend import cnf
+from cspuz.batch import BatchStats, solve_many, solve_many_iter
+
+
+def _make_problem(n):
+    # the last `n` of 4 cells are black, which is unsatisfiable for n > 4
+    solver = cspuz.Solver()
+    a = solver.bool_array(4)
+    b = solver.bool_var()
+    solver.add_answer_key(a)
+    solver.ensure(count_true(a) == n)
+    for i in range(3):
+        solver.ensure(a[i].then(a[i + 1]))
+    solver.ensure(a[0] | b)
+    return solver, a
+
+
+class TestBatch:
+    @pytest.fixture(params=[True, False])
+    def use_processes(self, request):
+        return request.param
+
+    def test_solve_many(self, use_processes):
+        problems = [_make_problem(n) for n in [1, 4, 5, 0, 3]]
+        stats = BatchStats()
+        res = solve_many([solver for solver, _ in problems],
+                         backend=cnf,
+                         max_workers=2,
+                         use_processes=use_processes,
+                         stats=stats)
+        assert res == [True, True, False, True, True]
+        assert [v.sol for v in problems[0][1]] == [False, False, False, True]
+        assert [v.sol for v in problems[1][1]] == [True, True, True, True]
+        assert [v.sol for v in problems[3][1]] == [False, False, False, False]
+        assert [v.sol for v in problems[4][1]] == [False, True, True, True]
+        assert stats.num_solved == 5
+        assert stats.throughput > 0
+        assert stats.max_queue_wait >= 0
+
+    def test_find_answer(self, use_processes):
+        problems = [_make_problem(n) for n in [2, 6]]
+        res = cspuz.Solver.solve_many([solver for solver, _ in problems],
+                                      find_answer=True,
+                                      backend=cnf,
+                                      max_workers=1,
+                                      use_processes=use_processes)
+        assert res == [True, False]
+        assert sum(v.sol for v in problems[0][1]) == 2
+
+    def test_solve_many_iter(self, use_processes):
+        problems = [_make_problem(n % 6) for n in range(10)]
+        indices = []
+        for result in solve_many_iter([solver for solver, _ in problems],
+                                      backend=cnf,
+                                      max_workers=3,
+                                      use_processes=use_processes):
+            assert result.solver is problems[result.index][0]
+            assert result.is_sat == (result.index % 6 <= 4)
+            a = problems[result.index][1]
+            assert result.assignment[list(a)] == [v.sol for v in a]
+            assert result.solver.assignment[list(a)] == [v.sol for v in a]
+            indices.append(result.index)
+        assert sorted(indices) == list(range(10))
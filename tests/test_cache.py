@@ -0,0 +1,122 @@
+import pytest
+
+import cspuz
+from cspuz import count_true
+from cspuz.backend import cnf
+from cspuz.cache import ResultCache, get_result_cache, problem_key
+
+
+class _CountingBackend:
+    # cnf backend which counts the problems passed to it
+    num_problems = 0
+
+    class CSPSolver(cnf.CSPSolver):
+        def __init__(self, variables):
+            super().__init__(variables)
+            _CountingBackend.num_problems += 1
+
+
+def _make_problem(n, key_all=True):
+    solver = cspuz.Solver()
+    a = solver.bool_array(4)
+    x = solver.int_var(0, 4)
+    if key_all:
+        solver.add_answer_key(a, x)
+    else:
+        solver.add_answer_key(a)
+    solver.ensure(count_true(a) == n)
+    solver.ensure(x == count_true(a[1:]))
+    for i in range(3):
+        solver.ensure(a[i].then(a[i + 1]))
+    return solver, a, x
+
+
+class TestResultCache:
+    @pytest.fixture(autouse=True)
+    def use_result_cache(self):
+        cspuz.config.use_result_cache = True
+        cspuz.config.result_cache_size = 16
+        cspuz.config.use_presolve = False
+        _CountingBackend.num_problems = 0
+        get_result_cache().clear()
+        yield
+        get_result_cache().clear()
+        cspuz.config.use_result_cache = False
+        cspuz.config.result_cache_size = 1024
+        cspuz.config.use_presolve = True
+
+    def test_solve(self):
+        cache = get_result_cache()
+        solver, a, x = _make_problem(2)
+        assert solver.solve(_CountingBackend)
+        assert _CountingBackend.num_problems == 1
+        assert (cache.hits, cache.misses) == (0, 1)
+
+        # an identical problem built from scratch hits the cache
+        solver, a, x = _make_problem(2)
+        assert solver.solve(_CountingBackend)
+        assert _CountingBackend.num_problems == 1
+        assert (cache.hits, cache.misses) == (1, 1)
+        assert [v.sol for v in a] == [False, False, True, True]
+        assert x.sol == 2
+
+    def test_key(self):
+        solver1, _, _ = _make_problem(2)
+        solver2, _, _ = _make_problem(2, key_all=False)
+        solver3, _, _ = _make_problem(3)
+        keys = {
+            problem_key('solve', s.variables, s.is_answer_key, s.constraints)
+            for s in [solver1, solver2, solver3]
+        }
+        assert len(keys) == 3
+        assert problem_key('solve', solver1.variables, solver1.is_answer_key,
+                           solver1.constraints) != problem_key(
+                               'find_answer', solver1.variables,
+                               solver1.is_answer_key, solver1.constraints)
+
+    def test_find_answer_and_unsat(self):
+        solver, a, x = _make_problem(5)
+        assert not solver.find_answer(_CountingBackend)
+        solver, a, x = _make_problem(5)
+        assert not solver.find_answer(_CountingBackend)
+        cache = get_result_cache()
+        assert (cache.hits, cache.misses) == (1, 1)
+        assert x.sol is None
+
+        solver, a, x = _make_problem(4)
+        assert solver.find_answer(_CountingBackend)
+        solver, a, x = _make_problem(4)
+        assert solver.solve(_CountingBackend)
+        assert _CountingBackend.num_problems == 2
+
+    def test_lru(self):
+        cache = ResultCache(maxsize=2)
+        cache.put('a', (True, [1]))
+        cache.put('b', (True, [2]))
+        assert cache.get('a') == (True, [1])
+        cache.put('c', (False, [None]))
+        assert cache.get('b') is None
+        assert cache.get('a') == (True, [1])
+        assert cache.get('c') == (False, [None])
+        assert len(cache) == 2
+        assert (cache.hits, cache.misses) == (3, 1)
+
+    def test_disk(self, tmp_path):
+        path = str(tmp_path / 'cache.sqlite')
+        cache1 = ResultCache(maxsize=2, path=path)
+        cache1.put('a', (True, [True, 3, None]))
+        cache2 = ResultCache(maxsize=2, path=path)
+        assert cache2.get('a') == (True, [True, 3, None])
+        assert cache2.get('b') is None
+
+        cspuz.config.result_cache_path = path
+        try:
+            solver, a, x = _make_problem(1)
+            assert solver.solve(_CountingBackend)
+            get_result_cache()._entries.clear()
+            solver, a, x = _make_problem(1)
+            assert solver.solve(_CountingBackend)
+            assert _CountingBackend.num_problems == 1
+            assert [v.sol for v in a] == [False, False, False, True]
+        finally:
+            cspuz.config.result_cache_path = None
@@ -71,8 +71,8 @@ class TestConstraints:
         b = solver.bool_var()
         actual = cspuz.count_true(False, [a, True], b)
         vars = [a[0, 0], a[0, 1], a[1, 0], a[1, 1], b]
-        exprs = list(map(lambda x: Expr(Op.IF, [x, 1, 0]), vars)) + [1]
-        assert check_equality_expr(actual, Expr(Op.ADD, exprs))
+        assert check_equality_expr(
+            actual, Expr(Op.ADD, [Expr(Op.COUNT_TRUE, vars), 1]))
 
     def test_count_true_empty(self, solver):
         actual = cspuz.count_true()
@@ -261,9 +261,19 @@ class TestExprConstruction:
 
 
 class TestExprValue:
-    @pytest.fixture(autouse=True, params=["sugar", "z3"])
+    # Without presolving, the constraints reach the backend as they are;
+    # with it, most of them are evaluated on the Python side.
+    @pytest.fixture(autouse=True,
+                    params=[("sugar", False), ("z3", False), ("cnf", False),
+                            ("cnf", True)])
     def default_backend(self, request):
-        cspuz.config.default_backend = request.param
+        default_backend, use_presolve = request.param
+        cspuz.config.default_backend = default_backend
+        cspuz.config.use_simplifier = use_presolve
+        cspuz.config.use_presolve = use_presolve
+        yield
+        cspuz.config.use_simplifier = True
+        cspuz.config.use_presolve = True
 
     @pytest.fixture
     def solver(self):
@@ -6,11 +6,23 @@ from cspuz import graph, BoolGridFrame
 
 class TestGraph:
     @pytest.fixture(autouse=True,
-                    params=[("sugar", False), ("sugar", True), ("z3", False)])
+                    params=[("sugar", False, "rank"), ("sugar", True, "rank"),
+                            ("z3", False, "rank"), ("cnf", False, "rank"),
+                            ("cnf", True, "rank"),
+                            ("z3", False, "lazy"), ("cnf", False, "lazy"),
+                            ("cnf", False, "binary"),
+                            ("cnf", False, "distance")])
     def default_backend(self, request):
-        default_backend, use_graph_primitive = request.param
+        default_backend, use_graph_primitive, encoding = request.param
         cspuz.config.default_backend = default_backend
         cspuz.config.use_graph_primitive = use_graph_primitive
+        if encoding == "lazy":
+            cspuz.config.lazy_connectivity = True
+        else:
+            cspuz.config.graph_encoding = encoding
+        yield
+        cspuz.config.lazy_connectivity = False
+        cspuz.config.graph_encoding = "rank"
 
     @pytest.fixture
     def solver(self):
@@ -68,6 +80,39 @@ class TestGraph:
         solver.ensure(is_active[7])
         assert not solver.find_answer()
 
+    def test_active_vertices_connected_distance_range(self, solver,
+                                                      default_graph):
+        # only the vertices 0, 1 and 2 may be active, so the tree is at most
+        # 2 layers deep
+        a = solver.bool_array(3)
+        graph.active_vertices_connected(solver,
+                                        list(a) + [False] * 5,
+                                        graph=default_graph,
+                                        use_graph_primitive=False,
+                                        lazy=False,
+                                        encoding='distance')
+        assert max(v.hi for v in solver.variables
+                   if isinstance(v, cspuz.expr.IntVar)) == 2
+        solver.ensure(a[0], a[2])
+        assert solver.find_answer()
+        assert a[1].sol is True
+
+    def test_active_vertices_connected_acyclic(self, solver, default_graph):
+        is_active = solver.bool_array(8)
+        graph.active_vertices_connected(solver,
+                                        is_active,
+                                        graph=default_graph,
+                                        acyclic=True)
+
+        solver.ensure(is_active[0])
+        solver.ensure(is_active[1])
+        solver.ensure(is_active[4])
+        assert solver.find_answer()
+
+        # 0 - 1 - 4 - 3 - 0 is a cycle
+        solver.ensure(is_active[3])
+        assert not solver.find_answer()
+
     def test_active_vertices_not_adjacent_and_not_segmenting_grid(
             self, solver):
         is_active = solver.bool_array((3, 4))
@@ -0,0 +1,123 @@
+import pytest
+
+import cspuz
+from cspuz import count_true
+from cspuz.backend import cnf, sugar
+from cspuz.expr import BoolVar, Expr, IntVar, Op
+from cspuz.interning import ExprPool, sharing_stats
+
+from tests.util import check_equality_expr
+
+
+class TestInterning:
+    @pytest.fixture
+    def solver(self):
+        return cspuz.Solver()
+
+    def test_intern_identical(self, solver):
+        x = solver.int_var(0, 3)
+        y = solver.int_var(0, 3)
+        a = solver.bool_var()
+        pool = ExprPool()
+        e1 = pool.intern((x < y) & a)
+        e2 = pool.intern((x < y) & a)
+        e3 = pool.intern((y < x) & a)
+        assert e1 is e2
+        assert e1 is not e3
+        assert check_equality_expr(e1, (x < y) & a)
+        assert pool.ref_count[id(e1)] == 2
+        assert pool.intern(x) is x
+        assert pool.intern(3) == 3
+
+    def test_intern_cloned_variables(self, solver):
+        x = solver.int_var(0, 3)
+        a = solver.bool_var()
+        pool = ExprPool()
+        e1 = pool.intern((x < 2) & a)
+        e2 = pool.intern((IntVar(x.id, 0, 3) < 2) & BoolVar(a.id))
+        assert e1 is e2
+        assert pool.ref_count[id(e1)] == 2
+
+    def test_intern_constants(self, solver):
+        x = solver.int_var(0, 3)
+        pool = ExprPool()
+        # `True` and `1` must not be merged although they are equal in Python
+        e1 = pool.intern(Expr(Op.EQ, [x, 1]))
+        e2 = pool.intern(Expr(Op.EQ, [x, True]))
+        assert e1 is not e2
+
+    def test_sharing_stats(self, solver):
+        a = solver.bool_array(3)
+        x = solver.int_var(0, 3)
+        y = solver.int_var(0, 3)
+        less = [(x < y) & a[i] for i in range(3)]
+        num_tree, num_dag = sharing_stats(
+            [count_true(less) == 1, count_true(less) >= 1])
+        # each constraint is a tree of 17 nodes: the comparison, the count
+        # and 3 `(&& (< x y) a[i])`; as a DAG, the 5 variables, `(< x y)` and
+        # the count are shared
+        assert num_tree == 34
+        assert num_dag == 5 + 1 + 3 + 1 + 2
+
+    def test_sharing_stats_deep(self, solver):
+        a = solver.bool_var()
+        e = a
+        for _ in range(5000):
+            e = e & e
+        num_tree, num_dag = sharing_stats([e])
+        assert num_tree == 2**5001 - 1
+        assert num_dag == 5001
+
+
+class TestSharingInBackends:
+    @pytest.fixture
+    def solver(self):
+        return cspuz.Solver()
+
+    def test_sugar_auxiliary_variables(self, solver):
+        a = solver.bool_array(2)
+        x = solver.int_var(0, 3)
+        y = solver.int_var(0, 3)
+        s = count_true([(x < y) & a[0], (x < y) & a[1]])
+        csp_solver = sugar.CSPSolver(solver.variables)
+        csp_solver.add_constraint([s == 1, s >= 1])
+        assert csp_solver.converted_constraints == [
+            '(int s0 0 2)',
+            '(= s0 (+ (if (&& (< i2 i3) b0) 1 0) (if (&& (< i2 i3) b1) 1 0)))',
+            '(= s0 1)',
+            '(>= s0 1)',
+        ]
+
+    def test_sugar_without_sharing(self, solver):
+        a = solver.bool_var()
+        e = ~(a & a)
+        cspuz.config.share_subexpressions = False
+        try:
+            csp_solver = sugar.CSPSolver(solver.variables)
+        finally:
+            cspuz.config.share_subexpressions = True
+        csp_solver.add_constraint([e, e | a])
+        assert csp_solver.converted_constraints == [
+            '(! (&& b0 b0))', '(|| (! (&& b0 b0)) b0)'
+        ]
+
+    def test_cnf_shares_sat_variables(self, solver):
+        a = solver.bool_array(4)
+        x = solver.int_var(0, 3)
+        y = solver.int_var(0, 3)
+        constraints = [
+            count_true([(x < y) & a[i] for i in range(4)]) == 1,
+            count_true([(x < y) & a[i] for i in range(4)]) <= 2,
+        ]
+
+        num_sat_vars = []
+        for share in [False, True]:
+            cspuz.config.share_subexpressions = share
+            try:
+                csp_solver = cnf.CSPSolver(solver.variables)
+            finally:
+                cspuz.config.share_subexpressions = True
+            csp_solver.add_constraint(constraints)
+            assert csp_solver.solve()
+            num_sat_vars.append(csp_solver.num_sat_vars)
+        assert num_sat_vars[1] < num_sat_vars[0]
@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+import cspuz
+from cspuz import count_true, graph
+from cspuz.backend import cnf
+from cspuz.lazy import evaluate
+from cspuz.template import Template
+
+
+def _make_problem(lazy, solver=None):
+    # 3x3 grid whose black cells are connected, with 2 of the corners black
+    if solver is None:
+        solver = cspuz.Solver()
+    is_black = solver.bool_array((3, 3))
+    solver.add_answer_key(is_black)
+    graph.active_vertices_connected(solver, is_black, lazy=lazy)
+    solver.ensure(count_true(is_black) == 3)
+    return solver, is_black
+
+
+class TestLazy:
+    def test_evaluate(self):
+        solver = cspuz.Solver()
+        a = solver.bool_array(2)
+        x = solver.int_var(0, 5)
+        a[0].sol = True
+        a[1].sol = False
+        x.sol = 3
+        assert evaluate((a[0] | a[1]) & (x + 2 == 5))
+        assert evaluate(a[1].cond(x, 1) - x) == -2
+        assert not evaluate(a[0].then(a[1]))
+        x.sol = None
+        assert evaluate(x >= 1) is None
+
+    def test_solve(self):
+        results = []
+        for lazy in [True, False]:
+            solver, is_black = _make_problem(lazy)
+            solver.ensure(is_black[0, 0], is_black[0, 2])
+            assert solver.solve(cnf)
+            results.append([v.sol for v in is_black])
+            assert len(solver.lazy_constraints) == (1 if lazy else 0)
+        assert results[0] == results[1]
+        assert results[0] == [True, True, True] + [False] * 6
+
+    def test_unsat(self):
+        # satisfiable without connectivity, so some cuts are needed
+        solver, is_black = _make_problem(True)
+        solver.ensure(is_black[0, 0], is_black[2, 2])
+        assert not solver.find_answer(cnf)
+        assert solver.stats.num_lazy_cuts > 0
+        assert is_black[0, 0].sol is None
+
+    def test_template(self):
+        template, is_black = _make_problem(True, Template())
+        template.set_clues(is_black[0, 0], is_black[0, 2])
+        assert template.solve(cnf)
+        assert [v.sol for v in is_black[0, :]] == [True, True, True]
+        template.set_clues(is_black[0, 0], is_black[2, 2])
+        assert not template.solve(cnf)
+        template.set_clues(is_black[0, 0], is_black[2, 0])
+        assert template.solve(cnf)
+        assert [v.sol for v in is_black[:, 0]] == [True, True, True]
+
+    def test_async(self):
+        solver, is_black = _make_problem(True)
+        solver.ensure(is_black[0, 0], is_black[0, 2])
+        assert asyncio.run(solver.solve_async(cnf))
+        assert [v.sol for v in is_black[0, :]] == [True, True, True]
+
+    def test_analyzer(self):
+        from cspuz.analyzer import Analyzer
+
+        analyzer = Analyzer()
+        is_black = analyzer.bool_array((3, 3))
+        analyzer.add_answer_key(is_black, name='is_black')
+        with pytest.raises(ValueError):
+            graph.active_vertices_connected(analyzer, is_black, lazy=True)
@@ -0,0 +1,65 @@
+import pytest
+
+import cspuz
+from cspuz import count_true, graph
+
+
+def _make_problem():
+    # 4x5 grid: 2 or 3 black cells in each row, exactly 2 in each column
+    solver = cspuz.Solver()
+    is_black = solver.bool_array((4, 5))
+    solver.add_answer_key(is_black)
+    for y in range(4):
+        solver.ensure(count_true(is_black[y, :]) >= 2)
+        solver.ensure(count_true(is_black[y, :]) <= 3)
+    for x in range(5):
+        solver.ensure(count_true(is_black[:, x]) == 2)
+    return solver, is_black
+
+
+class TestParallelDeduction:
+    @pytest.fixture(autouse=True, params=["z3", "cnf"])
+    def default_backend(self, request):
+        cspuz.config.default_backend = request.param
+        yield
+
+    @pytest.fixture
+    def deduction_workers(self):
+        cspuz.config.deduction_workers = 2
+        yield
+        cspuz.config.deduction_workers = 1
+
+    def _solve_sequentially(self, solver, cells):
+        workers = cspuz.config.deduction_workers
+        cspuz.config.deduction_workers = 1
+        try:
+            is_sat = solver.solve()
+        finally:
+            cspuz.config.deduction_workers = workers
+        return is_sat, [v.sol for v in cells]
+
+    def test_solve(self, deduction_workers):
+        solver, is_black = _make_problem()
+        solver.ensure(is_black[0, 0], is_black[1, 0])
+        solver.ensure(~is_black[0, 1], ~is_black[0, 2], ~is_black[1, 1])
+        expected = self._solve_sequentially(solver, is_black)
+        assert solver.solve()
+        assert (True, [v.sol for v in is_black]) == expected
+        assert [v.sol for v in is_black[:, 0]] == [True, True, False, False]
+        assert [v.sol for v in is_black[:, 1]] == [False, False, True, True]
+        assert is_black[0, 3].sol is None
+        assert len(solver.refutation_round_times) > 0
+
+    def test_unsat(self, deduction_workers):
+        solver, is_black = _make_problem()
+        solver.ensure(is_black[0, :4])
+        assert not solver.solve()
+        assert is_black[0, 0].sol is None
+
+    def test_lazy_constraints(self, deduction_workers):
+        solver, is_black = _make_problem()
+        graph.active_vertices_connected(solver, is_black, lazy=True)
+        solver.ensure(is_black[0, 0], is_black[3, 4])
+        expected = self._solve_sequentially(solver, is_black)
+        assert solver.solve()
+        assert (True, [v.sol for v in is_black]) == expected
@@ -0,0 +1,103 @@
+import json
+import os
+import time
+
+import pytest
+
+import cspuz
+from cspuz import count_true
+from cspuz.backend import portfolio
+
+
+def _make_problem():
+    solver = cspuz.Solver()
+    a = solver.bool_array(4)
+    solver.add_answer_key(a)
+    solver.ensure(count_true(a) == 2)
+    solver.ensure(a[0] != a[1])
+    solver.ensure(~a[2])
+    return solver, a
+
+
+class TestPortfolio:
+    @pytest.fixture(autouse=True)
+    def entries(self, tmp_path):
+        # the sugar entry fails as there is no such executable
+        cspuz.config.portfolio = ('cnf,sugar?backend_path={}'.format(
+            tmp_path / 'nonexistent'))
+        cspuz.config.portfolio_record_path = str(tmp_path / 'record.json')
+        yield
+        cspuz.config.portfolio = 'sugar_extended,z3'
+        cspuz.config.portfolio_record_path = None
+
+    def test_parse_entry(self):
+        assert portfolio.parse_entry('z3') == ('z3', {})
+        assert portfolio.parse_entry(
+            'cnf?cnf_sat_engine=pysat:glucose4&use_presolve=0') == (
+                'cnf', {
+                    'cnf_sat_engine': 'pysat:glucose4',
+                    'use_presolve': 0
+                })
+        with pytest.raises(ValueError):
+            portfolio.parse_entry('cnf?no_such_option=1')
+
+    def test_solve(self):
+        solver, a = _make_problem()
+        with portfolio.puzzle_type('test'):
+            assert solver.solve(portfolio)
+        assert [v.sol for v in a] == [None, None, False, True]
+        assert solver.stats.backend == 'portfolio'
+
+        solver.ensure(a[0])
+        with portfolio.puzzle_type('test'):
+            assert solver.find_answer(portfolio)
+        assert [v.sol for v in a] == [True, False, False, True]
+
+        assert portfolio.get_record() == {'test': {'cnf': 2}}
+        with open(cspuz.config.portfolio_record_path) as f:
+            assert json.load(f)['races'] == {'test': 2}
+
+    def test_terminate_losers(self, tmp_path):
+        script = tmp_path / 'slow.sh'
+        pid_file = tmp_path / 'pid'
+        script.write_text('#!/bin/sh\necho $$ > {}\nexec sleep 60\n'.format(
+            pid_file))
+        script.chmod(0o755)
+        cspuz.config.portfolio = 'sugar?backend_path={},cnf'.format(script)
+        solver, a = _make_problem()
+        start = time.time()
+        assert solver.solve(portfolio)
+        assert time.time() - start < 30
+        if pid_file.exists():
+            pid = int(pid_file.read_text())
+            for _ in range(50):
+                try:
+                    os.kill(pid, 0)
+                except ProcessLookupError:
+                    break
+                time.sleep(0.1)
+            else:
+                pytest.fail('the losing backend is still running')
+
+    def test_selection(self, monkeypatch):
+        monkeypatch.setattr(portfolio, '_MIN_RACES', 2)
+        entries = ['cnf', 'z3', 'sugar']
+        record = portfolio._record
+        assert record.select('x', entries) == entries
+        record.add('x', 'z3')
+        record.add('x', 'z3')
+        record.add('x', 'z3')
+        assert record.select('x', entries) == ['z3']
+        record.add('x', 'cnf')
+        assert record.select('x', entries) == ['cnf', 'z3']
+        for _ in range(6):
+            record.add('x', 'z3')
+        # exploration
+        assert record.select('x', entries) == entries
+
+    def test_all_failed(self, tmp_path):
+        cspuz.config.portfolio = 'sugar?backend_path={}'.format(
+            tmp_path / 'nonexistent')
+        solver, _ = _make_problem()
+        with pytest.raises(RuntimeError):
+            solver.find_answer(portfolio)
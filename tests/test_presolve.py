@@ -0,0 +1,104 @@
+import pytest
+
+import cspuz
+from cspuz import count_true
+from cspuz.backend import cnf
+from cspuz.presolve import presolve
+
+
+class _RecordingBackend:
+    # cnf backend which records the problems passed to it
+    problems = []
+
+    class CSPSolver(cnf.CSPSolver):
+        def __init__(self, variables):
+            super().__init__(variables)
+            _RecordingBackend.problems.append((variables, []))
+
+        def add_constraint(self, constraint):
+            _RecordingBackend.problems[-1][1].append(constraint)
+            super().add_constraint(constraint)
+
+
+class TestPresolve:
+    @pytest.fixture
+    def solver(self):
+        return cspuz.Solver()
+
+    @pytest.fixture(autouse=True)
+    def clear_problems(self):
+        _RecordingBackend.problems = []
+
+    def test_units(self, solver):
+        a = solver.bool_array(3)
+        x = solver.int_var(0, 5)
+        presolved = presolve(solver.variables,
+                             [a[0], ~a[1], x == 3, a[0].then(a[2])])
+        assert presolved.constraints == []
+        assert presolved.variables == []
+        presolved.load_solution(solver.variables, fill_free=False)
+        assert [v.sol for v in solver.variables] == [True, False, True, 3]
+
+    def test_equivalence(self, solver):
+        a = solver.bool_array(3)
+        presolved = presolve(solver.variables,
+                             [a[0] == a[1], a[1] != a[2], a[0] | a[2]])
+        # a[1] and a[2] are merged into a[0], so `a[0] | ~a[0]` holds
+        assert presolved.constraints == []
+        presolved.load_solution(solver.variables, fill_free=False)
+        assert [v.sol for v in solver.variables] == [None, None, None]
+        presolved.load_solution(solver.variables, fill_free=True)
+        assert solver.variables[0].sol == solver.variables[1].sol
+        assert solver.variables[0].sol != solver.variables[2].sol
+
+    def test_bounds(self, solver):
+        x = solver.int_var(0, 5)
+        y = solver.int_var(0, 5)
+        b = solver.bool_var()
+        presolved = presolve(
+            solver.variables,
+            [x >= 2, 4 > y, x == y, x != 3, b == (x + y >= 4)])
+        assert presolved.constraints == []
+        presolved.load_solution(solver.variables, fill_free=False)
+        assert x.sol == 2
+        assert y.sol == 2
+        assert b.sol is True
+
+    def test_unsat(self, solver):
+        a = solver.bool_array(2)
+        x = solver.int_var(0, 5)
+        assert presolve(solver.variables, [a[0] == a[1], a[0], ~a[1]]) is None
+        assert presolve(solver.variables, [x >= 3, x <= 2]) is None
+
+    def test_drop_variables(self, solver):
+        a = solver.bool_array(4)
+        solver.add_answer_key(a)
+        solver.ensure(a[0])
+        solver.ensure(a[0].then(a[1] | a[2]))
+        solver.ensure(count_true(a[1], a[2]) == 1)
+        assert solver.solve(_RecordingBackend)
+        variables, constraints = _RecordingBackend.problems[0]
+        # a[0] is fixed and a[3] does not appear
+        assert [v.id for v in variables] == [1, 2]
+        assert [v.sol for v in a] == [True, None, None, None]
+
+    def test_fixed_answer_keys_without_backend(self, solver):
+        a = solver.bool_array(3)
+        x = solver.int_var(0, 5)
+        solver.add_answer_key(a, x)
+        solver.ensure(a[0], ~a[1], a[2] == a[0], x == 3)
+        assert solver.solve(_RecordingBackend)
+        assert _RecordingBackend.problems == []
+        assert [v.sol for v in a] == [True, False, True]
+        assert x.sol == 3
+
+    def test_find_answer(self, solver):
+        a = solver.bool_array(3)
+        x = solver.int_var(0, 5)
+        y = solver.int_var(0, 5)
+        solver.ensure(a[0] != a[1], x == y, x + y == 6, a[1] | a[2])
+        assert solver.find_answer(_RecordingBackend)
+        assert a[0].sol != a[1].sol
+        assert a[1].sol or a[2].sol
+        assert x.sol == 3
+        assert y.sol == 3
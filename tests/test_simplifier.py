@@ -0,0 +1,135 @@
+import pytest
+
+import cspuz
+from cspuz import count_true, fold_and, fold_or
+from cspuz.backend import cnf
+from cspuz.expr import BoolExpr, Expr, Op
+from cspuz.simplifier import simplify, simplify_constraints
+
+from tests.util import check_equality_expr
+
+
+class TestSimplifier:
+    @pytest.fixture
+    def solver(self):
+        return cspuz.Solver()
+
+    def test_constant(self):
+        assert simplify(BoolExpr(Op.BOOL_CONSTANT, [True])) is True
+        assert simplify(Expr(Op.INT_CONSTANT, [3])) == 3
+
+    def test_and_or(self, solver):
+        a = solver.bool_array(3)
+        true = BoolExpr(Op.BOOL_CONSTANT, [True])
+        false = BoolExpr(Op.BOOL_CONSTANT, [False])
+        assert check_equality_expr(simplify(a[0] & true), a[0])
+        assert simplify(a[0] & false) is False
+        assert simplify(a[0] | true) is True
+        assert check_equality_expr(simplify(fold_or(a[0], false, a[1])),
+                                   Expr(Op.OR, [a[0], a[1]]))
+        assert check_equality_expr(simplify((a[0] & a[1]) & (a[2] & a[0])),
+                                   Expr(Op.AND, [a[0], a[1], a[2]]))
+        assert simplify(a[0] & ~a[0]) is False
+        assert simplify(fold_or(a[1], ~a[1], a[2])) is True
+
+    def test_not(self, solver):
+        a = solver.bool_var()
+        assert simplify(~~a) is a
+        assert simplify(~BoolExpr(Op.BOOL_CONSTANT, [False])) is True
+
+    def test_then(self, solver):
+        a = solver.bool_var()
+        true = BoolExpr(Op.BOOL_CONSTANT, [True])
+        false = BoolExpr(Op.BOOL_CONSTANT, [False])
+        assert simplify(false.then(a)) is True
+        assert simplify(true.then(a)) is a
+        assert check_equality_expr(simplify(a.then(false)),
+                                   Expr(Op.NOT, [a]))
+
+    def test_iff_xor(self, solver):
+        a = solver.bool_var()
+        true = BoolExpr(Op.BOOL_CONSTANT, [True])
+        assert simplify(a == true) is a
+        assert check_equality_expr(simplify(a != true), Expr(Op.NOT, [a]))
+        assert simplify(a == a) is True
+
+    def test_add(self, solver):
+        a = solver.bool_array(3)
+        x = solver.int_var(0, 3)
+        assert check_equality_expr(
+            simplify(count_true(a[0], True, True)),
+            Expr(Op.ADD, [Expr(Op.COUNT_TRUE, [a[0]]), 2]))
+        assert check_equality_expr(simplify((x + 1) + (x - 0) + (-1)),
+                                   Expr(Op.ADD, [x, x]))
+        assert simplify(count_true(True, False, True)) == 2
+
+    def test_count_true(self, solver):
+        a = solver.bool_array(3)
+        true = BoolExpr(Op.BOOL_CONSTANT, [True])
+        false = BoolExpr(Op.BOOL_CONSTANT, [False])
+        assert check_equality_expr(
+            simplify(count_true(a[0], true, a[1], false)),
+            Expr(Op.ADD, [Expr(Op.COUNT_TRUE, [a[0], a[1]]), 1]))
+        assert simplify(count_true(true, false, true)) == 2
+        # the constant is moved to the other side of a comparison
+        assert check_equality_expr(
+            simplify(count_true(a, True) == 2),
+            Expr(Op.EQ, [Expr(Op.COUNT_TRUE, list(a)), 1]))
+
+    def test_if(self, solver):
+        a = solver.bool_var()
+        x = solver.int_var(0, 3)
+        true = BoolExpr(Op.BOOL_CONSTANT, [True])
+        assert simplify(true.cond(x, 2)) is x
+        assert simplify(a.cond(2, 2)) == 2
+
+    def test_compare_by_bounds(self, solver):
+        a = solver.bool_array(3)
+        x = solver.int_var(0, 3)
+        y = solver.int_var(4, 5)
+        assert simplify(x < y) is True
+        assert simplify(x == 5) is False
+        assert simplify(count_true(a) >= 0) is True
+        assert simplify(count_true(a) > 3) is False
+        assert check_equality_expr(simplify(x >= 3), Expr(Op.GE, [x, 3]))
+
+    def test_alldifferent(self, solver):
+        x = solver.int_var(0, 3)
+        assert simplify(cspuz.alldifferent(1, 2, 3)) is True
+        assert simplify(cspuz.alldifferent(x, 2, 2)) is False
+
+    def test_simplify_constraints(self, solver):
+        a = solver.bool_array(3)
+        x = solver.int_var(0, 3)
+        constraints = simplify_constraints(
+            [x <= 3, fold_and(a[0], a[1].then(True)), a[2], True])
+        assert len(constraints) == 2
+        assert constraints[0] is a[0]
+        assert constraints[1] is a[2]
+
+        assert simplify_constraints([a[0], x > 3]) is None
+
+    def test_trivially_unsat_skips_backend(self, solver):
+        x = solver.int_var(0, 3)
+        solver.add_answer_key(x)
+        solver.ensure(count_true(True, True) == 3)
+
+        class FailingBackend:
+            class CSPSolver:
+                def __init__(self, variables):
+                    raise AssertionError('backend must not be used')
+
+        assert not solver.solve(FailingBackend)
+        assert x.sol is None
+        assert not solver.find_answer(FailingBackend)
+
+    def test_solve(self, solver):
+        a = solver.bool_array(3)
+        solver.add_answer_key(a)
+        solver.ensure(count_true(a, True) == 2)
+        solver.ensure(fold_or(a[0], False))
+        solver.ensure(a[1].then(BoolExpr(Op.BOOL_CONSTANT, [False])))
+        assert solver.solve(cnf)
+        assert a[0].sol is True
+        assert a[1].sol is False
+        assert a[2].sol is False
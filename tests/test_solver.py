@@ -0,0 +1,224 @@
+import itertools
+import subprocess
+
+import pytest
+
+import cspuz
+from cspuz import count_true
+
+
+class TestSolver:
+    @pytest.fixture(autouse=True, params=["sugar", "z3", "cnf"])
+    def default_backend(self, request):
+        cspuz.config.default_backend = request.param
+
+    @pytest.fixture
+    def solver(self):
+        return cspuz.Solver()
+
+    def test_solve_bool(self, solver):
+        a = solver.bool_array(4)
+        solver.add_answer_key(a)
+        solver.ensure(a[0] | a[1])
+        solver.ensure(~a[0])
+        solver.ensure(a[2] != a[3])
+        assert solver.solve()
+        assert a[0].sol is False
+        assert a[1].sol is True
+        assert a[2].sol is None
+        assert a[3].sol is None
+
+    def test_solve_int(self, solver):
+        x = solver.int_var(0, 3)
+        y = solver.int_var(0, 3)
+        solver.add_answer_key(x, y)
+        solver.ensure(x + y == 4)
+        solver.ensure(x != 2)
+        assert solver.solve()
+        assert x.sol is None
+        assert y.sol is None
+
+        solver.ensure(x <= 2)
+        assert solver.solve()
+        assert x.sol == 1
+        assert y.sol == 3
+
+        solver.ensure(y != 3)
+        assert not solver.solve()
+
+    def test_solve_cardinality(self, solver):
+        a = solver.bool_array((3, 3))
+        solver.add_answer_key(a)
+        for i in range(3):
+            solver.ensure(count_true(a[i, :]) == 1)
+            solver.ensure(count_true(a[:, i]) == 1)
+        solver.ensure(a[0, 0])
+        solver.ensure(~a[1, 1])
+        assert solver.solve()
+        expected = [[True, False, False], [False, False, True],
+                    [False, True, False]]
+        for y in range(3):
+            for x in range(3):
+                assert a[y, x].sol is expected[y][x]
+
+    @pytest.mark.parametrize("op", ["==", "!=", "<=", "<", ">=", ">"])
+    def test_solve_cardinality_comparison(self, op):
+        compare = {
+            "==": lambda x, y: x == y,
+            "!=": lambda x, y: x != y,
+            "<=": lambda x, y: x <= y,
+            "<": lambda x, y: x < y,
+            ">=": lambda x, y: x >= y,
+            ">": lambda x, y: x > y,
+        }[op]
+        for k in range(-1, 7):
+            solver = cspuz.Solver()
+            b = solver.bool_array(5)
+            solver.ensure(compare(count_true(b), k))
+            solver.ensure(compare(k, count_true(b[1:])))
+            sat = any(
+                compare(sum(m), k) and compare(k, sum(m[1:]))
+                for m in itertools.product([False, True], repeat=5))
+            assert solver.find_answer() == sat
+            if sat:
+                m = [v.sol for v in b]
+                assert compare(sum(m), k) and compare(k, sum(m[1:]))
+
+    def test_deep_expr(self, solver):
+        # neither the solver (simplifier, presolver) nor the backends
+        # recurse on the depth of the expressions
+        a = solver.bool_array(4)
+        solver.add_answer_key(a)
+        e = a[0]
+        y = a[0].cond(1, 0)
+        for i in range(5000):
+            e = (e & a[1]) | a[2] if i % 2 == 0 else (e | a[2]) & a[1]
+            y = a[i % 3].cond(y, 1 - y)
+        solver.ensure(e, y == 1, a[2] | a[3])
+        assert solver.find_answer()
+        assignment = solver.assignment
+        assert assignment[e] is True
+        assert assignment[y] == 1
+        assert solver.solve()
+
+    def test_solve_unsat(self, solver):
+        a = solver.bool_var()
+        solver.add_answer_key(a)
+        solver.ensure(a)
+        solver.ensure(~a)
+        assert not solver.solve()
+
+
+class TestCNFBackend:
+    @pytest.fixture
+    def solver(self):
+        return cspuz.Solver()
+
+    def test_unsat_core(self, solver):
+        from cspuz.backend import cnf
+
+        a = solver.bool_array(3)
+        csp_solver = cnf.CSPSolver(solver.variables)
+        csp_solver.add_constraint(a[0].then(a[1]))
+        assumptions = [a[0], a[2], ~a[1]]
+        assert not csp_solver.solve_with_assumptions(assumptions)
+        assert sorted(csp_solver.unsat_core()) == [0, 2]
+        assert csp_solver.solve_with_assumptions(assumptions[1:])
+        assert a[0].sol is False
+        assert a[2].sol is True
+
+    def test_deadline(self, solver):
+        import time
+        from cspuz.backend import cnf
+
+        # pigeonhole principle: 7 pigeons in 6 holes
+        x = solver.int_array(7, 0, 5)
+        solver.ensure(cspuz.alldifferent(x))
+        csp_solver = cnf.CSPSolver(solver.variables)
+        csp_solver.add_constraint(solver.constraints)
+        csp_solver.deadline = time.time()
+        with pytest.raises(subprocess.TimeoutExpired):
+            csp_solver.solve()
+
+    def test_builtin_engine_warning(self, monkeypatch):
+        from cspuz.backend import _sat
+
+        monkeypatch.setattr(_sat, 'PYSAT_AVAILABLE', False)
+        with pytest.warns(RuntimeWarning):
+            assert isinstance(_sat.make_engine('auto'), _sat.BuiltinEngine)
+
+
+class TestDeadline:
+    @pytest.fixture(autouse=True)
+    def default_backend(self):
+        cspuz.config.default_backend = 'cnf'
+
+    @pytest.fixture
+    def problem(self):
+        solver = cspuz.Solver()
+        a = solver.bool_array(6)
+        solver.add_answer_key(a)
+        solver.ensure(count_true(a) == 3)
+        solver.ensure(a[0], a[1] != a[2], a[3] | a[4])
+        return solver, a
+
+    @pytest.fixture
+    def timeout_after(self, monkeypatch):
+        # the backend times out from the `n`-th call
+        from cspuz.backend import cnf
+
+        def set_limit(n):
+            calls = [0]
+            original = cnf.CSPSolver.solve_with_assumptions
+
+            def solve_with_assumptions(self, assumptions):
+                calls[0] += 1
+                if calls[0] >= n:
+                    raise subprocess.TimeoutExpired('cnf', 0)
+                return original(self, assumptions)
+
+            monkeypatch.setattr(cnf.CSPSolver, 'solve_with_assumptions',
+                                solve_with_assumptions)
+
+        return set_limit
+
+    def test_complete(self, problem):
+        solver, a = problem
+        assert solver.solve(deadline=60.0)
+        deduction = solver.deduction
+        assert deduction.complete
+        assert [v.sol for v in a] == [True, None, None, None, None, False]
+        assert deduction.undetermined == list(a[1:5])
+        assert deduction.pending == []
+
+    def test_partial(self, problem, timeout_after):
+        solver, a = problem
+        timeout_after(3)
+        assert solver.solve(deadline=60.0)
+        deduction = solver.deduction
+        assert not deduction.complete
+        assert len(deduction.pending) > 0
+        decided = [v for v in a if v.sol is not None]
+        assert all(v.sol is None for v in deduction.pending)
+        assert sorted(v.id for v in decided + deduction.undetermined +
+                      deduction.pending) == [v.id for v in a]
+        assert all(v.id not in (0, 5) for v in deduction.undetermined)
+
+    def test_no_solution_in_time(self, problem, timeout_after):
+        solver, a = problem
+        timeout_after(1)
+        assert not solver.solve(deadline=60.0)
+        assert not solver.deduction.complete
+        assert solver.deduction.pending == list(a)
+        assert all(v.sol is None for v in a)
+
+    def test_without_deadline(self, problem, timeout_after):
+        solver, _ = problem
+        timeout_after(1)
+        with pytest.raises(subprocess.TimeoutExpired):
+            solver.solve()
+
+    def test_expired(self, problem):
+        solver, a = problem
+        assert not solver.solve(deadline=0.0)
+        assert solver.deduction.pending == list(a)
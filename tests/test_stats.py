@@ -0,0 +1,77 @@
+import pytest
+
+import cspuz
+from cspuz import count_true
+from cspuz.backend import cnf, sugar_extended
+from cspuz.batch import solve_many
+from cspuz.stats import StatsAggregator, add_hook, remove_hook
+
+
+def _make_problem(n):
+    solver = cspuz.Solver()
+    a = solver.bool_array(4)
+    b = solver.bool_var()
+    solver.add_answer_key(a, b)
+    solver.ensure(count_true(a) == n)
+    for i in range(3):
+        solver.ensure(a[i].then(a[i + 1]))
+    return solver
+
+
+class TestStats:
+    @pytest.fixture
+    def aggregator(self):
+        aggregator = StatsAggregator()
+        add_hook(aggregator)
+        yield aggregator
+        remove_hook(aggregator)
+
+    def test_solve(self):
+        solver = _make_problem(2)
+        assert solver.solve(cnf)
+        stats = solver.stats
+        assert stats.mode == 'solve'
+        assert stats.backend == 'cnf'
+        assert stats.is_sat
+        assert stats.num_variables == 5
+        assert stats.num_constraints == 4
+        assert stats.num_backend_calls >= 2
+        assert stats.num_rounds == len(solver.refutation_round_times) > 0
+        for phase in ['build', 'simplify', 'presolve', 'convert', 'backend']:
+            assert phase in stats.phase_times
+        assert stats.total_time >= stats.phase_times['backend']
+
+    def test_hook(self, aggregator):
+        solvers = [_make_problem(n) for n in range(6)]
+        for solver in solvers[:3]:
+            solver.solve(cnf)
+        for solver in solvers[3:]:
+            solver.find_answer(cnf)
+        assert aggregator.num_solves == 6
+        assert aggregator.num_backend_calls == sum(
+            s.stats.num_backend_calls for s in solvers)
+        assert 'backend' in aggregator.report()
+
+    def test_batch(self, aggregator):
+        solvers = [_make_problem(n) for n in range(4)]
+        solve_many(solvers, backend=cnf, max_workers=2, use_processes=True)
+        assert aggregator.num_solves == 4
+        assert all(s.stats.backend == 'cnf' for s in solvers)
+
+    def test_backend_reported_stats(self):
+        solver = _make_problem(2)
+        csp_solver = sugar_extended.CSPSolver(solver.variables)
+        out = [
+            'sat', 'b2 true', 'b3 true', 'c time convert 0.5',
+            'c time encode 0.25', 'c time sat 1.5', 'c time decode 0.125',
+            'c rounds 3'
+        ]
+        assert csp_solver._load_with_stats(
+            csp_solver._load_irrefutable_output, out)
+        assert [v.sol for v in solver.variables] == [
+            None, None, True, True, None
+        ]
+        assert csp_solver.num_backend_rounds == 3
+        assert csp_solver.backend_times['sat'] == 1.5
+        assert csp_solver.backend_times['decode'] == 0.125
+        assert 'parse' in csp_solver.backend_times
@@ -0,0 +1,143 @@
+import asyncio
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+import pytest
+
+import cspuz
+from cspuz import count_true
+from cspuz.backend import sugar, sugar_extended
+from cspuz.backend._subproc import run_subprocess, run_subprocess_async
+
+
+class TestSugarSerialization:
+    def test_convert_expr(self):
+        solver = cspuz.Solver()
+        a = solver.bool_array(2)
+        x = solver.int_var(0, 3)
+        assert sugar._convert_expr((a[0] | ~a[1]) & (x + 1 >= 2)) == \
+            '(&& (|| b0 (! b1)) (>= (+ i2 1) 2))'
+        assert sugar._convert_expr(count_true(a) == 1) == \
+            '(= (+ (if b0 1 0) (if b1 1 0)) 1)'
+        assert sugar._convert_expr(True) == 'true'
+
+    def test_deep_expr(self):
+        solver = cspuz.Solver()
+        a = solver.bool_array(2)
+        e = a[0]
+        for _ in range(5000):
+            e = e | a[1]
+        converted = sugar._convert_expr(e)
+        assert converted.startswith('(|| (|| ')
+        assert converted.count('b1') == 5000
+
+        # shared subexpressions are defined without recursion either
+        csp_solver = sugar.CSPSolver(solver.variables)
+        csp_solver.add_constraint([e, e | a[0]])
+        assert csp_solver.converted_constraints[-2:] == ['s0', '(|| s0 b0)']
+
+    def test_description_writer(self):
+        solver = cspuz.Solver()
+        a = solver.bool_array(3)
+        csp_solver = sugar.CSPSolver(solver.variables)
+        csp_solver.add_constraint([a[0] | a[1], ~a[2]])
+        f = io.BytesIO()
+        csp_solver._description_writer(['#b0'])(f)
+        expected = ('(bool b0)\n(bool b1)\n(bool b2)\n(|| b0 b1)\n(! b2)\n'
+                    '#b0\n')
+        assert f.getvalue().decode('ascii') == expected
+        assert csp_solver.csp_bytes == len(expected)
+
+    def test_streamed_input(self):
+        def write(f):
+            for i in range(10000):
+                f.write('{}\n'.format(i).encode('ascii'))
+
+        expected = ''.join('{}\n'.format(i) for i in range(10000))
+        assert run_subprocess(['cat'], write) == expected
+        assert asyncio.run(run_subprocess_async(['cat'], write)) == expected
+
+
+def _is_running(pid):
+    try:
+        with open('/proc/{}/stat'.format(pid)) as f:
+            # a zombie has already exited
+            return f.read().split(')')[-1].split()[0] != 'Z'
+    except FileNotFoundError:
+        return False
+
+
+class TestSugarExtServer:
+    @pytest.fixture
+    def server_config(self):
+        yield
+        cspuz.config.sugar_ext_server = False
+        cspuz.config.backend_path = None
+        sugar_extended._close_servers()
+
+    def test_kill_on_timeout(self, tmp_path):
+        # a wrapper script which, like `sugar_ext.sh` without `exec`, runs
+        # the actual server as its child
+        child_file = tmp_path / 'child'
+        script = tmp_path / 'server.sh'
+        script.write_text('#!/bin/sh\nsleep 60 &\necho $! > {}\nwait\n'.format(
+            child_file))
+        script.chmod(0o755)
+        server = sugar_extended.SugarExtServer(str(script))
+        with pytest.raises(subprocess.TimeoutExpired):
+            server.request('(bool b0)', timeout=0.5)
+        child = int(child_file.read_text())
+        for _ in range(50):
+            if not _is_running(child):
+                break
+            time.sleep(0.1)
+        else:
+            pytest.fail('the child of the server is still running')
+        assert not server.is_alive()
+
+    def test_server(self, tmp_path, server_config):
+        if (shutil.which('javac') is None or shutil.which('java') is None
+                or shutil.which('minisat') is None
+                or not os.environ.get('SUGAR_JAR')):
+            pytest.skip('JDK, minisat or $SUGAR_JAR is not available')
+        source_dir = os.path.join(os.path.dirname(__file__), '..',
+                                  'sugar_extension')
+        for name in ['CspuzSugarInterface.java', 'sugar_ext.sh']:
+            shutil.copy(os.path.join(source_dir, name), tmp_path)
+        subprocess.run([
+            'javac', '-classpath', os.environ['SUGAR_JAR'],
+            'CspuzSugarInterface.java'
+        ],
+                       cwd=tmp_path,
+                       check=True)
+        path = str(tmp_path / 'sugar_ext.sh')
+        os.chmod(path, 0o755)
+        cspuz.config.sugar_ext_server = True
+        cspuz.config.backend_path = path
+
+        for _ in range(2):
+            solver = cspuz.Solver()
+            a = solver.bool_array(3)
+            x = solver.int_var(0, 3)
+            solver.add_answer_key(a, x)
+            solver.ensure(count_true(a) == x, a[0], ~a[1], x >= 1)
+            assert solver.solve(sugar_extended)
+            assert [v.sol for v in a] == [True, False, None]
+            assert x.sol is None
+            solver.ensure(x == 2)
+            assert solver.find_answer(sugar_extended)
+            assert a[2].sol is True
+        server = sugar_extended.get_server()
+        assert server.num_requests == 4
+        assert server.num_restarts == 0
+        temp_dir = tempfile.gettempdir()
+        before = set(os.listdir(temp_dir))
+        solver.find_answer(sugar_extended)
+        # the temporary files of the server are deleted after each problem
+        assert not any(
+            name.startswith('temp') and name.endswith(('.cnf', '.map', '.out'))
+            for name in set(os.listdir(temp_dir)) - before)
@@ -0,0 +1,148 @@
+import pytest
+
+import cspuz
+import cspuz.template
+from cspuz import count_true
+from cspuz.backend import cnf
+from cspuz.cache import get_result_cache
+from cspuz.template import Template, cached_template
+
+
+class _CountingBackend:
+    # cnf backend which counts the sessions created
+    num_sessions = 0
+
+    class CSPSolver(cnf.CSPSolver):
+        def __init__(self, variables):
+            super().__init__(variables)
+            _CountingBackend.num_sessions += 1
+
+
+class _NoAssumptionBackend:
+    # cnf backend without support of assumptions
+    num_sessions = 0
+
+    class CSPSolver(object):
+        def __init__(self, variables):
+            self.csp_solver = cnf.CSPSolver(variables)
+            _NoAssumptionBackend.num_sessions += 1
+
+        def add_constraint(self, constraint):
+            self.csp_solver.add_constraint(constraint)
+
+        def solve(self):
+            return self.csp_solver.solve()
+
+
+def _make_template():
+    # a chain of 4 cells in which a black cell is followed by black cells
+    template = Template()
+    a = template.bool_array(4)
+    x = template.int_var(0, 4)
+    template.add_answer_key(a, x)
+    template.ensure(x == count_true(a))
+    for i in range(3):
+        template.ensure(a[i].then(a[i + 1]))
+    return template, a, x
+
+
+class TestTemplate:
+    @pytest.fixture(autouse=True)
+    def clear_sessions(self):
+        _CountingBackend.num_sessions = 0
+        _NoAssumptionBackend.num_sessions = 0
+
+    @pytest.fixture(params=[_CountingBackend, _NoAssumptionBackend])
+    def backend(self, request):
+        return request.param
+
+    def test_solve(self, backend):
+        template, a, x = _make_template()
+
+        template.set_clues(x == 2)
+        assert template.solve(backend)
+        assert [v.sol for v in a] == [False, False, True, True]
+
+        template.set_clues(a[2])
+        assert template.solve(backend)
+        assert [v.sol for v in a] == [None, None, True, True]
+        assert x.sol is None
+
+        template.set_clues(a[1], x == 2)
+        assert not template.solve(backend)
+        assert x.sol is None
+
+        # clues do not remain in the session
+        template.set_clues(~a[3])
+        assert template.solve(backend)
+        assert [v.sol for v in a] == [False, False, False, False]
+        assert x.sol == 0
+
+        if backend is _CountingBackend:
+            assert backend.num_sessions == 1
+
+    def test_find_answer(self, backend):
+        template, a, x = _make_template()
+        template.set_clues(x >= 3, ~a[0])
+        assert template.find_answer(backend)
+        assert [v.sol for v in a] == [False, True, True, True]
+        template.set_clues(x == 5)
+        assert not template.find_answer(backend)
+
+    def test_new_rules(self):
+        template, a, x = _make_template()
+        template.set_clues(x == 1)
+        assert template.solve(_CountingBackend)
+        template.ensure(~a[3])
+        assert not template.solve(_CountingBackend)
+        template.set_clues()
+        assert template.solve(_CountingBackend)
+        assert x.sol == 0
+        assert _CountingBackend.num_sessions == 1
+
+    def test_canonical_clues(self):
+        template, a, x = _make_template()
+        template.set_clues(x == 2, a[0] | a[1])
+        clues = template.clues
+        template.set_clues(x == 2, a[0] | a[1])
+        assert all(c is d for c, d in zip(clues, template.clues))
+
+    def test_session_bounded(self, monkeypatch):
+        monkeypatch.setattr(cspuz.template, '_MAX_SESSION_ASSUMPTIONS', 4)
+        template, a, x = _make_template()
+        for n in range(10):
+            template.set_clues(x == n % 4)
+            assert template.solve(_CountingBackend)
+            assert [v.sol for v in a] == [i >= 4 - n % 4 for i in range(4)]
+        # only the clues are canonicalized
+        assert len(template._canonical_nodes) == 4
+        assert 1 < _CountingBackend.num_sessions < 10
+
+    def test_result_cache(self):
+        cspuz.config.use_result_cache = True
+        get_result_cache().clear()
+        try:
+            template, a, x = _make_template()
+            template.set_clues(x == 2)
+            assert template.solve(_CountingBackend)
+            template.set_clues(x == 3)
+            assert template.solve(_CountingBackend)
+            assert [v.sol for v in a] == [False, True, True, True]
+            template.set_clues(x == 2)
+            assert template.solve(_CountingBackend)
+            assert [v.sol for v in a] == [False, False, True, True]
+            assert template.stats.cache_hit
+        finally:
+            get_result_cache().clear()
+            cspuz.config.use_result_cache = False
+
+    def test_cached_template(self):
+        built = []
+
+        def build():
+            built.append(1)
+            return _make_template()
+
+        first = cached_template(('test_template', 4), build)
+        assert cached_template(('test_template', 4), build) is first
+        assert len(built) == 1